@@ -0,0 +1,130 @@
+from typing import Any, Dict
+from collections import deque
+from contextlib import asynccontextmanager
+from fastapi import HTTPException
+import asyncio
+import logging
+import math
+import os
+import time
+from .metrics import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+# Analyses run at once; further requests wait in a bounded FIFO queue
+ANALYSIS_MAX_CONCURRENCY = int(os.getenv("ANALYSIS_MAX_CONCURRENCY", "8"))
+ANALYSIS_MAX_QUEUE = int(os.getenv("ANALYSIS_MAX_QUEUE", "16"))
+# Longest a request waits in the queue before it is turned away
+ANALYSIS_QUEUE_TIMEOUT = float(os.getenv("ANALYSIS_QUEUE_TIMEOUT", "30"))
+
+ADMISSION_QUEUE_DEPTH = Gauge("admission_queue_depth", "Requests waiting for an analysis slot.", ("pool",))
+ADMISSION_ACTIVE = Gauge("admission_active", "Requests holding an analysis slot.", ("pool",))
+ADMISSION_WAIT = Histogram("admission_wait_seconds", "Time requests waited for an analysis slot, including those that gave up.", ("pool",))
+ADMISSION_REJECTED = Counter("admission_rejected_total", "Requests turned away; reason is queue_full (429) or queue_timeout (503).", ("pool", "reason"))
+
+class AdmissionController:
+    """
+    Concurrency limiter with a bounded FIFO wait queue, shedding load when saturated.
+
+    Up to max_concurrency requests run at once and up to max_queue more wait for a
+    slot. A request arriving to a full queue is rejected at once with 429; one that
+    waits longer than queue_timeout is rejected with 503. Both carry a Retry-After
+    estimated from the recent time per request and the backlog ahead. Slots are
+    handed directly to the next waiter on release, so arrivals cannot jump the queue.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: deque = deque()
+        # Moving average of seconds per admitted request, for Retry-After
+        self._service_seconds = 10.0
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free: the backlog's share of the average time per request."""
+        backlog = len(self._waiters) + 1
+        return max(1, math.ceil(self._service_seconds * backlog / max(self.max_concurrency, 1)))
+
+    def _update_gauges(self):
+        ADMISSION_QUEUE_DEPTH.set(len(self._waiters), pool=self.name)
+        ADMISSION_ACTIVE.set(self.active, pool=self.name)
+
+    def _reject(self, status_code: int, reason: str, detail: str) -> HTTPException:
+        ADMISSION_REJECTED.inc(pool=self.name, reason=reason)
+        retry_after = self.retry_after()
+        logger.warning(f"Rejecting {self.name} request ({reason}): {self.active} running, {len(self._waiters)} queued; retry after {retry_after}s")
+        return HTTPException(status_code=status_code, detail=detail, headers={"Retry-After": str(retry_after)})
+
+    async def _acquire(self):
+        if self.active < self.max_concurrency and not self._waiters:
+            self.active += 1
+            ADMISSION_WAIT.observe(0.0, pool=self.name)
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject(429, "queue_full", "The service is busy; too many analyses are already waiting.")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._update_gauges()
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # The slot arrived just as the wait timed out; take it
+                return
+            waiter.cancel()
+            raise self._reject(503, "queue_timeout", "The service is overloaded; no analysis slot became free in time.")
+        except asyncio.CancelledError:
+            # The client went away while queued; pass on a slot that was already handed over
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            else:
+                waiter.cancel()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            ADMISSION_WAIT.observe(time.perf_counter() - start, pool=self.name)
+            self._update_gauges()
+
+    def _release(self):
+        # Hand the slot straight to the oldest live waiter, keeping active unchanged
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self._update_gauges()
+                return
+        self.active -= 1
+        self._update_gauges()
+
+    @asynccontextmanager
+    async def admit(self):
+        """Hold a slot for the duration of the block, waiting or raising HTTPException as above."""
+        await self._acquire()
+        self._update_gauges()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._service_seconds = 0.8 * self._service_seconds + 0.2 * (time.perf_counter() - start)
+            self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "queued": len(self._waiters),
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue
+        }
+
+analysis_admission = AdmissionController(
+    "analysis",
+    max_concurrency=ANALYSIS_MAX_CONCURRENCY,
+    max_queue=ANALYSIS_MAX_QUEUE,
+    queue_timeout=ANALYSIS_QUEUE_TIMEOUT
+)
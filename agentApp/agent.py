@@ -1,14 +1,24 @@
-from typing import Dict, List, Any, TypedDict
+from typing import Annotated, Any, AsyncIterator, Awaitable, Callable, Dict, List, Literal, Optional, TypedDict, Union
 from langchain_core.messages import HumanMessage, AIMessage
 from langgraph.graph import StateGraph, END
-from langchain_openai import ChatOpenAI
+from langgraph.config import get_stream_writer
+from langgraph.types import Command
 import json
 import logging
 import os
 from dotenv import load_dotenv
-import re
-import PyPDF2
-import io
+from .llm import get_llm, ainvoke_structured, StructuredOutputError, LLM_MODEL
+from .schemas import FinancialAnalysis, TermsAnalysis, MarketAnalysis, DueDiligenceReport, EconomyAnalysis
+from .cache import make_cache_key, get_document_cache, RESULT_CACHE_ENABLED
+from .chunking import chunk_text, merge_partial_results, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+from .facts import extract_facts, render_fact_sheet
+from .prompts import PROMPT_REGISTRY_VERSION, render_prompt, render_document_prompt
+from .sessions import get_checkpointer, new_session_id, session_config, touch_session, write_session_in_background, wait_for_session_write
+from .metrics import instrument_node
+from .retrieval import RETRIEVAL_ENABLED, retrieval_index_key, get_index, retrieve, format_passages
+import asyncio
+import copy
+import operator
 
 load_dotenv(override=True)
 
@@ -23,27 +33,73 @@ class AgentState(TypedDict):
     documents: Dict[str, Any]  # Store documents
     analysis_results: Dict[str, Any]  # Store analysis results
     final_report: Dict[str, Any]  # Final output
+    retrieval_index: str  # Key of the documents' passage index, for grounded Q&A
+    errors: Annotated[List[str], operator.add]  # Non-fatal errors collected across nodes
 
-def extract_text_from_pdf(pdf_content):
-    """Extract text from PDF binary content."""
-    try:
-        # Create a file-like object from the binary content
-        pdf_file = io.BytesIO(pdf_content)
-        
-        # Create a PDF reader object
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        
-        # Extract text from each page
-        text = ""
-        for page_num in range(len(pdf_reader.pages)):
-            page = pdf_reader.pages[page_num]
-            text += page.extract_text() + "\n\n"
-        
-        logger.info(f"Successfully extracted text from PDF, {len(text)} characters")
-        return text
-    except Exception as e:
-        logger.error(f"Error extracting text from PDF: {str(e)}")
-        return None
+# Per-call timeout (seconds) for each of the analysis_engine LLM calls
+ANALYSIS_CALL_TIMEOUT = float(os.getenv("ANALYSIS_CALL_TIMEOUT", "60"))
+
+# Maximum number of chunks analyzed at once when a document is map-reduced
+ANALYSIS_MAP_CONCURRENCY = int(os.getenv("ANALYSIS_MAP_CONCURRENCY", "4"))
+
+# Maximum number of documents analyzed at once in a multi-document run
+DOCUMENT_ANALYSIS_CONCURRENCY = int(os.getenv("DOCUMENT_ANALYSIS_CONCURRENCY", "4"))
+
+# How pre-extracted figures are used in the financial and market prompts:
+# "augment" adds them alongside the full text, "replace" sends them instead of the
+# full text (fewer input tokens, but no qualitative context), "off" disables them
+FACT_SHEET_MODE = os.getenv("FACT_SHEET_MODE", "augment").lower()
+
+# Run the financial prompt before fanning out the terms and market prompts, so
+# they read the shared document prefix from the provider's prompt cache instead
+# of all three missing it at once. This puts a whole call back on the critical
+# path, so it is off by default: it cuts input cost, but only saves time when the
+# prefill of a long prefix outweighs a round-trip
+PROMPT_CACHE_WARMUP = os.getenv("PROMPT_CACHE_WARMUP", "false").lower() == "true"
+
+# Shortest text (tokens) worth warming the cache for; the provider caches nothing
+# under 1024, and the saving only beats the extra round-trip well above that
+PROMPT_CACHE_MIN_TOKENS = int(os.getenv("PROMPT_CACHE_MIN_TOKENS", "1024"))
+
+# Timeout (seconds) for the single economy-mode call, which writes every section at once
+ECONOMY_CALL_TIMEOUT = float(os.getenv("ECONOMY_CALL_TIMEOUT", "120"))
+
+# "thorough" runs one call per section plus a report call; "economy" asks for
+# everything in one structured call, for high-volume screening
+PipelineMode = Literal["thorough", "economy"]
+PIPELINE_THOROUGH = "thorough"
+PIPELINE_ECONOMY = "economy"
+
+# A single document, or a mapping of document name to text
+DocumentInput = Union[str, Dict[str, str]]
+
+DEFAULT_DOCUMENT_NAME = "uploaded_document.txt"
+
+# Compiled workflows by pipeline mode, plus the checkpointed one sessions are kept in
+SESSION_GRAPH = "session"
+_due_diligence_graphs: Dict[str, Any] = {}
+
+# Fallback values used when an analysis call fails, times out or returns unparseable output
+DEFAULT_FINANCIAL_ANALYSIS = {
+    "valuation_assessment": "unknown",
+    "projection_realism": "unknown",
+    "risk_factors": ["unknown"]
+}
+DEFAULT_TERMS_ANALYSIS = {
+    "unusual_terms": ["unknown"],
+    "favorable_terms": ["unknown"],
+    "recommended_negotiation_points": ["unknown"]
+}
+DEFAULT_MARKET_ANALYSIS = {
+    "market_size": "unknown",
+    "competition": "unknown"
+}
+
+# Cached results depend on the prompt wording and on how the fact sheet is used
+PROMPT_VERSION = make_cache_key(PROMPT_REGISTRY_VERSION, FACT_SHEET_MODE)[:16]
+
+# Chunk boundaries decide what each map call sees, so cached results depend on them too
+CHUNKING_VERSION = f"{CHUNK_MAX_TOKENS}:{CHUNK_OVERLAP_TOKENS}"
 
 def document_processor(state: AgentState) -> Dict:
     """Process uploaded documents."""
@@ -61,514 +117,285 @@ def document_processor(state: AgentState) -> Dict:
         logger.error(f"Error in document processor: {str(e)}", exc_info=True)
         return {"documents": {}, "errors": [f"Document processing failed: {str(e)}"]}
 
-def analysis_engine(state: AgentState) -> Dict:
-    """Analyze documents using LLM."""
-    try:
-        logger.info("Starting document analysis")
-        documents = state["documents"]
-        
-        # Use LLM to analyze all documents together
-        model = ChatOpenAI(
-            model="gpt-4o-mini",
-            api_key=os.getenv("OPENAI_API_KEY")
-        )
-        
-        # Prepare document content for analysis
-        document_texts = []
-        for doc_id, doc_info in documents.items():
-            content = doc_info.get("content", "")
-            document_texts.append(f"DOCUMENT {doc_id}:\n{content}\n\n")
-        
-        combined_docs = "\n".join(document_texts)
-        
-        # Financial analysis
-        financial_response = model.invoke(
-            [
-                HumanMessage(content=f"""
-                Analyze the financial aspects in these documents:
-                
-                {combined_docs}
-                
-                Extract and return ONLY a JSON object with these fields:
-                - "valuation_assessment": Extract any valuation information or "unknown" if not found
-                - "projection_realism": Information about growth projections or "unknown" if not found
-                - "risk_factors": List of risk factors or ["unknown"] if not found
-                
-                Return ONLY the JSON.
-                """)
-            ]
-        )
-        
-        # Terms analysis
-        terms_response = model.invoke(
-            [
-                HumanMessage(content=f"""
-                Analyze the investment terms in these documents:
-                
-                {combined_docs}
-                
-                Extract and return ONLY a JSON object with these fields:
-                - "unusual_terms": List any unusual terms or ["unknown"] if not found
-                - "favorable_terms": List favorable terms or ["unknown"] if not found
-                - "recommended_negotiation_points": List recommended negotiation points or ["unknown"] if not found
-                
-                Return ONLY the JSON.
-                """)
-            ]
-        )
-        
-        # Market analysis
-        market_response = model.invoke(
-            [
-                HumanMessage(content=f"""
-                Extract market information from these documents:
-                
-                {combined_docs}
-                
-                Return ONLY a JSON object with these fields:
-                - "market_size": Any market size information or "unknown" if not found
-                - "competition": Information about competitors or "unknown" if not found
-                
-                Return ONLY the JSON.
-                """)
-            ]
-        )
-        
-        # Parse JSON responses
-        try:
-            financial_analysis = extract_json(financial_response.content)
-            if not financial_analysis:
-                financial_analysis = {
-                    "valuation_assessment": "unknown",
-                    "projection_realism": "unknown",
-                    "risk_factors": ["unknown"]
-                }
-            
-            terms_analysis = extract_json(terms_response.content)
-            if not terms_analysis:
-                terms_analysis = {
-                    "unusual_terms": ["unknown"],
-                    "favorable_terms": ["unknown"],
-                    "recommended_negotiation_points": ["unknown"]
-                }
-            
-            market_analysis = extract_json(market_response.content)
-            if not market_analysis:
-                market_analysis = {
-                    "market_size": "unknown",
-                    "competition": "unknown"
-                }
-        except Exception as e:
-            logger.error(f"Error parsing LLM responses: {str(e)}")
-            financial_analysis = {"valuation_assessment": "unknown", "projection_realism": "unknown", "risk_factors": ["unknown"]}
-            terms_analysis = {"unusual_terms": ["unknown"], "favorable_terms": ["unknown"], "recommended_negotiation_points": ["unknown"]}
-            market_analysis = {"market_size": "unknown", "competition": "unknown"}
-        
-        analysis_results = {
-            "financial_analysis": financial_analysis,
-            "terms_analysis": terms_analysis,
-            "market_analysis": market_analysis
-        }
-        
-        logger.info("Analysis completed successfully")
-        return {"analysis_results": analysis_results}
-    except Exception as e:
-        logger.error(f"Error in analysis engine: {str(e)}", exc_info=True)
-        return {"analysis_results": {}, "errors": [f"Analysis failed: {str(e)}"]}
+def _document_texts(documents: Dict[str, Any]) -> Dict[str, str]:
+    """Map document name to text for the documents held in graph state."""
+    return {doc_id: doc["content"] for doc_id, doc in documents.items()}
 
-def report_generator(state: AgentState) -> Dict:
-    """Generate final due diligence report using LLM."""
+def _emit(event: Dict[str, Any]):
+    """Send a custom event to graph stream consumers, if running inside the graph."""
     try:
-        logger.info("Starting report generation")
-        analysis_results = state["analysis_results"]
-        
-        # Use LLM to generate comprehensive report
-        model = ChatOpenAI(
-            model="gpt-4o-mini",
-            api_key=os.getenv("OPENAI_API_KEY")
-        )
-        
-        analysis_json = json.dumps(analysis_results, indent=2)
-        
-        report_response = model.invoke(
-            [
-                HumanMessage(content=f"""
-                Generate a comprehensive due diligence report based on this analysis:
-                
-                {analysis_json}
-                
-                Return ONLY a JSON object with these fields:
-                - "executive_summary": A summary of the overall findings
-                - "financial_analysis": A summary of the financial findings
-                - "terms_analysis": A summary of the terms findings
-                - "market_analysis": A summary of the market findings
-                - "recommendation": A final recommendation based on the findings
-                
-                Return ONLY the JSON.
-                """)
-            ]
-        )
-        
-        # Parse JSON response
-        try:
-            final_report = extract_json(report_response.content)
-            if not final_report:
-                # Create basic report if parsing fails
-                final_report = {
-                    "executive_summary": "Analysis completed but report generation had issues.",
-                    "financial_analysis": analysis_results.get("financial_analysis", {}),
-                    "terms_analysis": analysis_results.get("terms_analysis", {}),
-                    "market_analysis": analysis_results.get("market_analysis", {}),
-                    "recommendation": "Review the analysis results manually."
-                }
-        except Exception as e:
-            logger.error(f"Error parsing report response: {str(e)}")
-            final_report = {
-                "executive_summary": "Analysis completed but report generation had issues.",
-                "financial_analysis": analysis_results.get("financial_analysis", {}),
-                "terms_analysis": analysis_results.get("terms_analysis", {}),
-                "market_analysis": analysis_results.get("market_analysis", {}),
-                "recommendation": "Review the analysis results manually."
-            }
-        
-        logger.info("Report generation completed")
-        return {"final_report": final_report}
-    except Exception as e:
-        logger.error(f"Error in report generator: {str(e)}", exc_info=True)
-        return {"final_report": {}, "errors": [f"Report generation failed: {str(e)}"]}
+        get_stream_writer()(event)
+    except RuntimeError:
+        pass
 
-def user_interaction(state: AgentState) -> Dict:
-    """Handle user interaction and responses."""
+async def _run_analysis(
+    model,
+    name: str,
+    prompt: str,
+    schema,
+    defaults: Dict[str, Any],
+    timeout: float,
+    labels: Optional[Dict[str, Any]] = None
+):
+    """Run a single analysis prompt and publish its result to stream consumers as soon as it finishes."""
+    result, error = await _invoke_analysis(model, name, prompt, schema, defaults, timeout)
+    _emit({"event": "analysis", "section": name, "chunk": None, **(labels or {}), "result": result, "error": error})
+    return result, error
+
+async def _invoke_analysis(model, name: str, prompt: str, schema, defaults: Dict[str, Any], timeout: float):
+    """Run a single analysis prompt with structured output, falling back to defaults on timeout or failure."""
     try:
-        logger.info("Starting user interaction")
-        last_message = state["messages"][-1]
-        
-        model = ChatOpenAI(
-            model="gpt-4o-mini",
-            api_key=os.getenv("OPENAI_API_KEY")
+        # The timeout covers validation retries too
+        result = await asyncio.wait_for(
+            ainvoke_structured(model, [HumanMessage(content=prompt)], schema),
+            timeout=timeout
         )
-        
-        if "final_report" in state and state["final_report"]:
-            report = state["final_report"]
-            report_str = json.dumps(report, indent=2)
-            
-            response = model.invoke(
-                [
-                    HumanMessage(content=f"""
-                    Based on this due diligence report, answer the user's query: "{last_message.content}"
-                    
-                    Report:
-                    {report_str}
-                    
-                    Only use information from the report. If information is not available, say it's unknown.
-                    """)
-                ]
-            )
-        else:
-            response = model.invoke(
-                [
-                    HumanMessage(content=f"I don't have enough information to answer your query: {last_message.content}")
-                ]
-            )
-        
-        logger.info("User interaction completed")
-        return {"messages": state["messages"] + [AIMessage(content=response.content)]}
+        return result.model_dump(), None
+    except StructuredOutputError as e:
+        logger.error(f"{name.capitalize()} analysis: {str(e)}")
+        return copy.deepcopy(defaults), f"{name.capitalize()} analysis returned invalid output: {str(e)}"
+    except asyncio.TimeoutError:
+        logger.error(f"{name.capitalize()} analysis timed out after {timeout}s")
+        return copy.deepcopy(defaults), f"{name.capitalize()} analysis timed out after {timeout}s"
     except Exception as e:
-        logger.error(f"Error in user interaction: {str(e)}", exc_info=True)
-        return {"messages": state["messages"] + [AIMessage(content=f"Error: {str(e)}")]}
+        logger.error(f"Error in {name} analysis: {str(e)}", exc_info=True)
+        return copy.deepcopy(defaults), f"{name.capitalize()} analysis failed: {str(e)}"
 
-def should_continue(state: AgentState) -> str:
-    """Determine next step in the workflow."""
-    if "documents" not in state or not state["documents"]:
-        return "document_processor"
-    if "analysis_results" not in state or not state["analysis_results"]:
-        return "analysis_engine"
-    if "final_report" not in state or not state["final_report"]:
-        return "report_generator"
-    return "user_interaction"
+async def _analyze_text(
+    model,
+    combined_docs: str,
+    timeout: float,
+    labels: Optional[Dict[str, Any]] = None,
+    facts: Optional[List[Dict[str, Any]]] = None,
+    text_tokens: int = 0
+):
+    """
+    Run the financial, terms and market prompts over one piece of text concurrently.
 
-def create_due_diligence_graph():
-    """Create the LangGraph workflow."""
-    workflow = StateGraph(AgentState)
+    facts found in the text are listed after the text in every prompt; with
+    FACT_SHEET_MODE=replace the financial and market prompts get them instead of the text.
+    With PROMPT_CACHE_WARMUP, text of at least PROMPT_CACHE_MIN_TOKENS (text_tokens,
+    as counted by chunk_text) has its financial prompt run first and the other two
+    follow once its document prefix is in the provider's cache.
+    """
+    # All three prompts open with the same document prefix so the provider can cache it
+    fact_sheet = render_prompt("fact_sheet", facts=render_fact_sheet(facts)) if facts else ""
+    facts_replace_text = bool(facts) and FACT_SHEET_MODE == "replace"
+    figures_docs = render_prompt("fact_sheet_only") if facts_replace_text else combined_docs
+    financial_prompt = render_document_prompt("financial_analysis", figures_docs, fact_sheet)
+    terms_prompt = render_document_prompt("terms_analysis", combined_docs, fact_sheet)
+    market_prompt = render_document_prompt("market_analysis", figures_docs, fact_sheet)
     
-    workflow.add_node("document_processor", document_processor)
-    workflow.add_node("analysis_engine", analysis_engine)
-    workflow.add_node("report_generator", report_generator)
-    workflow.add_node("user_interaction", user_interaction)
+    # Each call has its own timeout so a slow call only costs its own section,
+    # not the whole analysis
+    financial = _run_analysis(model, "financial", financial_prompt, FinancialAnalysis, DEFAULT_FINANCIAL_ANALYSIS, timeout, labels)
+    terms = _run_analysis(model, "terms", terms_prompt, TermsAnalysis, DEFAULT_TERMS_ANALYSIS, timeout, labels)
+    market = _run_analysis(model, "market", market_prompt, MarketAnalysis, DEFAULT_MARKET_ANALYSIS, timeout, labels)
     
-    workflow.add_conditional_edges(
-        "document_processor",
-        should_continue,
-        {
-            "analysis_engine": "analysis_engine",
-            "report_generator": "report_generator",
-            "user_interaction": "user_interaction"
-        }
-    )
-    
-    workflow.add_conditional_edges(
-        "analysis_engine",
-        should_continue,
-        {
-            "report_generator": "report_generator",
-            "user_interaction": "user_interaction"
-        }
-    )
+    # Concurrent requests all miss the prompt cache, so optionally let the first one
+    # fill it; with the fact sheet in place of the text the prefixes differ anyway
+    if PROMPT_CACHE_WARMUP and not facts_replace_text and text_tokens >= PROMPT_CACHE_MIN_TOKENS:
+        financial_analysis, financial_error = await financial
+        (terms_analysis, terms_error), (market_analysis, market_error) = await asyncio.gather(terms, market)
+    else:
+        (financial_analysis, financial_error), (terms_analysis, terms_error), (market_analysis, market_error) = await asyncio.gather(
+            financial, terms, market
+        )
     
-    workflow.add_conditional_edges(
-        "report_generator",
-        should_continue,
-        {
-            "user_interaction": "user_interaction"
-        }
-    )
+    analysis_results = {
+        "financial_analysis": financial_analysis,
+        "terms_analysis": terms_analysis,
+        "market_analysis": market_analysis
+    }
+    errors = [error for error in (financial_error, terms_error, market_error) if error]
+    return analysis_results, errors
+
+async def _map_reduce_analysis(
+    model,
+    chunks: List[Dict[str, Any]],
+    timeout: float,
+    labels: Optional[Dict[str, Any]] = None,
+    facts: Optional[List[Dict[str, Any]]] = None,
+    fact_offset: int = 0
+):
+    """
+    Analyze each chunk in parallel and merge the partial results section by section.
+
+    Each chunk's prompts list only the facts that fall inside it; fact_offset maps fact
+    offsets onto the chunked text.
+    """
+    semaphore = asyncio.Semaphore(ANALYSIS_MAP_CONCURRENCY)
     
-    workflow.add_edge("user_interaction", END)
-    workflow.set_entry_point("document_processor")
+    async def analyze_chunk(chunk):
+        chunk_facts = [fact for fact in facts or [] if chunk["start"] <= fact["start"] + fact_offset < chunk["end"]]
+        async with semaphore:
+            return await _analyze_text(
+                model, chunk["text"], timeout, {**(labels or {}), "chunk": chunk["index"]}, chunk_facts, chunk["tokens"]
+            )
     
-    return workflow.compile()
-
-def extract_json(text):
-    """Extract JSON from text."""
-    # Try to extract JSON block if present
-    json_match = re.search(r"```(?:json)?\s*([\s\S]*?)\s*```", text)
-    if json_match:
-        text = json_match.group(1)
+    partials = await asyncio.gather(*(analyze_chunk(chunk) for chunk in chunks))
     
-    # Clean up the text to make it valid JSON
-    text = text.strip()
-    if text.startswith('```') and text.endswith('```'):
-        text = text[3:-3].strip()
+    errors = []
+    for chunk, (_, chunk_errors) in zip(chunks, partials):
+        errors.extend(f"Chunk {chunk['index']}: {error}" for error in chunk_errors)
     
-    try:
-        return json.loads(text)
-    except json.JSONDecodeError:
-        return None
-from typing import Dict, List, Any, TypedDict
-from langchain_core.messages import HumanMessage, AIMessage
-from langgraph.graph import StateGraph, END
-from langchain_openai import ChatOpenAI
-import json
-import logging
-import os
-from dotenv import load_dotenv
-import re
-import PyPDF2
-import io
+    return _merge_sections([result for result, _ in partials]), errors
 
-load_dotenv(override=True)
+def _merge_sections(partials: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge the financial, terms and market sections of several partial analyses."""
+    return {
+        "financial_analysis": merge_partial_results([result["financial_analysis"] for result in partials], DEFAULT_FINANCIAL_ANALYSIS),
+        "terms_analysis": merge_partial_results([result["terms_analysis"] for result in partials], DEFAULT_TERMS_ANALYSIS),
+        "market_analysis": merge_partial_results([result["market_analysis"] for result in partials], DEFAULT_MARKET_ANALYSIS)
+    }
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, 
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-logger = logging.getLogger(__name__)
+def document_cache_key(doc_id: str, content: str) -> str:
+    """Cache key for one document's section analyses."""
+    return make_cache_key("document_analysis", PROMPT_VERSION, LLM_MODEL, CHUNKING_VERSION, doc_id, content)
 
-# Define state structure
-class AgentState(TypedDict):
-    messages: List[Any]  # Store conversation
-    documents: Dict[str, Any]  # Store documents
-    analysis_results: Dict[str, Any]  # Store analysis results
-    final_report: Dict[str, Any]  # Final output
+async def _analyze_document(model, doc_id: str, content: str):
+    """
+    Analyze a single document, reusing its cached sections when the same file was seen before.
+
+    Documents that fit in one chunk keep the single-pass prompts; larger ones are map-reduced.
+    """
+    cache_key = document_cache_key(doc_id, content)
+    if RESULT_CACHE_ENABLED:
+        cached = await asyncio.to_thread(get_document_cache().get, cache_key)
+        if cached is not None:
+            logger.info(f"Reusing cached analysis for {doc_id}")
+            return cached, []
+    
+    header = f"DOCUMENT {doc_id}:\n"
+    document_text = f"{header}{content}\n\n"
+    labels = {"document": doc_id}
+    # Offsets are into the document content, so they stay meaningful to the reader
+    facts = await asyncio.to_thread(extract_facts, content) if FACT_SHEET_MODE != "off" else []
+    # Tokenizing a large filing takes a while; keep it off the event loop
+    chunks = await asyncio.to_thread(chunk_text, document_text)
+    if len(chunks) <= 1:
+        text_tokens = sum(chunk["tokens"] for chunk in chunks)
+        analysis_results, errors = await _analyze_text(model, document_text, ANALYSIS_CALL_TIMEOUT, labels, facts, text_tokens)
+    else:
+        logger.info(f"{doc_id} exceeds {CHUNK_MAX_TOKENS} tokens, analyzing {len(chunks)} chunks in parallel")
+        analysis_results, errors = await _map_reduce_analysis(
+            model, chunks, ANALYSIS_CALL_TIMEOUT, labels, facts, fact_offset=len(header)
+        )
+    
+    # Sections that fell back to defaults are not cached so they are retried next time
+    if RESULT_CACHE_ENABLED and not errors:
+        await asyncio.to_thread(get_document_cache().set, cache_key, analysis_results)
+    return analysis_results, errors
 
-def extract_text_from_pdf(pdf_content):
-    """Extract text from PDF binary content."""
+async def analysis_engine(state: AgentState) -> Dict:
+    """Analyze documents using LLM, running the financial, terms and market prompts concurrently."""
     try:
-        # Create a file-like object from the binary content
-        pdf_file = io.BytesIO(pdf_content)
+        logger.info("Starting document analysis")
+        documents = state["documents"]
         
-        # Create a PDF reader object
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
+        model = get_llm()
         
-        # Extract text from each page
-        text = ""
-        for page_num in range(len(pdf_reader.pages)):
-            page = pdf_reader.pages[page_num]
-            text += page.extract_text() + "\n\n"
+        # Each document is its own branch, so latency follows the slowest document
+        # and an unchanged document is served from the per-document cache
+        semaphore = asyncio.Semaphore(DOCUMENT_ANALYSIS_CONCURRENCY)
         
-        logger.info(f"Successfully extracted text from PDF, {len(text)} characters")
-        return text
-    except Exception as e:
-        logger.error(f"Error extracting text from PDF: {str(e)}")
-        return None
-
-def document_processor(state: AgentState) -> Dict:
-    """Process uploaded documents."""
-    try:
-        logger.info("Starting document processing")
-        documents = state.get("documents", {})
+        async def analyze_document(doc_id, doc_info):
+            async with semaphore:
+                return await _analyze_document(model, doc_id, doc_info.get("content", ""))
         
-        if documents:
-            logger.info(f"Processing {len(documents)} documents")
-            return {"documents": documents}
+        doc_ids = list(documents)
+        outcomes = await asyncio.gather(*(analyze_document(doc_id, documents[doc_id]) for doc_id in doc_ids))
+        
+        if len(outcomes) == 1:
+            analysis_results, errors = outcomes[0]
         else:
-            logger.info("No documents found in state")
-            return {"documents": {}, "errors": ["No documents found in state"]}
+            errors = [f"{doc_id}: {error}" for doc_id, (_, doc_errors) in zip(doc_ids, outcomes) for error in doc_errors]
+            analysis_results = _merge_sections([result for result, _ in outcomes])
+            analysis_results["document_analyses"] = {doc_id: result for doc_id, (result, _) in zip(doc_ids, outcomes)}
+        
+        logger.info(f"Analysis of {len(doc_ids)} documents completed successfully")
+        return {"analysis_results": analysis_results, "errors": errors}
     except Exception as e:
-        logger.error(f"Error in document processor: {str(e)}", exc_info=True)
-        return {"documents": {}, "errors": [f"Document processing failed: {str(e)}"]}
+        logger.error(f"Error in analysis engine: {str(e)}", exc_info=True)
+        return {"analysis_results": {}, "errors": [f"Analysis failed: {str(e)}"]}
 
-def analysis_engine(state: AgentState) -> Dict:
-    """Analyze documents using LLM."""
+async def economy_analysis(state: AgentState) -> Dict:
+    """Produce every analysis section and the report in one structured LLM call."""
     try:
-        logger.info("Starting document analysis")
+        logger.info("Starting economy analysis")
         documents = state["documents"]
+        model = get_llm()
         
-        # Use LLM to analyze all documents together
-        model = ChatOpenAI(
-            model="gpt-4o-mini",
-            api_key=os.getenv("OPENAI_API_KEY")
-        )
-        
-        # Prepare document content for analysis
-        document_texts = []
+        # Facts are extracted per document, as in thorough mode, and placed on the
+        # combined text by each document's offset in it
+        pieces = []
+        facts = []
+        offset = 0
         for doc_id, doc_info in documents.items():
+            header = f"DOCUMENT {doc_id}:\n"
             content = doc_info.get("content", "")
-            document_texts.append(f"DOCUMENT {doc_id}:\n{content}\n\n")
-        
-        combined_docs = "\n".join(document_texts)
-        
-        # Financial analysis
-        financial_response = model.invoke(
-            [
-                HumanMessage(content=f"""
-                Analyze the financial aspects in these documents:
-                
-                {combined_docs}
-                
-                Extract and return ONLY a JSON object with these fields:
-                - "valuation_assessment": Extract any valuation information or "unknown" if not found
-                - "projection_realism": Information about growth projections or "unknown" if not found
-                - "risk_factors": List of risk factors or ["unknown"] if not found
-                
-                Return ONLY the JSON.
-                """)
-            ]
-        )
-        
-        # Terms analysis
-        terms_response = model.invoke(
-            [
-                HumanMessage(content=f"""
-                Analyze the investment terms in these documents:
-                
-                {combined_docs}
-                
-                Extract and return ONLY a JSON object with these fields:
-                - "unusual_terms": List any unusual terms or ["unknown"] if not found
-                - "favorable_terms": List favorable terms or ["unknown"] if not found
-                - "recommended_negotiation_points": List recommended negotiation points or ["unknown"] if not found
-                
-                Return ONLY the JSON.
-                """)
-            ]
-        )
-        
-        # Market analysis
-        market_response = model.invoke(
-            [
-                HumanMessage(content=f"""
-                Extract market information from these documents:
-                
-                {combined_docs}
-                
-                Return ONLY a JSON object with these fields:
-                - "market_size": Any market size information or "unknown" if not found
-                - "competition": Information about competitors or "unknown" if not found
-                
-                Return ONLY the JSON.
-                """)
-            ]
-        )
-        
-        # Parse JSON responses
-        try:
-            financial_analysis = extract_json(financial_response.content)
-            if not financial_analysis:
-                financial_analysis = {
-                    "valuation_assessment": "unknown",
-                    "projection_realism": "unknown",
-                    "risk_factors": ["unknown"]
-                }
-            
-            terms_analysis = extract_json(terms_response.content)
-            if not terms_analysis:
-                terms_analysis = {
-                    "unusual_terms": ["unknown"],
-                    "favorable_terms": ["unknown"],
-                    "recommended_negotiation_points": ["unknown"]
-                }
-            
-            market_analysis = extract_json(market_response.content)
-            if not market_analysis:
-                market_analysis = {
-                    "market_size": "unknown",
-                    "competition": "unknown"
-                }
-        except Exception as e:
-            logger.error(f"Error parsing LLM responses: {str(e)}")
-            financial_analysis = {"valuation_assessment": "unknown", "projection_realism": "unknown", "risk_factors": ["unknown"]}
-            terms_analysis = {"unusual_terms": ["unknown"], "favorable_terms": ["unknown"], "recommended_negotiation_points": ["unknown"]}
-            market_analysis = {"market_size": "unknown", "competition": "unknown"}
-        
-        analysis_results = {
-            "financial_analysis": financial_analysis,
-            "terms_analysis": terms_analysis,
-            "market_analysis": market_analysis
+            if FACT_SHEET_MODE != "off":
+                document_facts = await asyncio.to_thread(extract_facts, content)
+                facts.extend((offset + len(header), fact) for fact in document_facts)
+            piece = f"{header}{content}\n\n"
+            pieces.append(piece)
+            offset += len(piece) + 1
+        combined_docs = "\n".join(pieces)
+        defaults = {
+            "financial_analysis": DEFAULT_FINANCIAL_ANALYSIS,
+            "terms_analysis": DEFAULT_TERMS_ANALYSIS,
+            "market_analysis": DEFAULT_MARKET_ANALYSIS,
+            "report": {}
         }
         
-        logger.info("Analysis completed successfully")
-        return {"analysis_results": analysis_results}
+        # Text too large for one call is screened chunk by chunk and merged
+        chunks = await asyncio.to_thread(chunk_text, combined_docs)
+        semaphore = asyncio.Semaphore(ANALYSIS_MAP_CONCURRENCY)
+        
+        async def screen_chunk(chunk):
+            chunk_facts = [fact for fact_offset, fact in facts if chunk["start"] <= fact["start"] + fact_offset < chunk["end"]]
+            fact_sheet = render_prompt("fact_sheet", facts=render_fact_sheet(chunk_facts)) if chunk_facts else ""
+            prompt = render_document_prompt("economy_analysis", chunk["text"], fact_sheet)
+            labels = {"chunk": chunk["index"]} if len(chunks) > 1 else None
+            async with semaphore:
+                return await _run_analysis(model, "economy", prompt, EconomyAnalysis, defaults, ECONOMY_CALL_TIMEOUT, labels)
+        
+        outcomes = await asyncio.gather(*(screen_chunk(chunk) for chunk in chunks))
+        errors = [error for _, error in outcomes if error]
+        analysis_results = _merge_sections([result for result, _ in outcomes])
+        reports = [result["report"] for result, _ in outcomes if result["report"]]
+        final_report = merge_partial_results(reports, {}) if len(reports) > 1 else (reports[0] if reports else {})
+        
+        logger.info("Economy analysis completed")
+        return {"analysis_results": analysis_results, "final_report": final_report, "errors": errors}
     except Exception as e:
-        logger.error(f"Error in analysis engine: {str(e)}", exc_info=True)
-        return {"analysis_results": {}, "errors": [f"Analysis failed: {str(e)}"]}
+        logger.error(f"Error in economy analysis: {str(e)}", exc_info=True)
+        return {"analysis_results": {}, "final_report": {}, "errors": [f"Analysis failed: {str(e)}"]}
 
-def report_generator(state: AgentState) -> Dict:
+async def report_generator(state: AgentState) -> Dict:
     """Generate final due diligence report using LLM."""
     try:
         logger.info("Starting report generation")
         analysis_results = state["analysis_results"]
         
         # Use LLM to generate comprehensive report
-        model = ChatOpenAI(
-            model="gpt-4o-mini",
-            api_key=os.getenv("OPENAI_API_KEY")
-        )
-        
-        analysis_json = json.dumps(analysis_results, indent=2)
+        model = get_llm()
         
-        report_response = model.invoke(
-            [
-                HumanMessage(content=f"""
-                Generate a comprehensive due diligence report based on this analysis:
-                
-                {analysis_json}
-                
-                Return ONLY a JSON object with these fields:
-                - "executive_summary": A summary of the overall findings
-                - "financial_analysis": A summary of the financial findings
-                - "terms_analysis": A summary of the terms findings
-                - "market_analysis": A summary of the market findings
-                - "recommendation": A final recommendation based on the findings
-                
-                Return ONLY the JSON.
-                """)
-            ]
-        )
+        # Multi-document runs synthesize from the per-document findings so conflicts stay visible
+        document_analyses = analysis_results.get("document_analyses")
+        if document_analyses:
+            report_prompt = render_prompt("synthesis_report", analysis_json=json.dumps(document_analyses, indent=2))
+        else:
+            report_prompt = render_prompt("report", analysis_json=json.dumps(analysis_results, indent=2))
         
-        # Parse JSON response
+        errors = []
         try:
-            final_report = extract_json(report_response.content)
-            if not final_report:
-                # Create basic report if parsing fails
-                final_report = {
-                    "executive_summary": "Analysis completed but report generation had issues.",
-                    "financial_analysis": analysis_results.get("financial_analysis", {}),
-                    "terms_analysis": analysis_results.get("terms_analysis", {}),
-                    "market_analysis": analysis_results.get("market_analysis", {}),
-                    "recommendation": "Review the analysis results manually."
-                }
-        except Exception as e:
-            logger.error(f"Error parsing report response: {str(e)}")
+            report = await ainvoke_structured(model, [HumanMessage(content=report_prompt)], DueDiligenceReport)
+            final_report = report.model_dump()
+        except StructuredOutputError as e:
+            # Create basic report if the model never produced a valid one
+            logger.error(f"Report generation: {str(e)}")
+            errors.append(f"Report generation returned invalid output: {str(e)}")
             final_report = {
                 "executive_summary": "Analysis completed but report generation had issues.",
                 "financial_analysis": analysis_results.get("financial_analysis", {}),
@@ -578,42 +405,46 @@ def report_generator(state: AgentState) -> Dict:
             }
         
         logger.info("Report generation completed")
-        return {"final_report": final_report}
+        return {"final_report": final_report, "errors": errors}
     except Exception as e:
         logger.error(f"Error in report generator: {str(e)}", exc_info=True)
         return {"final_report": {}, "errors": [f"Report generation failed: {str(e)}"]}
 
-def user_interaction(state: AgentState) -> Dict:
+async def user_interaction(state: AgentState) -> Dict:
     """Handle user interaction and responses."""
     try:
         logger.info("Starting user interaction")
         last_message = state["messages"][-1]
         
-        model = ChatOpenAI(
-            model="gpt-4o-mini",
-            api_key=os.getenv("OPENAI_API_KEY")
-        )
+        model = get_llm()
         
         if "final_report" in state and state["final_report"]:
             report = state["final_report"]
             report_str = json.dumps(report, indent=2)
             
-            response = model.invoke(
-                [
-                    HumanMessage(content=f"""
-                    Based on this due diligence report, answer the user's query: "{last_message.content}"
-                    
-                    Report:
-                    {report_str}
-                    
-                    Only use information from the report. If information is not available, say it's unknown.
-                    """)
-                ]
-            )
+            # Ground the answer in the passages most relevant to the question, not just the report
+            passages = []
+            if RETRIEVAL_ENABLED and state.get("retrieval_index"):
+                passages = await retrieve(
+                    state["retrieval_index"],
+                    last_message.content,
+                    _document_texts(state.get("documents") or {})
+                )
+            
+            if passages:
+                prompt = render_prompt(
+                    "grounded_user_query",
+                    query=last_message.content,
+                    report_str=report_str,
+                    passages=format_passages(passages)
+                )
+            else:
+                prompt = render_prompt("user_query", query=last_message.content, report_str=report_str)
+            response = await model.ainvoke([HumanMessage(content=prompt)])
         else:
-            response = model.invoke(
+            response = await model.ainvoke(
                 [
-                    HumanMessage(content=f"I don't have enough information to answer your query: {last_message.content}")
+                    HumanMessage(content=render_prompt("no_report", query=last_message.content))
                 ]
             )
         
@@ -633,14 +464,14 @@ def should_continue(state: AgentState) -> str:
         return "report_generator"
     return "user_interaction"
 
-def create_due_diligence_graph():
-    """Create the LangGraph workflow."""
+def create_due_diligence_graph(checkpointer=None):
+    """Create the LangGraph workflow, checkpointing its state to checkpointer if given."""
     workflow = StateGraph(AgentState)
     
-    workflow.add_node("document_processor", document_processor)
-    workflow.add_node("analysis_engine", analysis_engine)
-    workflow.add_node("report_generator", report_generator)
-    workflow.add_node("user_interaction", user_interaction)
+    workflow.add_node("document_processor", instrument_node("document_processor", document_processor))
+    workflow.add_node("analysis_engine", instrument_node("analysis_engine", analysis_engine))
+    workflow.add_node("report_generator", instrument_node("report_generator", report_generator))
+    workflow.add_node("user_interaction", instrument_node("user_interaction", user_interaction))
     
     workflow.add_conditional_edges(
         "document_processor",
@@ -672,72 +503,166 @@ def create_due_diligence_graph():
     workflow.add_edge("user_interaction", END)
     workflow.set_entry_point("document_processor")
     
-    return workflow.compile()
-
-def extract_json(text):
-    """Extract JSON from text."""
-    # Try to extract JSON block if present
-    json_match = re.search(r"```(?:json)?\s*([\s\S]*?)\s*```", text)
-    if json_match:
-        text = json_match.group(1)
+    return workflow.compile(checkpointer=checkpointer)
+
+def create_economy_graph(checkpointer=None):
+    """Create the single-call workflow: documents are screened and reported on in one LLM call."""
+    workflow = StateGraph(AgentState)
     
-    # Clean up the text to make it valid JSON
-    text = text.strip()
-    if text.startswith('```') and text.endswith('```'):
-        text = text[3:-3].strip()
+    workflow.add_node("document_processor", instrument_node("document_processor", document_processor))
+    workflow.add_node("economy_analysis", instrument_node("economy_analysis", economy_analysis))
     
-    try:
-        return json.loads(text)
-    except json.JSONDecodeError:
-        return None
+    workflow.add_edge("document_processor", "economy_analysis")
+    workflow.add_edge("economy_analysis", END)
+    workflow.set_entry_point("document_processor")
+    
+    return workflow.compile(checkpointer=checkpointer)
+
+def get_due_diligence_graph(mode: PipelineMode = PIPELINE_THOROUGH):
+    """
+    Return the process-wide compiled workflow for a pipeline mode, compiling it on first use.
+
+    Analysis runs are not checkpointed; sessions are seeded from their results afterwards.
+    """
+    if mode not in _due_diligence_graphs:
+        logger.info(f"Compiling {mode} due diligence graph")
+        if mode == PIPELINE_ECONOMY:
+            _due_diligence_graphs[mode] = create_economy_graph()
+        else:
+            _due_diligence_graphs[mode] = create_due_diligence_graph()
+    return _due_diligence_graphs[mode]
+
+def get_session_graph():
+    """
+    Return the workflow that stores and resumes sessions, compiled on first use with the
+    session checkpoint store, or None when sessions are disabled or the store is not open.
+    """
+    if SESSION_GRAPH not in _due_diligence_graphs:
+        checkpointer = get_checkpointer()
+        if checkpointer is None:
+            return None
+        logger.info("Compiling session graph")
+        _due_diligence_graphs[SESSION_GRAPH] = create_due_diligence_graph(checkpointer)
+    return _due_diligence_graphs[SESSION_GRAPH]
+
+def reset_due_diligence_graphs():
+    """Drop the compiled workflows, e.g. after the checkpoint store the session graph uses was closed."""
+    _due_diligence_graphs.clear()
+
+def _as_documents(document_content: DocumentInput) -> Dict[str, str]:
+    """Normalize a single document's text or a name -> text mapping into a mapping."""
+    if isinstance(document_content, str):
+        return {DEFAULT_DOCUMENT_NAME: document_content}
+    return dict(document_content)
 
-async def run_due_diligence(document_content: str) -> Dict[str, Any]:
-    """Run due diligence analysis on document content."""
+def analysis_cache_key(document_content: DocumentInput, mode: PipelineMode = PIPELINE_THOROUGH) -> str:
+    """Cache key for a full analysis: document names and text, pipeline mode, prompt, model and chunking settings."""
+    version = PROMPT_VERSION if mode == PIPELINE_THOROUGH else f"{mode}:{PROMPT_VERSION}"
+    if isinstance(document_content, str):
+        return make_cache_key(version, LLM_MODEL, CHUNKING_VERSION, document_content)
+    parts = [part for name, text in document_content.items() for part in (name, text)]
+    return make_cache_key(version, LLM_MODEL, CHUNKING_VERSION, *parts)
+
+def _format_message(content: str) -> Dict[str, Any]:
+    """Format message for API response."""
+    return {
+        "role": "assistant",
+        "content": content
+    }
+
+def _node_event(node_name: str, update: Any) -> Dict[str, Any]:
+    """Summarize a node's state update as a JSON-serializable progress event."""
+    event = {"event": "node", "node": node_name}
+    if isinstance(update, dict):
+        for key in ("analysis_results", "final_report", "errors"):
+            if update.get(key):
+                event[key] = update[key]
+        if node_name == "user_interaction" and update.get("messages"):
+            event["message"] = update["messages"][-1].content
+    return event
+
+async def stream_due_diligence(
+    document_content: DocumentInput,
+    stream_tokens: bool = False,
+    mode: PipelineMode = PIPELINE_THOROUGH
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run due diligence analysis, yielding progress events as the graph executes.
+
+    Yields a {"event": "node"} event as each node completes, an {"event": "analysis"}
+    event as each financial/terms/market sub-analysis finishes, {"event": "token"}
+    events for the report text when stream_tokens is set, and finally a single
+    {"event": "result"} event carrying the same payload run_due_diligence returns.
+
+    document_content is either one document's text or a mapping of document name to
+    text; each document is analyzed separately and the report synthesizes across them.
+    With mode="economy" all sections and the report come from a single LLM call.
+
+    When sessions are enabled a completed run opens a session (see start_session),
+    returned as the result's "session_id", so ask_session can answer follow-up questions later.
+    """
     logger.info("Starting due diligence analysis")
-    
-    def format_message(content: str) -> Dict[str, Any]:
-        """Format message for API response."""
-        return {
-            "role": "assistant",
-            "content": content
-        }
+    index_task = None
     
     try:
-        # Create agent
-        due_diligence_agent = create_due_diligence_graph()
+        # Reuse the compiled agent
+        due_diligence_agent = get_due_diligence_graph(mode)
+        
+        # Index the passages for the session's follow-up questions while the analysis
+        # runs; without sessions nothing would read the index
+        index_key = ""
+        if RETRIEVAL_ENABLED and get_session_graph() is not None:
+            documents = _as_documents(document_content)
+            index_key = retrieval_index_key(documents)
+            index_task = asyncio.ensure_future(get_index(index_key, documents))
         
         # Set up initial state with document
         initial_state = {
             "messages": [HumanMessage(content="Analyze this investment document.")],
             "documents": {
-                "uploaded_document.txt": {
+                doc_id: {
                     "type": "investment_document", 
-                    "content": document_content
+                    "content": content
                 }
+                for doc_id, content in _as_documents(document_content).items()
             },
             "analysis_results": {},
-            "final_report": {}
+            "final_report": {},
+            "retrieval_index": index_key,
+            "errors": []
         }
         
         # Execute the graph
         captured_analysis_results = None
         captured_final_report = None
         llm_response = None
+        errors = []
         
-        for step in due_diligence_agent.stream(initial_state):
-            logger.info("Processing step in graph")
+        stream_modes = ["updates", "custom"]
+        if stream_tokens:
+            stream_modes.append("messages")
+        
+        # stream_mode, not mode: mode is the pipeline mode argument
+        async for stream_mode, chunk in due_diligence_agent.astream(initial_state, stream_mode=stream_modes):
+            if stream_mode == "custom":
+                yield chunk
+                continue
+            
+            if stream_mode == "messages":
+                message, metadata = chunk
+                if metadata.get("langgraph_node") in ("report_generator", "economy_analysis") and message.content:
+                    yield {"event": "token", "content": message.content}
+                continue
             
-            # Extract state
-            current_state = None
-            if hasattr(step, 'state'):
-                current_state = step.state
-            elif isinstance(step, dict) and 'state' in step:
-                current_state = step['state']
-            elif isinstance(step, dict):
-                current_state = step
+            # Each update maps the node that just ran to the state update it produced
+            for node_name, current_state in chunk.items():
+                logger.info(f"Processing step in graph: {node_name}")
+                yield _node_event(node_name, current_state)
+                
+                # Capture data during execution
+                if not current_state or not isinstance(current_state, dict):
+                    continue
                 
-            # Capture data during execution
-            if current_state and isinstance(current_state, dict):
                 if 'analysis_results' in current_state and current_state['analysis_results']:
                     captured_analysis_results = current_state['analysis_results']
                 
@@ -748,10 +673,13 @@ async def run_due_diligence(document_content: str) -> Dict[str, Any]:
                     last_message = current_state['messages'][-1]
                     if hasattr(last_message, 'content'):
                         llm_response = last_message.content
+                
+                if current_state.get('errors'):
+                    errors.extend(current_state['errors'])
         
         # Construct response
         if captured_final_report and captured_analysis_results:
-            return {
+            result = {
                 "completed": True,
                 "synthesis_report": captured_final_report,
                 "contract_analysis": captured_analysis_results.get("terms_analysis", {}),
@@ -761,33 +689,27 @@ async def run_due_diligence(document_content: str) -> Dict[str, Any]:
                     "mitigation_suggestions": captured_analysis_results.get("terms_analysis", {}).get("recommended_negotiation_points", [])
                 },
                 "legal_compliance": {},
-                "messages": [format_message(llm_response)] if llm_response else [],
-                "errors": []
+                "messages": [_format_message(llm_response)] if llm_response else [],
+                "errors": errors,
+                "document_analyses": captured_analysis_results.get("document_analyses", {})
             }
         else:
             # Direct analysis fallback
-            model = ChatOpenAI(
-                model="gpt-4o-mini",
-                api_key=os.getenv("OPENAI_API_KEY")
-            )
+            model = get_llm()
             
-            response = model.invoke(
+            if isinstance(document_content, str):
+                combined_content = document_content
+            else:
+                combined_content = "\n\n".join(
+                    f"--- DOCUMENT: {doc_id} ---\n{content}" for doc_id, content in document_content.items()
+                )
+            response = await model.ainvoke(
                 [
-                    HumanMessage(content=f"""
-                    Analyze this investment document for due diligence:
-                    
-                    {document_content}
-                    
-                    Create a effective and concised analysis that focuses on only key insights. Only 2 lines each and give 1 overall recommendation.
-                    1. Financial assessment
-                    2. Terms analysis
-                    3. Risk assessment
-                    4. Overall recommendation
-                    """)
+                    HumanMessage(content=render_prompt("direct_analysis", document_content=combined_content))
                 ]
             )
             
-            return {
+            result = {
                 "completed": True,
                 "synthesis_report": {
                     "executive_summary": "Analysis performed directly with LLM",
@@ -797,21 +719,132 @@ async def run_due_diligence(document_content: str) -> Dict[str, Any]:
                 "financial_analysis": {},
                 "risk_assessment": {},
                 "legal_compliance": {},
-                "messages": [format_message(response.content)],
+                "messages": [_format_message(response.content)],
                 "errors": []
             }
     except Exception as e:
         logger.error(f"Error during due diligence analysis: {str(e)}", exc_info=True)
-        return {
+        result = {
             "completed": False,
             "errors": [f"Analysis failed: {str(e)}"],
             "synthesis_report": {
                 "executive_summary": f"Error occurred: {str(e)}",
                 "recommendation": "Please try again"
             },
-            "messages": [format_message(f"Error during analysis: {str(e)}")],
+            "messages": [_format_message(f"Error during analysis: {str(e)}")],
             "contract_analysis": {},
             "financial_analysis": {},
             "risk_assessment": {},
             "legal_compliance": {}
-        }
\ No newline at end of file
+        }
+    
+    result["session_id"] = None
+    if result["completed"]:
+        result["session_id"] = await start_session(result, document_content, index_task)
+    elif index_task is not None:
+        index_task.cancel()
+    yield {"event": "result", "result": result}
+
+async def run_due_diligence(
+    document_content: DocumentInput,
+    progress_callback: Optional[Callable[[str], Awaitable[None]]] = None,
+    mode: PipelineMode = PIPELINE_THOROUGH
+) -> Dict[str, Any]:
+    """
+    Run due diligence analysis on document content.
+
+    If progress_callback is given, it is awaited with each graph node's name as the node completes.
+    """
+    result = None
+    async for event in stream_due_diligence(document_content, mode=mode):
+        if event["event"] == "node" and progress_callback:
+            await progress_callback(event["node"])
+        elif event["event"] == "result":
+            result = event["result"]
+    return result
+
+async def start_session(
+    result: Dict[str, Any],
+    document_content: DocumentInput,
+    index_task: Optional[Awaitable[Any]] = None
+) -> Optional[str]:
+    """
+    Open a session over an analysis of document_content, fresh or served from the result cache.
+
+    Only the report and the documents' passage index are needed to answer questions,
+    so the session is seeded with them and never holds the documents themselves.
+    The index is built unless index_task, a build already under way, is given. The
+    session is written in the background and its ID returned at once; ask_session
+    waits for the write. Returns None when sessions are disabled.
+    """
+    session_graph = get_session_graph()
+    if session_graph is None:
+        return None
+    session_id = new_session_id()
+    write_session_in_background(
+        session_id, _seed_session(session_graph, session_id, result, _as_documents(document_content), index_task)
+    )
+    return session_id
+
+async def _seed_session(
+    session_graph,
+    session_id: str,
+    result: Dict[str, Any],
+    documents: Dict[str, str],
+    index_task: Optional[Awaitable[Any]]
+):
+    index_key = ""
+    if RETRIEVAL_ENABLED:
+        try:
+            key = retrieval_index_key(documents)
+            await (index_task if index_task is not None else get_index(key, documents))
+            index_key = key
+        except Exception as e:
+            # The session still answers from the report alone
+            logger.error(f"Error building retrieval index: {str(e)}", exc_info=True)
+    await touch_session(session_id)
+    # Seeded as if user_interaction had just run, so nothing is left pending
+    await session_graph.aupdate_state(
+        session_config(session_id),
+        {
+            "messages": [HumanMessage(content="Analyze this investment document.")] + [
+                AIMessage(content=message["content"]) for message in result.get("messages", [])
+            ],
+            "documents": {},
+            "analysis_results": {
+                "financial_analysis": result.get("financial_analysis", {}),
+                "terms_analysis": result.get("contract_analysis", {}),
+                "document_analyses": result.get("document_analyses", {})
+            },
+            "final_report": result.get("synthesis_report", {}),
+            "retrieval_index": index_key,
+            "errors": []
+        },
+        as_node="user_interaction"
+    )
+
+async def ask_session(session_id: str, question: str) -> Optional[str]:
+    """
+    Answer a follow-up question about a session's analysis, running only user_interaction.
+
+    The stored state is resumed with the question appended to its messages, so a
+    question costs one LLM call. Sessions from either pipeline mode are resumed on
+    the thorough graph, which has the user_interaction node; both share AgentState.
+    Returns None if the session does not exist.
+    """
+    session_graph = get_session_graph()
+    if session_graph is None:
+        return None
+    await wait_for_session_write(session_id)
+    config = session_config(session_id)
+    snapshot = await session_graph.aget_state(config)
+    if not snapshot.values:
+        return None
+    await touch_session(session_id)
+    
+    messages = list(snapshot.values.get("messages", [])) + [HumanMessage(content=question)]
+    state = await session_graph.ainvoke(
+        Command(update={"messages": messages}, goto="user_interaction"),
+        config
+    )
+    return state["messages"][-1].content
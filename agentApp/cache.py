@@ -0,0 +1,169 @@
+from typing import Any, Dict, Optional
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Result cache configuration
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", "analysis_cache.db")
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", str(7 * 24 * 3600)))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "1000"))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+_result_cache = None
+_document_cache = None
+
+def make_cache_key(*parts: str) -> str:
+    """Build a content-addressed cache key from the given parts."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8", errors="surrogatepass"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+class SQLiteCache:
+    """Key/value store in a local SQLite table with TTL expiry and size-bounded LRU eviction."""
+
+    def __init__(self, path: str, table: str, ttl_seconds: float, max_entries: int, max_bytes: int):
+        self.path = path
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                key TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL
+            )
+        """)
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_last_accessed ON {table} (last_accessed)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT payload, created_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET last_accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any):
+        """Store value under key, then evict expired and least recently used entries."""
+        payload = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, payload, size, created_at, last_accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        """Drop expired entries, then the oldest entries beyond the count and byte limits."""
+        evicted = self._conn.execute(
+            f"DELETE FROM {self.table} WHERE created_at < ?", (now - self.ttl_seconds,)
+        ).rowcount
+        evicted += self._conn.execute(
+            f"DELETE FROM {self.table} WHERE key IN ("
+            f"SELECT key FROM {self.table} ORDER BY last_accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        ).rowcount
+        evicted += self._conn.execute(
+            f"DELETE FROM {self.table} WHERE key IN ("
+            f"SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY last_accessed DESC) AS running_size "
+            f"FROM {self.table}) WHERE running_size > ?)",
+            (self.max_bytes,)
+        ).rowcount
+        if evicted:
+            self.evictions += evicted
+            logger.info(f"Evicted {evicted} entries from cache table {self.table}")
+
+    def clear(self):
+        """Remove every entry from the cache."""
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss/eviction counters and current size."""
+        with self._lock:
+            entries, size = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}"
+            ).fetchone()
+        return {
+            "entries": entries,
+            "bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+    def close(self):
+        """Close the underlying SQLite connection."""
+        with self._lock:
+            self._conn.close()
+
+def get_result_cache() -> SQLiteCache:
+    """Return the shared cache of final analysis results, opening it on first use."""
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = SQLiteCache(
+            RESULT_CACHE_PATH,
+            "analysis_results",
+            ttl_seconds=RESULT_CACHE_TTL,
+            max_entries=RESULT_CACHE_MAX_ENTRIES,
+            max_bytes=RESULT_CACHE_MAX_BYTES
+        )
+    return _result_cache
+
+def get_document_cache() -> SQLiteCache:
+    """Return the shared cache of per-document analysis results, opening it on first use."""
+    global _document_cache
+    if _document_cache is None:
+        _document_cache = SQLiteCache(
+            RESULT_CACHE_PATH,
+            "document_analyses",
+            ttl_seconds=RESULT_CACHE_TTL,
+            max_entries=RESULT_CACHE_MAX_ENTRIES,
+            max_bytes=RESULT_CACHE_MAX_BYTES
+        )
+    return _document_cache
+
+def close_result_cache():
+    """Close the shared result caches, if they were opened."""
+    global _result_cache, _document_cache
+    if _result_cache is not None:
+        _result_cache.close()
+        _result_cache = None
+    if _document_cache is not None:
+        _document_cache.close()
+        _document_cache = None
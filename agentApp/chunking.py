@@ -0,0 +1,157 @@
+from typing import Any, Dict, List, Tuple
+from functools import lru_cache
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+# Chunking configuration
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "12000"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "400"))
+
+# Blank lines, page breaks and document headers are preferred split points
+SECTION_BOUNDARY = re.compile(r"\n\s*\n|\f|(?=\n--- DOCUMENT: )")
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    """Return a tiktoken encoding, or None if tiktoken is unavailable."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning(f"tiktoken unavailable, approximating token counts: {str(e)}")
+        return None
+
+def count_tokens(text: str) -> int:
+    """Count tokens in text, approximating as 4 characters per token without tiktoken."""
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+def _split_sections(text: str) -> List[Tuple[int, int]]:
+    """Split text into contiguous (start, end) spans at section boundaries."""
+    spans = []
+    start = 0
+    for match in SECTION_BOUNDARY.finditer(text):
+        end = match.end()
+        if end > start:
+            spans.append((start, end))
+            start = end
+    if start < len(text):
+        spans.append((start, len(text)))
+    return spans
+
+def _split_oversized(text: str, start: int, end: int, max_tokens: int) -> List[Tuple[int, int, int]]:
+    """Split a span that exceeds max_tokens at line breaks, then by character windows."""
+    pieces = []
+    line_start = start
+    for match in re.finditer(r"\n", text[start:end]):
+        line_end = start + match.end()
+        pieces.append((line_start, line_end))
+        line_start = line_end
+    if line_start < end:
+        pieces.append((line_start, end))
+
+    spans = []
+    for piece_start, piece_end in pieces:
+        tokens = count_tokens(text[piece_start:piece_end])
+        if tokens <= max_tokens:
+            spans.append((piece_start, piece_end, tokens))
+            continue
+        # A single line longer than a chunk: cut by characters, sized from its token density
+        window = max(1, int((piece_end - piece_start) * max_tokens / tokens * 0.9))
+        for window_start in range(piece_start, piece_end, window):
+            window_end = min(window_start + window, piece_end)
+            spans.append((window_start, window_end, count_tokens(text[window_start:window_end])))
+    return spans
+
+def chunk_text(text: str, max_tokens: int = None, overlap_tokens: int = None) -> List[Dict[str, Any]]:
+    """
+    Split text into token-bounded chunks that respect section boundaries.
+
+    Each chunk is a contiguous slice of the input, returned as a dict with its
+    index, text, token count and start/end character offsets. Consecutive chunks
+    share up to overlap_tokens of trailing sections so findings that straddle a
+    boundary are seen whole by at least one chunk.
+    """
+    max_tokens = max_tokens or CHUNK_MAX_TOKENS
+    overlap_tokens = CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+
+    sections = []
+    for start, end in _split_sections(text):
+        tokens = count_tokens(text[start:end])
+        if tokens > max_tokens:
+            sections.extend(_split_oversized(text, start, end, max_tokens))
+        else:
+            sections.append((start, end, tokens))
+
+    chunks = []
+    first = 0
+    while first < len(sections):
+        last = first
+        total = sections[first][2]
+        while last + 1 < len(sections) and total + sections[last + 1][2] <= max_tokens:
+            last += 1
+            total += sections[last][2]
+
+        start, end = sections[first][0], sections[last][1]
+        chunks.append({
+            "index": len(chunks),
+            "text": text[start:end],
+            "tokens": total,
+            "start": start,
+            "end": end
+        })
+        if last + 1 >= len(sections):
+            break
+
+        # Start the next chunk far enough back to carry the overlap, but always make progress
+        next_first = last + 1
+        carried = 0
+        while next_first - 1 > first and carried + sections[next_first - 1][2] <= overlap_tokens:
+            next_first -= 1
+            carried += sections[next_first][2]
+        first = next_first
+
+    return chunks
+
+def _is_unknown(value: Any) -> bool:
+    return value is None or value == "" or (isinstance(value, str) and value.strip().lower() == "unknown")
+
+def merge_partial_results(partials: List[Dict[str, Any]], defaults: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Merge per-chunk JSON analyses into one result with the same fields as defaults.
+
+    List fields are unioned in order of first appearance; string fields keep each
+    distinct known value, joined with "; ". Fields no chunk knew stay at their default.
+    """
+    merged = {}
+    keys = list(defaults.keys())
+    for partial in partials:
+        for key in partial:
+            if key not in keys:
+                keys.append(key)
+
+    for key in keys:
+        values = []
+        for partial in partials:
+            value = partial.get(key)
+            items = value if isinstance(value, list) else [value]
+            for item in items:
+                if _is_unknown(item):
+                    continue
+                if isinstance(item, (dict, list)):
+                    item = str(item)
+                if item not in values:
+                    values.append(item)
+
+        default = defaults.get(key, "unknown")
+        if not values:
+            merged[key] = list(default) if isinstance(default, list) else default
+        elif isinstance(default, list):
+            merged[key] = values
+        else:
+            merged[key] = "; ".join(str(value) for value in values)
+    return merged
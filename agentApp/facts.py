@@ -0,0 +1,169 @@
+from typing import Any, Dict, List, Optional
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on distinct facts kept per text; repeated facts are counted, not repeated
+FACT_SHEET_MAX_FACTS = int(os.getenv("FACT_SHEET_MAX_FACTS", "150"))
+# How far (characters) to look around a figure for the keyword it belongs to
+FACT_CONTEXT_CHARS = int(os.getenv("FACT_CONTEXT_CHARS", "80"))
+
+_SCALES = {
+    "k": 1e3, "thousand": 1e3,
+    "m": 1e6, "mm": 1e6, "mn": 1e6, "million": 1e6,
+    "b": 1e9, "bn": 1e9, "billion": 1e9,
+    "t": 1e12, "trillion": 1e12,
+}
+
+_CURRENCY_SYMBOLS = {
+    "$": "USD", "us$": "USD", "usd": "USD", "dollars": "USD",
+    "s$": "SGD", "sgd": "SGD",
+    "a$": "AUD", "aud": "AUD",
+    "c$": "CAD", "cad": "CAD",
+    "hk$": "HKD", "hkd": "HKD",
+    "€": "EUR", "eur": "EUR",
+    "£": "GBP", "gbp": "GBP",
+    "¥": "JPY", "jpy": "JPY",
+    "₹": "INR", "inr": "INR",
+}
+
+_QUALIFIERS = {
+    "yoy": "YoY", "y/y": "YoY", "year-over-year": "YoY", "year over year": "YoY",
+    "annually": "YoY", "per year": "YoY", "per annum": "YoY",
+    "mom": "MoM", "m/m": "MoM", "month-over-month": "MoM", "month over month": "MoM", "per month": "MoM",
+    "qoq": "QoQ", "q/q": "QoQ", "quarter-over-quarter": "QoQ", "quarter over quarter": "QoQ",
+    "wow": "WoW", "cagr": "CAGR",
+}
+
+_NUMBER = r"\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?"
+_SCALE = r"(?i:thousand|million|billion|trillion|mn|bn|mm|k|m|b|t)\b"
+_MONTH = r"(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\.?"
+_YEAR = r"(?:19|20)\d{2}"
+
+# One alternation so a document is scanned in a single pass. The leading guard only
+# lets the alternatives be tried at digits, currency signs and the start of words,
+# which is roughly 3x faster than trying every branch at every character of prose.
+_FACT_PATTERN = re.compile(
+    r"(?:(?=[\d$€£¥₹+\-])|\b(?=[A-Za-z]))(?:"
+    # $4.5M, US$ 1,200,000, €3 billion
+    rf"(?P<currency>(?P<cur_symbol>(?i:US\$|S\$|A\$|C\$|HK\$|USD|SGD|AUD|CAD|HKD|EUR|GBP|JPY|INR)|[$€£¥₹])\s?"
+    rf"(?P<cur_amount>{_NUMBER})(?:\s?(?P<cur_scale>{_SCALE}))?)"
+    # 10 million USD, 3.5bn dollars
+    rf"|(?P<currency_suffix>(?P<suf_amount>{_NUMBER})\s?(?P<suf_scale>{_SCALE})?\s?"
+    rf"(?P<suf_symbol>(?:USD|SGD|AUD|CAD|HKD|EUR|GBP|JPY|INR)\b|(?i:dollars)\b))"
+    # 180% YoY, -3.5 percent, 12% MoM
+    rf"|(?P<percentage>(?P<pct_value>[-+]?{_NUMBER})\s?(?:%|percent\b)"
+    r"(?:\s*\(?(?P<pct_qualifier>(?i:yoy|mom|qoq|wow|cagr|[ymq]/[ymq]|year[- ]over[- ]year|month[- ]over[- ]month"
+    r"|quarter[- ]over[- ]quarter|annually|per (?:year|month|annum)))\b\)?)?)"
+    # Q3 2024, FY2025, H1 2023, March 15, 2024, 2024-03-15, 15/03/2024, "by 2028"
+    rf"|(?P<date>\b(?:Q[1-4]\s?(?:FY\s?)?{_YEAR}|H[12]\s?{_YEAR}|FY\s?(?:{_YEAR}|\d{{2}})"
+    rf"|{_MONTH}\s+(?:\d{{1,2}},?\s+)?{_YEAR}|{_YEAR}-\d{{2}}-\d{{2}}|\d{{1,2}}/\d{{1,2}}/(?:{_YEAR}|\d{{2}})"
+    rf"|(?:(?<=in )|(?<=by )|(?<=since )|(?<=from )|(?<=until )|(?<=through )){_YEAR})\b)"
+    # seed, Series B, SAFE
+    r"|(?P<round>\b(?:(?i:pre-seed|seed|series [a-h]\+?|bridge round|convertible note|ipo)|SAFE)\b))"
+)
+
+# Words that say what a nearby figure measures
+_LABEL_PATTERN = re.compile(
+    r"\b(?i:post-money|pre-money|valuation|valued|ARR|MRR|revenue|sales|bookings|GMV|raised|raising|round"
+    r"|TAM|SAM|SOM|addressable market|market size|market|gross margin|margin|EBITDA|net income|profit|loss"
+    r"|burn|runway|cash|churn|retention|growth|growing|grew|customers|users|liquidation preference"
+    r"|dilution|option pool|discount|cap|price per share|headcount)\b"
+)
+
+_SENTENCE_BREAK = re.compile(r"[.!?]\s|\n")
+
+def _to_float(number: str) -> float:
+    return float(number.replace(",", ""))
+
+def _label(text: str, start: int, end: int) -> Optional[str]:
+    """
+    Return the keyword a figure describes.
+
+    A keyword right after the figure wins ("$20M post-money"), then the nearest one
+    before it in the same sentence ("ARR reached $1.2M"), then the first one after it.
+    """
+    after = text[end:end + FACT_CONTEXT_CHARS]
+    sentence_end = _SENTENCE_BREAK.search(after)
+    if sentence_end:
+        after = after[:sentence_end.start()]
+    following = _LABEL_PATTERN.search(after)
+    if following and not after[:following.start()].strip():
+        return following.group(0).lower()
+    
+    before = text[max(0, start - FACT_CONTEXT_CHARS):start]
+    breaks = list(_SENTENCE_BREAK.finditer(before))
+    if breaks:
+        before = before[breaks[-1].end():]
+    labels = _LABEL_PATTERN.findall(before)
+    if labels:
+        return labels[-1].lower()
+    return following.group(0).lower() if following else None
+
+def _fact_from_match(match: re.Match) -> Dict[str, Any]:
+    """Normalize one regex match into a fact dict (type, text, value and unit fields)."""
+    groups = match.groupdict()
+    if groups["currency"]:
+        scale = _SCALES.get((groups["cur_scale"] or "").lower(), 1)
+        return {
+            "type": "currency",
+            "value": _to_float(groups["cur_amount"]) * scale,
+            "unit": _CURRENCY_SYMBOLS.get(groups["cur_symbol"].lower(), groups["cur_symbol"].upper())
+        }
+    if groups["currency_suffix"]:
+        scale = _SCALES.get((groups["suf_scale"] or "").lower(), 1)
+        return {
+            "type": "currency",
+            "value": _to_float(groups["suf_amount"]) * scale,
+            "unit": _CURRENCY_SYMBOLS.get(groups["suf_symbol"].lower(), groups["suf_symbol"].upper())
+        }
+    if groups["percentage"]:
+        qualifier = groups["pct_qualifier"]
+        return {
+            "type": "percentage",
+            "value": _to_float(groups["pct_value"]),
+            "qualifier": _QUALIFIERS.get(qualifier.lower(), qualifier) if qualifier else None
+        }
+    if groups["date"]:
+        return {"type": "date"}
+    return {"type": "round", "value": " ".join(groups["round"].split()).title() if groups["round"] != "SAFE" else "SAFE"}
+
+def extract_facts(text: str, max_facts: int = FACT_SHEET_MAX_FACTS) -> List[Dict[str, Any]]:
+    """
+    Pull currency amounts, percentages, dates and funding rounds out of text without the LLM.
+
+    Each fact records its matched text, normalized value (currency amounts in units,
+    percentages as numbers), unit or growth qualifier where relevant, the nearby
+    keyword it most likely describes ("valuation", "arr", "market", ...) and the
+    [start, end) character offsets of its first occurrence. Facts repeated with the
+    same text and label are kept once with a count, and at most max_facts are returned.
+    """
+    facts: Dict[tuple, Dict[str, Any]] = {}
+    for match in _FACT_PATTERN.finditer(text):
+        matched = match.group(0).strip()
+        start, end = match.start(), match.start() + len(matched)
+        label = _label(text, start, end)
+        key = (matched, label)
+        if key in facts:
+            facts[key]["count"] += 1
+            continue
+        if len(facts) >= max_facts:
+            continue
+        fact = _fact_from_match(match)
+        fact.update({"text": matched, "label": label, "start": start, "end": end, "count": 1})
+        facts[key] = fact
+    return list(facts.values())
+
+def render_fact_sheet(facts: List[Dict[str, Any]]) -> str:
+    """Render facts one per line as '@offset type: text (label) xcount' for a prompt."""
+    lines = []
+    for fact in facts:
+        line = f"@{fact['start']} {fact['type']}: {fact['text']}"
+        if fact["label"]:
+            line += f" ({fact['label']})"
+        if fact["count"] > 1:
+            line += f" x{fact['count']}"
+        lines.append(line)
+    return "\n".join(lines)
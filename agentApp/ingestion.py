@@ -0,0 +1,174 @@
+from typing import Optional, Tuple
+import asyncio
+import codecs
+import io
+import logging
+import os
+import zipfile
+
+from .pdf_extraction import extract_text_from_pdf_async
+from .ocr import OCR_ENABLED, ocr_images
+from .office_extraction import extract_text_from_csv, extract_text_from_docx, extract_text_from_xlsx, looks_like_csv
+from .uploads import SpooledUpload
+from .metrics import INGEST_DURATION, span
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from the start of an upload to sniff its format and text encoding
+INGEST_SNIFF_BYTES = int(os.getenv("INGEST_SNIFF_BYTES", str(64 * 1024)))
+
+# Detected formats
+FORMAT_PDF = "pdf"
+FORMAT_IMAGE = "image"
+FORMAT_DOCX = "docx"
+FORMAT_XLSX = "xlsx"
+FORMAT_ZIP = "zip"
+FORMAT_TEXT = "text"
+FORMAT_BINARY = "binary"
+
+# Byte order marks, longest first so UTF-32 is not mistaken for UTF-16
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+_IMAGE_SIGNATURES = (
+    b"\x89PNG\r\n\x1a\n",
+    b"\xff\xd8\xff",
+    b"GIF87a",
+    b"GIF89a",
+    b"II*\x00",
+    b"MM\x00*",
+)
+
+# Bytes that cp1252 leaves undefined; their presence means the text is not cp1252
+_CP1252_UNDEFINED = frozenset(b"\x81\x8d\x8f\x90\x9d")
+
+def _zip_format(upload: SpooledUpload) -> str:
+    """Tell DOCX and XLSX apart from other ZIP archives by their package parts."""
+    try:
+        source = upload.path if upload.content is None else io.BytesIO(upload.content)
+        with zipfile.ZipFile(source) as archive:
+            names = set(archive.namelist())
+    except zipfile.BadZipFile:
+        return FORMAT_BINARY
+    if "word/document.xml" in names:
+        return FORMAT_DOCX
+    if "xl/workbook.xml" in names:
+        return FORMAT_XLSX
+    return FORMAT_ZIP
+
+def sniff_format(head: bytes) -> str:
+    """
+    Classify content from its leading bytes.
+
+    Returns FORMAT_PDF, FORMAT_IMAGE, FORMAT_ZIP (refined by the caller for
+    Office documents), FORMAT_TEXT or FORMAT_BINARY.
+    """
+    # PDF readers accept the header anywhere in the first kilobyte
+    if b"%PDF-" in head[:1024]:
+        return FORMAT_PDF
+    if head.startswith(_IMAGE_SIGNATURES) or (head[:4] == b"RIFF" and head[8:12] == b"WEBP"):
+        return FORMAT_IMAGE
+    # "BM" alone is too common at the start of text; BMP headers also zero their reserved bytes
+    if head[:2] == b"BM" and head[6:10] == b"\x00\x00\x00\x00":
+        return FORMAT_IMAGE
+    if head.startswith((b"PK\x03\x04", b"PK\x05\x06")):
+        return FORMAT_ZIP
+    if detect_encoding(head) is None:
+        return FORMAT_BINARY
+    return FORMAT_TEXT
+
+def detect_encoding(sample: bytes) -> Optional[str]:
+    """
+    Detect the text encoding of a prefix sample, or return None if it looks binary.
+
+    A BOM wins outright. Otherwise the sample is validated as UTF-8 (allowing a
+    multi-byte character cut off at the end of the sample), then cp1252 when the
+    sample only uses bytes cp1252 defines, and latin-1 as the last resort.
+    """
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+
+    if b"\x00" in sample:
+        return None
+
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+
+    if not _CP1252_UNDEFINED.intersection(sample):
+        return "cp1252"
+    return "latin-1"
+
+def decode_text(content: bytes, sample_size: int = INGEST_SNIFF_BYTES) -> Optional[str]:
+    """Decode text in a single pass using the encoding detected from its prefix."""
+    encoding = detect_encoding(content[:sample_size])
+    if encoding is None:
+        return None
+    # Bytes past the sample that do not fit the detected encoding are replaced, not fatal
+    return content.decode(encoding, errors="replace")
+
+def _sniff_upload(upload: SpooledUpload) -> Tuple[bytes, str]:
+    """Read the start of an upload and classify it, opening ZIP archives to tell Office formats apart."""
+    head = upload.read_head(INGEST_SNIFF_BYTES)
+    document_format = sniff_format(head)
+    if document_format == FORMAT_ZIP:
+        document_format = _zip_format(upload)
+    return head, document_format
+
+def _decode_upload(upload: SpooledUpload) -> Optional[str]:
+    return decode_text(upload.read_bytes())
+
+async def extract_text(upload: SpooledUpload) -> Optional[str]:
+    """
+    Extract text from an upload, choosing the extractor from its content rather than its name.
+
+    Returns None for formats that cannot be turned into text.
+    """
+    # Sniffing and decoding read the upload from disk, so they run off the event loop too
+    head, document_format = await asyncio.to_thread(_sniff_upload, upload)
+
+    with span(f"ingest.{document_format}", INGEST_DURATION, format=document_format):
+        return await _extract_format(upload, document_format, head)
+
+async def _extract_format(upload: SpooledUpload, document_format: str, head: bytes) -> Optional[str]:
+    """Run the extractor for a sniffed format."""
+    filename = upload.filename
+    if document_format == FORMAT_PDF:
+        logger.info(f"Processing '{filename}' as PDF file")
+        return await extract_text_from_pdf_async(upload.source) or None
+
+    if document_format == FORMAT_IMAGE:
+        if not OCR_ENABLED:
+            logger.warning(f"'{filename}' is an image but OCR is not available")
+            return None
+        logger.info(f"Processing '{filename}' as image file with OCR")
+        ocr_results = await ocr_images([upload.source])
+        return ocr_results[0]["text"] or None
+
+    if document_format == FORMAT_DOCX:
+        logger.info(f"Processing '{filename}' as DOCX file")
+        return await asyncio.to_thread(extract_text_from_docx, upload.source) or None
+
+    if document_format == FORMAT_XLSX:
+        logger.info(f"Processing '{filename}' as XLSX workbook")
+        return await asyncio.to_thread(extract_text_from_xlsx, upload.source) or None
+
+    if document_format == FORMAT_TEXT:
+        logger.info(f"Decoding '{filename}' as {detect_encoding(head)} text")
+        text = await asyncio.to_thread(_decode_upload, upload)
+        # Delimited data is parsed into a compact table; fall back to the raw text if that fails
+        if text and looks_like_csv(text[:INGEST_SNIFF_BYTES]):
+            logger.info(f"Processing '{filename}' as CSV data")
+            return await asyncio.to_thread(extract_text_from_csv, text) or text
+        return text
+
+    logger.warning(f"Unsupported content in '{filename}' (detected {document_format})")
+    return None
@@ -0,0 +1,195 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Job queue configuration
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "jobs.db")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+
+# Job lifecycle
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+class JobStore:
+    """SQLite-backed record of analysis jobs, their inputs, progress and results."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                progress TEXT NOT NULL,
+                document TEXT,
+                result TEXT,
+                error TEXT,
+                options TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+        self._conn.commit()
+
+    def create(self, job_id: str, document: Union[str, Dict[str, str]], options: Optional[Dict[str, Any]] = None):
+        """Persist a new queued job with the text (or name -> text mapping) it will analyze and its runner options."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, progress, document, options, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, JOB_QUEUED, json.dumps({"completed_stages": []}), json.dumps(document), json.dumps(options or {}), now, now)
+            )
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a job's status, progress and result, without its input document."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, progress, result, error, created_at, updated_at FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "status": row[1],
+            "progress": json.loads(row[2]),
+            "result": json.loads(row[3]) if row[3] else None,
+            "error": row[4],
+            "created_at": row[5],
+            "updated_at": row[6]
+        }
+
+    def get_document(self, job_id: str) -> Optional[Union[str, Dict[str, str]]]:
+        """Return the stored input for a job that has not finished yet."""
+        with self._lock:
+            row = self._conn.execute("SELECT document FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return json.loads(row[0])
+
+    def get_options(self, job_id: str) -> Dict[str, Any]:
+        """Return the keyword options a job was submitted with."""
+        with self._lock:
+            row = self._conn.execute("SELECT options FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else {}
+
+    def update(self, job_id: str, **fields):
+        """Update status/progress/result/error columns of a job."""
+        if "progress" in fields:
+            fields["progress"] = json.dumps(fields["progress"])
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"])
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+            self._conn.commit()
+
+    def unfinished_job_ids(self) -> List[str]:
+        """Return queued or interrupted jobs in submission order."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created_at",
+                (JOB_QUEUED, JOB_RUNNING)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class JobQueue:
+    """
+    Runs analysis jobs on a fixed number of asyncio workers.
+
+    The number of workers caps how many pipelines hit the LLM provider at once;
+    everything else waits in the queue. Jobs left queued or running when the
+    process stopped are picked up again by start().
+    """
+
+    def __init__(self, store: JobStore, runner: Callable[..., Awaitable[Dict[str, Any]]], workers: int = JOB_WORKERS):
+        self.store = store
+        self.runner = runner
+        self.workers = workers
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        """Re-enqueue unfinished jobs and start the workers."""
+        for job_id in await asyncio.to_thread(self.store.unfinished_job_ids):
+            await asyncio.to_thread(self.store.update, job_id, status=JOB_QUEUED)
+            self._queue.put_nowait(job_id)
+        if self._queue.qsize():
+            logger.info(f"Resuming {self._queue.qsize()} unfinished jobs")
+        self._tasks = [asyncio.create_task(self._worker(n)) for n in range(self.workers)]
+
+    async def stop(self):
+        """Stop the workers; in-flight jobs stay 'running' and resume on next start."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, document_content: Union[str, Dict[str, str]], **options) -> str:
+        """Persist and enqueue a new job, returning its ID immediately; options are passed to the runner."""
+        job_id = uuid.uuid4().hex
+        await asyncio.to_thread(self.store.create, job_id, document_content, options)
+        self._queue.put_nowait(job_id)
+        return job_id
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    async def _worker(self, worker_num: int):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run_job(job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job_id: str):
+        document_content = await asyncio.to_thread(self.store.get_document, job_id)
+        if document_content is None:
+            logger.warning(f"Job {job_id} has no stored document, skipping")
+            return
+
+        options = await asyncio.to_thread(self.store.get_options, job_id)
+        logger.info(f"Starting job {job_id}")
+        completed_stages = []
+        await asyncio.to_thread(self.store.update, job_id, status=JOB_RUNNING)
+
+        async def record_progress(stage: str):
+            completed_stages.append(stage)
+            await asyncio.to_thread(
+                self.store.update, job_id,
+                progress={"current_stage": stage, "completed_stages": list(completed_stages)}
+            )
+
+        try:
+            result = await self.runner(document_content, progress_callback=record_progress, **options)
+            status = JOB_COMPLETED if result.get("completed") else JOB_FAILED
+            # The input text is no longer needed once the job has finished
+            await asyncio.to_thread(self.store.update, job_id, status=status, result=result, document=None)
+            logger.info(f"Job {job_id} finished with status {status}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}", exc_info=True)
+            await asyncio.to_thread(self.store.update, job_id, status=JOB_FAILED, error=str(e), document=None)
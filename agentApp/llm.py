@@ -0,0 +1,455 @@
+from typing import Any, Dict, List, Optional, Type, TypeVar
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_openai import ChatOpenAI
+from pydantic import BaseModel, ValidationError
+from email.utils import parsedate_to_datetime
+import asyncio
+import httpx
+import json
+import logging
+import openai
+import os
+import random
+import re
+import time
+from dotenv import load_dotenv
+from .cache import SQLiteCache, make_cache_key, RESULT_CACHE_PATH
+from .ratelimit import TokenBucket, CircuitBreaker, CircuitOpenError
+from .metrics import LLM_CALL_DURATION, LLM_TOKENS, span
+
+load_dotenv(override=True)
+
+logger = logging.getLogger(__name__)
+
+# LLM client configuration
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+# Provider quota shared by every call in the process; 0 disables a limit
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "200000"))
+# Output tokens reserved per call until the real usage is known
+LLM_EXPECTED_OUTPUT_TOKENS = int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", "500"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+# Retries of rate-limited, timed-out and 5xx calls, with jittered exponential backoff
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "1"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "30"))
+# Consecutive failures that open the circuit, and how long it stays open
+LLM_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "5"))
+LLM_CIRCUIT_RESET_SECONDS = float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", "30"))
+# Extra attempts after a structured response fails schema validation
+STRUCTURED_OUTPUT_RETRIES = int(os.getenv("STRUCTURED_OUTPUT_RETRIES", "2"))
+
+# Per-call completion memoization
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", RESULT_CACHE_PATH)
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+_llm = None
+_llm_cache: Optional[SQLiteCache] = None
+_http_async_client: Optional[httpx.AsyncClient] = None
+# Token usage summed per call label since startup
+_usage_totals: Dict[str, Dict[str, int]] = {}
+
+SchemaT = TypeVar("SchemaT", bound=BaseModel)
+
+class StructuredOutputError(Exception):
+    """Raised when the model keeps returning output that does not match the requested schema."""
+
+def create_http_client(timeout: float = None, max_connections: int = None) -> httpx.AsyncClient:
+    """Create a pooled async HTTP client for talking to the LLM provider."""
+    timeout = timeout if timeout is not None else LLM_TIMEOUT
+    max_connections = max_connections if max_connections is not None else LLM_MAX_CONNECTIONS
+    return httpx.AsyncClient(
+        timeout=timeout,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=min(LLM_MAX_KEEPALIVE_CONNECTIONS, max_connections)
+        )
+    )
+
+def create_llm(
+    model: str = None,
+    timeout: float = None,
+    http_async_client: httpx.AsyncClient = None,
+    max_retries: int = 2
+) -> ChatOpenAI:
+    """Create a ChatOpenAI client, optionally sharing an existing HTTP connection pool."""
+    return ChatOpenAI(
+        model=model or LLM_MODEL,
+        api_key=os.getenv("OPENAI_API_KEY"),
+        timeout=timeout if timeout is not None else LLM_TIMEOUT,
+        http_async_client=http_async_client,
+        max_retries=max_retries,
+        # Keep token usage (including cached prompt tokens) when responses are streamed
+        stream_usage=True
+    )
+
+class MemoizedChatModel:
+    """
+    Wraps a chat model so identical (model, prompt, params) calls are answered from a store.
+
+    The store only needs get(key) and set(key, value), so any backend with that
+    interface can be plugged in. Attributes other than ainvoke are delegated to
+    the wrapped model.
+    """
+
+    def __init__(self, model, store):
+        self.model = model
+        self.store = store
+
+    def cache_key(self, messages: List[BaseMessage], **kwargs) -> str:
+        """Key a call on the model name, the exact prompt and the sampling parameters."""
+        params = {
+            "temperature": getattr(self.model, "temperature", None),
+            "max_tokens": getattr(self.model, "max_tokens", None),
+            **kwargs
+        }
+        # Key on the schema itself so changing a response model invalidates its entries
+        response_format = params.get("response_format")
+        if isinstance(response_format, type) and issubclass(response_format, BaseModel):
+            params["response_format"] = response_format.model_json_schema()
+        prompt = json.dumps([[message.type, message.content] for message in messages])
+        model_name = getattr(self.model, "model_name", type(self.model).__name__)
+        return make_cache_key(model_name, prompt, json.dumps(params, sort_keys=True, default=str))
+
+    async def lookup(self, messages: List[BaseMessage], **kwargs) -> Optional[AIMessage]:
+        """Return the stored completion for this exact call, or None."""
+        cached = await asyncio.to_thread(self.store.get, self.cache_key(messages, **kwargs))
+        if cached is None:
+            return None
+        return AIMessage(content=cached["content"], response_metadata={"memoized": True})
+
+    async def remember(self, messages: List[BaseMessage], response: AIMessage, **kwargs):
+        """Store a completion as the answer to this exact call."""
+        await asyncio.to_thread(self.store.set, self.cache_key(messages, **kwargs), {"content": response.content})
+
+    async def ainvoke(self, messages: List[BaseMessage], **kwargs) -> AIMessage:
+        """Return a stored completion for this exact call, or call the model and store it."""
+        cached = await self.lookup(messages, **kwargs)
+        if cached is not None:
+            return cached
+
+        response = await self.model.ainvoke(messages, **kwargs)
+        await self.remember(messages, response, **kwargs)
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the store's hit/miss/eviction statistics."""
+        return self.store.stats() if hasattr(self.store, "stats") else {}
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+def _call_label(kwargs: Dict[str, Any]) -> str:
+    """Name a call by its response schema, or "text" for free-form completions."""
+    response_format = kwargs.get("response_format")
+    return getattr(response_format, "__name__", "text") if response_format is not None else "text"
+
+def record_usage(response: AIMessage, label: str, seconds: Optional[float] = None) -> Dict[str, int]:
+    """
+    Read the token usage of one completion, log it and add it to the running totals and metrics.
+
+    cached_tokens counts prompt tokens the provider served from its prompt cache;
+    OpenAI bills them at a discount and processes them faster.
+    """
+    usage_metadata = getattr(response, "usage_metadata", None) or {}
+    usage = {
+        "calls": 1,
+        "input_tokens": usage_metadata.get("input_tokens", 0),
+        "cached_tokens": (usage_metadata.get("input_token_details") or {}).get("cache_read", 0) or 0,
+        "output_tokens": usage_metadata.get("output_tokens", 0)
+    }
+    totals = _usage_totals.setdefault(label, dict.fromkeys(usage, 0))
+    for field, count in usage.items():
+        totals[field] += count
+    for token_type in ("input", "cached", "output"):
+        LLM_TOKENS.inc(usage[f"{token_type}_tokens"], call=label, type=token_type)
+    if usage["input_tokens"]:
+        duration = f" in {seconds:.2f}s" if seconds is not None else ""
+        logger.info(
+            f"LLM call {label}{duration}: {usage['input_tokens']} input tokens "
+            f"({usage['cached_tokens']} cached), {usage['output_tokens']} output tokens"
+        )
+    return usage
+
+def usage_stats() -> Dict[str, Dict[str, int]]:
+    """Return token usage totals per call label, with the share of input tokens served from cache."""
+    stats = {}
+    for label, totals in _usage_totals.items():
+        stats[label] = {**totals, "cached_ratio": round(totals["cached_tokens"] / totals["input_tokens"], 4) if totals["input_tokens"] else 0.0}
+    return stats
+
+class UsageTrackingChatModel:
+    """
+    Wraps a chat model so the latency and token usage of every completion is recorded.
+
+    Each call is timed as an "llm.<label>" span. It sits inside the memoizing and
+    retrying wrappers, so only attempts that reach the provider are counted.
+    Attributes other than ainvoke are delegated to the wrapped model.
+    """
+
+    def __init__(self, model):
+        self.model = model
+
+    async def ainvoke(self, messages: List[BaseMessage], **kwargs) -> AIMessage:
+        label = _call_label(kwargs)
+        start = time.perf_counter()
+        with span(f"llm.{label}", LLM_CALL_DURATION, call=label):
+            response = await self.model.ainvoke(messages, **kwargs)
+        record_usage(response, label, time.perf_counter() - start)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+_RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+def is_retryable(error: Exception) -> bool:
+    """Whether a failed call is worth repeating: rate limits, timeouts, dropped connections and 5xx."""
+    if isinstance(error, (openai.APIConnectionError, httpx.TransportError, TimeoutError)):
+        return True
+    return _status_code(error) in _RETRYABLE_STATUS
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read the provider's retry-after-ms or retry-after header (seconds or an HTTP date), if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return max(0.0, float(headers["retry-after-ms"]) / 1000)
+        value = headers.get("retry-after")
+        if value:
+            try:
+                return max(0.0, float(value))
+            except ValueError:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        pass
+    return None
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """
+    Seconds to wait before retry number attempt + 1.
+
+    A provider retry-after is honored with a little jitter on top; otherwise the
+    delay is drawn uniformly from [0, base * 2**attempt] ("full jitter", capped at
+    LLM_RETRY_MAX_DELAY) so callers that failed together do not retry together.
+    """
+    if retry_after is not None:
+        return retry_after + random.uniform(0, LLM_RETRY_BASE_DELAY)
+    return random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** attempt))
+
+class ResilientChatModel:
+    """
+    Wraps a chat model with the provider quota, a concurrency cap, retries and a circuit breaker.
+
+    Every call first reserves one request and its estimated tokens from per-minute
+    token buckets, so the process as a whole stays under LLM_REQUESTS_PER_MINUTE
+    and LLM_TOKENS_PER_MINUTE; the token reservation is corrected from the real
+    usage afterwards. At most max_concurrency calls are in flight. Retryable
+    failures are retried with jittered backoff; a 429 also pauses the buckets for
+    the retry-after so every caller backs off, not just the one that was rejected.
+    Consecutive non-429 failures open the circuit breaker, after which calls fail
+    fast with CircuitOpenError until a probe call succeeds. Attributes other than
+    ainvoke are delegated to the wrapped model.
+    """
+
+    def __init__(
+        self,
+        model,
+        requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = LLM_TOKENS_PER_MINUTE,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        max_retries: int = LLM_MAX_RETRIES,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        self.model = model
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_retries = max_retries
+        self.breaker = breaker or CircuitBreaker(LLM_CIRCUIT_FAILURE_THRESHOLD, LLM_CIRCUIT_RESET_SECONDS)
+        self.counters = {"calls": 0, "retries": 0, "rate_limited": 0, "failures": 0, "rejected": 0, "throttled_seconds": 0.0}
+
+    def estimate_tokens(self, messages: List[BaseMessage]) -> int:
+        """
+        Prompt tokens plus the output tokens the call may produce.
+
+        Prompt tokens are estimated at 4 characters each rather than tokenized, which
+        would block the event loop on large prompts; the reservation is corrected
+        from the reported usage after the call.
+        """
+        prompt_tokens = sum(
+            (len(message.content if isinstance(message.content, str) else json.dumps(message.content)) + 3) // 4
+            for message in messages
+        )
+        return prompt_tokens + (getattr(self.model, "max_tokens", None) or LLM_EXPECTED_OUTPUT_TOKENS)
+
+    async def _throttle(self, tokens: int):
+        waited = 0.0
+        if self.request_bucket is not None:
+            waited += await self.request_bucket.acquire(1)
+        if self.token_bucket is not None:
+            waited += await self.token_bucket.acquire(tokens)
+        self.counters["throttled_seconds"] += waited
+
+    def _pause(self, seconds: float):
+        for bucket in (self.request_bucket, self.token_bucket):
+            if bucket is not None:
+                bucket.block(seconds)
+
+    async def ainvoke(self, messages: List[BaseMessage], **kwargs) -> AIMessage:
+        estimate = self.estimate_tokens(messages)
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                self.counters["rejected"] += 1
+                raise CircuitOpenError(f"LLM provider circuit is open after {self.breaker.failures} consecutive failures")
+            self.counters["calls"] += 1
+            try:
+                await self._throttle(estimate)
+                async with self.semaphore:
+                    response = await self.model.ainvoke(messages, **kwargs)
+            except Exception as e:
+                if not is_retryable(e):
+                    self.breaker.release()
+                    raise
+                retry_after = retry_after_seconds(e)
+                if _status_code(e) == 429:
+                    # The quota is shared, so pause every caller rather than only this one
+                    self.counters["rate_limited"] += 1
+                    self._pause(retry_after if retry_after is not None else backoff_delay(attempt))
+                    self.breaker.release()
+                else:
+                    self.counters["failures"] += 1
+                    self.breaker.record_failure()
+                if attempt == self.max_retries:
+                    raise
+                delay = backoff_delay(attempt, retry_after)
+                logger.warning(f"LLM call failed ({type(e).__name__}: {str(e)[:200]}); retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                self.counters["retries"] += 1
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                self.breaker.release()
+                raise
+            self.breaker.record_success()
+            usage = getattr(response, "usage_metadata", None)
+            if usage and self.token_bucket is not None:
+                self.token_bucket.adjust(usage.get("total_tokens", estimate) - estimate)
+            return response
+
+    def stats(self) -> Dict[str, Any]:
+        """Return call, retry and rejection counters and the circuit state."""
+        return {**self.counters, "circuit": self.breaker.state}
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+def _json_text(content: str) -> str:
+    """Strip a markdown code fence, which models without schema support often add."""
+    fenced = re.search(r"```(?:json)?\s*([\s\S]*?)\s*```", content)
+    return fenced.group(1) if fenced else content.strip()
+
+async def ainvoke_structured(
+    model,
+    messages: List[BaseMessage],
+    schema: Type[SchemaT],
+    retries: int = STRUCTURED_OUTPUT_RETRIES
+) -> SchemaT:
+    """
+    Call the model with schema-constrained output and return a validated instance of schema.
+
+    The schema is sent as the response_format, so OpenAI models are constrained to
+    it. If a reply still fails validation (other providers, refusals, truncation),
+    the validation error is fed back and the call retried up to retries more times
+    before StructuredOutputError is raised.
+
+    With a MemoizedChatModel, only a reply that validated is stored, under the
+    original messages, and retries always go to the model: a malformed reply is
+    never served again from the memo.
+    """
+    memo = model if isinstance(model, MemoizedChatModel) else None
+    if memo is not None:
+        cached = await memo.lookup(messages, response_format=schema)
+        if cached is not None:
+            try:
+                return schema.model_validate_json(_json_text(cached.content))
+            except ValidationError:
+                logger.warning(f"Ignoring a memoized {schema.__name__} response that fails validation")
+        model = memo.model
+
+    attempt_messages = list(messages)
+    for attempt in range(retries + 1):
+        response = await model.ainvoke(attempt_messages, response_format=schema)
+        parsed = response.additional_kwargs.get("parsed") if hasattr(response, "additional_kwargs") else None
+        try:
+            result = parsed if isinstance(parsed, schema) else schema.model_validate_json(_json_text(response.content))
+        except ValidationError as e:
+            logger.warning(f"{schema.__name__} response failed validation (attempt {attempt + 1}/{retries + 1}): {e.error_count()} errors")
+            attempt_messages = list(messages) + [
+                AIMessage(content=response.content),
+                HumanMessage(content=(
+                    f"That response did not match the required schema:\n{e}\n"
+                    "Reply again with ONLY a JSON object that matches the schema."
+                ))
+            ]
+            continue
+        if memo is not None:
+            await memo.remember(messages, response, response_format=schema)
+        return result
+    raise StructuredOutputError(f"{schema.__name__} output was invalid after {retries + 1} attempts")
+
+def get_llm_cache() -> SQLiteCache:
+    """Return the shared store of memoized LLM completions, opening it on first use."""
+    global _llm_cache
+    if _llm_cache is None:
+        _llm_cache = SQLiteCache(
+            LLM_CACHE_PATH,
+            "llm_responses",
+            ttl_seconds=LLM_CACHE_TTL,
+            max_entries=LLM_CACHE_MAX_ENTRIES,
+            max_bytes=LLM_CACHE_MAX_BYTES
+        )
+    return _llm_cache
+
+def init_llm():
+    """Initialize the process-wide LLM client if it has not been created yet."""
+    global _llm, _http_async_client
+    if _llm is None:
+        logger.info(f"Creating shared LLM client for {LLM_MODEL} (max {LLM_MAX_CONNECTIONS} connections)")
+        _http_async_client = create_http_client()
+        # Retries happen in ResilientChatModel, which also knows about the shared quota
+        _llm = ResilientChatModel(UsageTrackingChatModel(create_llm(http_async_client=_http_async_client, max_retries=0)))
+        if LLM_CACHE_ENABLED:
+            _llm = MemoizedChatModel(_llm, get_llm_cache())
+    return _llm
+
+def get_llm():
+    """Return the shared LLM client, creating it on first use."""
+    return _llm if _llm is not None else init_llm()
+
+def set_llm(model):
+    """Replace the shared LLM client, e.g. with a local stand-in for benchmarks."""
+    global _llm
+    _llm = model
+
+async def close_llm():
+    """Close the shared LLM client's connection pool and the completion memo store."""
+    global _llm, _http_async_client, _llm_cache
+    if _http_async_client is not None:
+        await _http_async_client.aclose()
+        _http_async_client = None
+    if _llm_cache is not None:
+        _llm_cache.close()
+        _llm_cache = None
+    _llm = None
@@ -114,25 +114,81 @@
 #     uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True)
 
 # app.py
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import uvicorn
 import json
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 import asyncio
-import tempfile
 import os
 import logging
-import io
-
-# Import PyPDF2 for PDF processing
-import PyPDF2
+from contextlib import AsyncExitStack, asynccontextmanager
 
 # Import the agent functionality
-from .agent import run_due_diligence, extract_text_from_pdf
+from .agent import (
+    DocumentInput,
+    PipelineMode,
+    PIPELINE_THOROUGH,
+    PIPELINE_ECONOMY,
+    run_due_diligence,
+    stream_due_diligence,
+    get_due_diligence_graph,
+    get_session_graph,
+    reset_due_diligence_graphs,
+    analysis_cache_key,
+    start_session,
+    ask_session
+)
+from .pdf_extraction import shutdown_pdf_executor
+from .ocr import OCR_ENABLED, OCR_PRELOAD, warm_ocr_workers, shutdown_ocr_executor
+from .llm import init_llm, close_llm
+from .cache import RESULT_CACHE_ENABLED, get_result_cache, close_result_cache
+from .jobs import JobQueue, JobStore, JOB_DB_PATH, JOB_WORKERS
+from .uploads import RequestSizeLimitMiddleware, SpooledUpload, receive_uploads, upload_request_body
+from .ingestion import extract_text
+from .sessions import init_checkpointer, close_checkpointer, get_checkpointer
+from .retrieval import close_index_store
+from .admission import analysis_admission
+from .metrics import TimingMiddleware, CONTENT_TYPE as METRICS_CONTENT_TYPE, render_metrics
+
+# Maximum number of uploads extracted at once within a request
+UPLOAD_EXTRACTION_CONCURRENCY = int(os.getenv("UPLOAD_EXTRACTION_CONCURRENCY", "4"))
+
+# Background job queue, created at startup
+job_queue: Optional[JobQueue] = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up shared resources at startup and release them on shutdown."""
+    init_llm()
+    # Open the session store before compiling the graph that keeps sessions in it
+    await init_checkpointer()
+    get_due_diligence_graph(PIPELINE_THOROUGH)
+    get_due_diligence_graph(PIPELINE_ECONOMY)
+    get_session_graph()
+    if OCR_ENABLED and OCR_PRELOAD:
+        await warm_ocr_workers()
+    
+    global job_queue
+    job_queue = JobQueue(JobStore(JOB_DB_PATH), run_cached_due_diligence, workers=JOB_WORKERS)
+    await job_queue.start()
+    
+    yield
+    
+    await job_queue.stop()
+    job_queue.store.close()
+    await close_llm()
+    shutdown_pdf_executor()
+    shutdown_ocr_executor()
+    close_result_cache()
+    close_index_store()
+    await close_checkpointer()
+    reset_due_diligence_graphs()
 
-app = FastAPI(title="Due Diligence Analysis Service")
+app = FastAPI(title="Due Diligence Analysis Service", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -143,6 +199,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Reject oversized uploads before their bodies are read
+app.add_middleware(RequestSizeLimitMiddleware)
+
+# Time every request and report its ingestion/node/LLM spans in an X-Timing header
+app.add_middleware(TimingMiddleware)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, 
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -157,136 +219,351 @@ class AnalysisResponse(BaseModel):
     legal_compliance: Dict[str, Any] = {}
     messages: List[Dict[str, Any]] = []
     errors: List[str] = []
+    document_analyses: Dict[str, Any] = {}
+    session_id: Optional[str] = None
+
+class AskRequest(BaseModel):
+    question: str
+
+class AskResponse(BaseModel):
+    session_id: str
+    answer: str
 
-@app.post("/analyze", response_model=AnalysisResponse)
-async def analyze_document(file: UploadFile = File(...)):
+class JobSubmittedResponse(BaseModel):
+    job_id: str
+    status: str
+    errors: List[str] = []
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str
+    progress: Dict[str, Any] = {}
+    result: Optional[AnalysisResponse] = None
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+
+def build_analysis_response(result: Dict[str, Any]) -> AnalysisResponse:
+    """Convert a run_due_diligence result into the API response model."""
+    return AnalysisResponse(
+        completed=result.get("completed", False),
+        synthesis_report=result.get("synthesis_report", {}),
+        contract_analysis=result.get("contract_analysis", {}),
+        financial_analysis=result.get("financial_analysis", {}),
+        risk_assessment=result.get("risk_assessment", {}),
+        legal_compliance=result.get("legal_compliance", {}),
+        messages=result.get("messages", []),
+        errors=result.get("errors", []),
+        document_analyses=result.get("document_analyses", {}),
+        session_id=result.get("session_id")
+    )
+
+def cacheable_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Strip the per-run session ID; each cache hit gets a session of its own."""
+    return {key: value for key, value in result.items() if key != "session_id"}
+
+async def run_cached_due_diligence(
+    document_content: DocumentInput,
+    response: Optional[Response] = None,
+    progress_callback=None,
+    mode: PipelineMode = PIPELINE_THOROUGH
+) -> Dict[str, Any]:
     """
-    Analyze an investment document using our LLM-based due diligence system.
+    Run due diligence, serving repeat documents from the result cache.
+
+    Cached results are returned with a fresh session seeded from the cached report.
     """
+    if not RESULT_CACHE_ENABLED:
+        return await run_due_diligence(document_content, progress_callback=progress_callback, mode=mode)
+    
+    cache = get_result_cache()
+    cache_key = analysis_cache_key(document_content, mode)
+    
+    cached_result = await asyncio.to_thread(cache.get, cache_key)
+    if cached_result is not None:
+        logger.info(f"Result cache hit for {cache_key[:12]}")
+        if response is not None:
+            response.headers["X-Cache"] = "HIT"
+        return {**cached_result, "session_id": await start_session(cached_result, document_content)}
+    
+    if response is not None:
+        response.headers["X-Cache"] = "MISS"
+    result = await run_due_diligence(document_content, progress_callback=progress_callback, mode=mode)
+    
+    # Only cache clean, completed runs so transient failures are retried next time
+    if result.get("completed") and not result.get("errors"):
+        await asyncio.to_thread(cache.set, cache_key, cacheable_result(result))
+    return result
+
+async def read_upload(upload: SpooledUpload) -> Optional[str]:
+    """Extract a received upload's text and release the spooled data."""
+    logger.info(f"File '{upload.filename}' uploaded ({upload.size} bytes)")
     try:
-        # Read the file content into memory
-        content = await file.read()
-        logger.info(f"File '{file.filename}' uploaded")
-        
-        document_content = None
-        
-        # Check if it's a PDF
-        if file.filename.lower().endswith('.pdf'):
-            logger.info("Processing as PDF file")
-            document_content = extract_text_from_pdf(content)
-            if not document_content:
-                raise HTTPException(status_code=415, detail="Could not extract text from PDF")
+        return await extract_text(upload)
+    finally:
+        upload.cleanup()
+
+def cleanup_uploads(uploads: List[SpooledUpload]):
+    """Release every upload of a request, including any that were never extracted."""
+    for upload in uploads:
+        upload.cleanup()
+
+async def read_uploads(files: List[SpooledUpload]) -> Tuple[List[Tuple[str, str]], List[str]]:
+    """
+    Extract text from several uploads concurrently on a bounded pool.
+
+    Returns (filename, text) pairs in upload order for the readable files, plus
+    an error message for each file that could not be read.
+    """
+    semaphore = asyncio.Semaphore(UPLOAD_EXTRACTION_CONCURRENCY)
+    
+    async def read_one(file: SpooledUpload) -> Optional[str]:
+        async with semaphore:
+            return await read_upload(file)
+    
+    results = await asyncio.gather(*(read_one(file) for file in files), return_exceptions=True)
+    
+    documents = []
+    errors = []
+    for file, result in zip(files, results):
+        if isinstance(result, HTTPException) and result.status_code == 413:
+            raise result
+        if isinstance(result, BaseException):
+            logger.error(f"Error reading file '{file.filename}': {str(result)}")
+            errors.append(f"Could not read file '{file.filename}': {str(result)}")
+        elif result is None:
+            logger.warning(f"Could not read file '{file.filename}', skipping")
+            errors.append(f"Could not read file '{file.filename}': unsupported or empty content")
         else:
-            # Try to decode as text with different encodings
-            encodings_to_try = ["utf-8", "latin-1", "cp1252"]
+            documents.append((file.filename, result))
+    return documents, errors
+
+def documents_by_name(documents: List[Tuple[str, str]]) -> Dict[str, str]:
+    """Key extracted documents by filename, keeping upload order and disambiguating repeated names."""
+    named = {}
+    for filename, document_content in documents:
+        name = filename
+        suffix = 2
+        while name in named:
+            name = f"{filename} ({suffix})"
+            suffix += 1
+        named[name] = document_content
+    return named
+
+@app.post("/analyze", response_model=AnalysisResponse, openapi_extra=upload_request_body("file"))
+async def analyze_document(request: Request, response: Response, mode: PipelineMode = PIPELINE_THOROUGH):
+    """
+    Analyze an investment document using our LLM-based due diligence system.
+
+    mode=economy produces every section in a single LLM call, for fast screening.
+    When the service is saturated the request waits for a slot, or is turned away
+    with 429 (queue full) or 503 (waited too long) and a Retry-After header, before
+    the upload is read.
+    """
+    uploads = []
+    try:
+        async with analysis_admission.admit():
+            uploads = await receive_uploads(request, "file")
+            document_content = await read_upload(uploads[0])
             
-            for encoding in encodings_to_try:
-                try:
-                    document_content = content.decode(encoding)
-                    logger.info(f"Successfully decoded with {encoding} encoding")
-                    break
-                except UnicodeDecodeError:
-                    logger.warning(f"Failed to decode with {encoding} encoding, trying next...")
-                    continue
-        
-        # If we couldn't read the file as text or PDF
-        if document_content is None:
-            error_msg = "Unable to read file content. Supported formats are text files and PDFs."
-            logger.error(error_msg)
-            raise HTTPException(status_code=415, detail=error_msg)
-        
-        # Run the due diligence analysis
-        logger.info("Starting due diligence analysis...")
-        result = await run_due_diligence(document_content)
-        logger.info("Analysis completed successfully")
-        
-        return AnalysisResponse(
-            completed=result.get("completed", False),
-            synthesis_report=result.get("synthesis_report", {}),
-            contract_analysis=result.get("contract_analysis", {}),
-            financial_analysis=result.get("financial_analysis", {}),
-            risk_assessment=result.get("risk_assessment", {}),
-            legal_compliance=result.get("legal_compliance", {}),
-            messages=result.get("messages", []),
-            errors=result.get("errors", [])
-        )
+            # If we couldn't read the file as text or PDF
+            if document_content is None:
+                error_msg = "Unable to read file content. Supported formats are text files, PDFs and images."
+                logger.error(error_msg)
+                raise HTTPException(status_code=415, detail=error_msg)
+            
+            # Run the due diligence analysis
+            logger.info("Starting due diligence analysis...")
+            result = await run_cached_due_diligence(document_content, response, mode=mode)
+            logger.info("Analysis completed successfully")
+            
+            return build_analysis_response(result)
     
+    except (HTTPException, RequestValidationError):
+        raise
     except Exception as e:
         error_msg = f"Analysis failed: {str(e)}"
         logger.error(error_msg, exc_info=True)
         raise HTTPException(status_code=500, detail=error_msg)
+    finally:
+        cleanup_uploads(uploads)
 
-@app.post("/analyze-multiple", response_model=AnalysisResponse)
-async def analyze_multiple_documents(files: List[UploadFile] = File(...)):
+@app.post("/analyze-multiple", response_model=AnalysisResponse, openapi_extra=upload_request_body("files", multiple=True))
+async def analyze_multiple_documents(
+    request: Request,
+    response: Response,
+    mode: PipelineMode = PIPELINE_THOROUGH
+):
     """
     Analyze multiple investment documents together using our LLM-based due diligence system.
+
+    Shares the admission limits of /analyze.
     """
+    files = []
     try:
-        # Combined document content from all files
-        combined_content = ""
-        
-        # Process each uploaded file
-        for file in files:
-            # Read the file content into memory
-            content = await file.read()
-            logger.info(f"File '{file.filename}' uploaded")
+        async with analysis_admission.admit():
+            files = await receive_uploads(request, "files")
+            # Extract every file concurrently, keeping upload order
+            documents, read_errors = await read_uploads(files)
             
-            document_content = None
+            # Check if we have any content to analyze
+            if not documents:
+                error_msg = "Could not read any of the uploaded files. Supported formats are text files, PDFs and images."
+                logger.error(error_msg)
+                raise HTTPException(status_code=415, detail=error_msg)
             
-            # Check if it's a PDF
-            if file.filename.lower().endswith('.pdf'):
-                logger.info(f"Processing '{file.filename}' as PDF file")
-                document_content = extract_text_from_pdf(content)
-                if not document_content:
-                    logger.warning(f"Could not extract text from PDF: {file.filename}, skipping")
-                    continue
-            else:
-                # Try to decode as text with different encodings
-                encodings_to_try = ["utf-8", "latin-1", "cp1252"]
-                
-                for encoding in encodings_to_try:
-                    try:
-                        document_content = content.decode(encoding)
-                        logger.info(f"Successfully decoded '{file.filename}' with {encoding} encoding")
-                        break
-                    except UnicodeDecodeError:
-                        logger.warning(f"Failed to decode '{file.filename}' with {encoding} encoding, trying next...")
-                        continue
+            # Each document is analyzed on its own and the report synthesizes across them
+            named_documents = documents_by_name(documents)
+            del documents
             
-            # If we couldn't read this file, skip it
-            if document_content is None:
-                logger.warning(f"Could not read file '{file.filename}', skipping")
-                continue
+            logger.info(f"Starting due diligence analysis on {len(named_documents)} documents...")
+            result = await run_cached_due_diligence(named_documents, response, mode=mode)
+            logger.info("Analysis completed successfully")
             
-            # Add to combined content with clear separation
-            combined_content += f"\n\n--- DOCUMENT: {file.filename} ---\n\n{document_content}\n\n"
-        
-        # Check if we have any content to analyze
-        if not combined_content:
-            error_msg = "Could not read any of the uploaded files. Supported formats are text files and PDFs."
-            logger.error(error_msg)
-            raise HTTPException(status_code=415, detail=error_msg)
-        
-        # Run the due diligence analysis on combined content
-        logger.info("Starting due diligence analysis on multiple documents...")
-        result = await run_due_diligence(combined_content)
-        logger.info("Analysis completed successfully")
-        
-        return AnalysisResponse(
-            completed=result.get("completed", False),
-            synthesis_report=result.get("synthesis_report", {}),
-            contract_analysis=result.get("contract_analysis", {}),
-            financial_analysis=result.get("financial_analysis", {}),
-            risk_assessment=result.get("risk_assessment", {}),
-            legal_compliance=result.get("legal_compliance", {}),
-            messages=result.get("messages", []),
-            errors=result.get("errors", [])
-        )
+            result = {**result, "errors": read_errors + result.get("errors", [])}
+            return build_analysis_response(result)
     
+    except (HTTPException, RequestValidationError):
+        raise
     except Exception as e:
         error_msg = f"Analysis failed: {str(e)}"
         logger.error(error_msg, exc_info=True)
         raise HTTPException(status_code=500, detail=error_msg)
+    finally:
+        cleanup_uploads(files)
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Encode a pipeline event as a Server-Sent Events message."""
+    return f"event: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+class HeldStreamingResponse(StreamingResponse):
+    """StreamingResponse that keeps the held contexts, e.g. an admission slot, open until the response ends, however it ends."""
+
+    def __init__(self, held: AsyncExitStack, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.held = held
+
+    async def __call__(self, scope, receive, send):
+        # Also covers a client that disconnects before the body iterator starts
+        async with self.held:
+            await super().__call__(scope, receive, send)
+
+@app.post("/analyze/stream", openapi_extra=upload_request_body("file"))
+async def analyze_document_stream(
+    request: Request,
+    stream_tokens: bool = False,
+    mode: PipelineMode = PIPELINE_THOROUGH
+):
+    """
+    Analyze an investment document, streaming progress as Server-Sent Events.
+
+    Emits a "node" event as each graph node completes, an "analysis" event as each
+    financial/terms/market sub-analysis finishes, "token" events for the report
+    when stream_tokens is set, and a final "result" event with the full analysis.
+    Shares the admission limits of /analyze; the slot is held until the stream ends.
+    """
+    uploads = []
+    slot = AsyncExitStack()
+    try:
+        await slot.enter_async_context(analysis_admission.admit())
+        uploads = await receive_uploads(request, "file")
+        document_content = await read_upload(uploads[0])
+        if document_content is None:
+            raise HTTPException(
+                status_code=415,
+                detail="Unable to read file content. Supported formats are text files, PDFs and images."
+            )
+        
+        cache_key = analysis_cache_key(document_content, mode) if RESULT_CACHE_ENABLED else None
+        cached_result = await asyncio.to_thread(get_result_cache().get, cache_key) if cache_key else None
+    except BaseException:
+        await slot.aclose()
+        raise
+    finally:
+        cleanup_uploads(uploads)
+    
+    async def event_stream():
+        if cached_result is not None:
+            result = {**cached_result, "session_id": await start_session(cached_result, document_content)}
+            yield format_sse({"event": "result", "result": result})
+            return
+        
+        async for event in stream_due_diligence(document_content, stream_tokens=stream_tokens, mode=mode):
+            yield format_sse(event)
+            if event["event"] == "result" and cache_key:
+                result = event["result"]
+                if result.get("completed") and not result.get("errors"):
+                    await asyncio.to_thread(get_result_cache().set, cache_key, cacheable_result(result))
+    
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if cache_key:
+        headers["X-Cache"] = "HIT" if cached_result is not None else "MISS"
+    return HeldStreamingResponse(slot, event_stream(), media_type="text/event-stream", headers=headers)
+
+@app.post("/jobs", response_model=JobSubmittedResponse, status_code=202, openapi_extra=upload_request_body("files", multiple=True))
+async def submit_job(request: Request, mode: PipelineMode = PIPELINE_THOROUGH):
+    """
+    Queue one or more documents for background analysis and return a job ID immediately.
+    """
+    files = await receive_uploads(request, "files")
+    try:
+        documents, read_errors = await read_uploads(files)
+    finally:
+        cleanup_uploads(files)
+    if not documents:
+        raise HTTPException(
+            status_code=415,
+            detail="Could not read any of the uploaded files. Supported formats are text files, PDFs and images."
+        )
+    
+    # A single document is analyzed as-is, like /analyze
+    document_content = documents[0][1] if len(files) == 1 else documents_by_name(documents)
+    
+    job_id = await job_queue.submit(document_content, mode=mode)
+    logger.info(f"Queued job {job_id} ({job_queue.queue_depth()} waiting)")
+    return JobSubmittedResponse(job_id=job_id, status="queued", errors=read_errors)
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str):
+    """
+    Return the status, progress and (once finished) result of a background analysis job.
+    """
+    job = await asyncio.to_thread(job_queue.store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    
+    return JobStatusResponse(
+        job_id=job["id"],
+        status=job["status"],
+        progress=job["progress"],
+        result=build_analysis_response(job["result"]) if job["result"] else None,
+        error=job["error"],
+        created_at=job["created_at"],
+        updated_at=job["updated_at"]
+    )
+
+@app.post("/sessions/{session_id}/ask", response_model=AskResponse)
+async def ask_question(session_id: str, request: AskRequest):
+    """
+    Answer a follow-up question about an earlier analysis without rerunning it.
+
+    session_id is returned by /analyze, /analyze-multiple, /analyze/stream and
+    finished jobs. Only the question-answering step runs: one small LLM call.
+    """
+    if get_checkpointer() is None:
+        raise HTTPException(status_code=503, detail="Sessions are disabled")
+    
+    answer = await ask_session(session_id, request.question)
+    if answer is None:
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+    return AskResponse(session_id=session_id, answer=answer)
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Latency histograms and token counters in the Prometheus text format.
+    """
+    return PlainTextResponse(render_metrics(), media_type=METRICS_CONTENT_TYPE)
 
 @app.get("/health")
 async def health_check():
@@ -0,0 +1,243 @@
+from typing import Dict, List, Optional, Tuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+import functools
+import inspect
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets (seconds), from fast cache hits up to slow LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_registry: List["Metric"] = []
+
+# Spans recorded while handling the current request, for the X-Timing header
+_request_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_spans", default=None)
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class Metric:
+    """A named metric with a fixed set of label names, rendered in the Prometheus text format."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in self._values.items()]
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in self._values.items()]
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket..., sum, count]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.setdefault(key, [0] * (len(self.buckets) + 2))
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[position] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def _samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, series in self._values.items():
+                bounds = [_format_value(bound) for bound in self.buckets] + ["+Inf"]
+                for bound, count in zip(bounds, series[:-2] + [series[-1]]):
+                    le = 'le="' + bound + '"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_value(count)}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(series[-2])}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {_format_value(series[-1])}")
+        return lines
+
+def render_metrics() -> str:
+    """Render every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+HTTP_REQUEST_DURATION = Histogram("http_request_duration_seconds", "Time to the response headers, per route.", ("method", "route", "status"))
+INGEST_DURATION = Histogram("ingest_duration_seconds", "Text extraction time per upload, by detected format.", ("format",))
+NODE_DURATION = Histogram("graph_node_duration_seconds", "Run time of each graph node.", ("node",))
+LLM_CALL_DURATION = Histogram("llm_call_duration_seconds", "Latency of LLM provider calls, by response schema.", ("call",))
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens used by LLM provider calls; type is input, cached (input served from the prompt cache) or output.", ("call", "type"))
+
+def start_request_timing():
+    """Start collecting spans for the current request; returns a token for reset_request_timing."""
+    return _request_spans.set([])
+
+def reset_request_timing(token):
+    _request_spans.reset(token)
+
+def request_spans() -> List[Tuple[str, float]]:
+    """The (name, seconds) spans recorded so far for the current request."""
+    return list(_request_spans.get() or [])
+
+@contextmanager
+def span(name: str, histogram: Optional[Histogram] = None, **labels):
+    """
+    Time a block, observing it in histogram and adding it to the current request's spans.
+
+    Works in sync and async code alike; spans recorded in tasks and threads started
+    by the request are collected too, since they inherit the request's context.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if histogram is not None:
+            histogram.observe(elapsed, **labels)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((name, elapsed))
+
+def timing_header(spans: List[Tuple[str, float]], total: Optional[float] = None) -> str:
+    """
+    Summarize spans in Server-Timing syntax: "name;dur=ms" per span name, with a count if it repeated.
+
+    Spans with the same name (e.g. retried or map-reduced LLM calls) are summed.
+    """
+    totals: Dict[str, List[float]] = {}
+    for name, elapsed in spans:
+        entry = totals.setdefault(name, [0.0, 0])
+        entry[0] += elapsed
+        entry[1] += 1
+    parts = []
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.1f}")
+    for name, (elapsed, count) in totals.items():
+        part = f"{name};dur={elapsed * 1000:.1f}"
+        if count > 1:
+            part += f";count={count}"
+        parts.append(part)
+    return ", ".join(parts)
+
+def instrument_node(name: str, node):
+    """Wrap a graph node function so each run is timed as a "node.<name>" span."""
+    if inspect.iscoroutinefunction(node):
+        @functools.wraps(node)
+        async def timed_async(state):
+            with span(f"node.{name}", NODE_DURATION, node=name):
+                return await node(state)
+        return timed_async
+
+    @functools.wraps(node)
+    def timed(state):
+        with span(f"node.{name}", NODE_DURATION, node=name):
+            return node(state)
+    return timed
+
+class TimingMiddleware:
+    """
+    ASGI middleware that times each HTTP request and adds an X-Timing header.
+
+    The header lists the total time to the response headers and the spans (ingestion,
+    graph nodes, LLM calls) recorded while handling the request. Streamed responses
+    send their headers first, so their header only covers the work done before that.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        token = start_request_timing()
+        status = "500"
+
+        async def timed_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+                header = timing_header(request_spans(), time.perf_counter() - start)
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"x-timing", header.encode("latin-1"))]}
+                route = scope.get("route")
+                HTTP_REQUEST_DURATION.observe(
+                    time.perf_counter() - start,
+                    method=scope["method"],
+                    route=getattr(route, "path", "unmatched"),
+                    status=status
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            reset_request_timing(token)
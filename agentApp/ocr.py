@@ -0,0 +1,162 @@
+from typing import Any, Dict, List, Tuple, Union
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import asyncio
+import importlib.util
+import io
+import logging
+import os
+import time
+
+import PyPDF2
+
+from .workers import create_process_pool
+
+logger = logging.getLogger(__name__)
+
+# OCR configuration; OCR is only enabled when easyocr is actually installed
+OCR_ENABLED = (
+    os.getenv("OCR_ENABLED", "true").lower() in ("1", "true", "yes")
+    and importlib.util.find_spec("easyocr") is not None
+)
+# Load the OCR model at startup instead of on the first scanned document
+OCR_PRELOAD = os.getenv("OCR_PRELOAD", "false").lower() in ("1", "true", "yes")
+OCR_LANGUAGES = [lang.strip() for lang in os.getenv("OCR_LANGUAGES", "en").split(",") if lang.strip()]
+OCR_GPU = os.getenv("OCR_GPU", "false").lower() in ("1", "true", "yes")
+# Each worker holds its own copy of the OCR model, so keep this small
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "1"))
+OCR_BATCH_SIZE = int(os.getenv("OCR_BATCH_SIZE", "8"))
+# Pages with fewer extracted characters than this are treated as scanned
+OCR_MIN_CHARS = int(os.getenv("OCR_MIN_CHARS", "20"))
+OCR_RENDER_DPI = int(os.getenv("OCR_RENDER_DPI", "200"))
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".webp")
+
+# Loaded at most once per process, on the first OCR request that reaches it
+_ocr_reader = None
+_ocr_executor = None
+
+def get_ocr_reader():
+    """Return this process's easyocr reader, loading the model on first use."""
+    global _ocr_reader
+    if _ocr_reader is None:
+        import easyocr
+        start = time.perf_counter()
+        _ocr_reader = easyocr.Reader(OCR_LANGUAGES, gpu=OCR_GPU)
+        logger.info(f"Loaded easyocr reader for {OCR_LANGUAGES} in {time.perf_counter() - start:.2f}s")
+    return _ocr_reader
+
+def _warm_reader() -> bool:
+    get_ocr_reader()
+    return True
+
+def _read_image(image: Union[bytes, str]) -> str:
+    """Run OCR over one encoded image or image file path and return its text in reading order."""
+    return "\n".join(get_ocr_reader().readtext(image, detail=0, paragraph=True))
+
+def _page_images(source: Union[bytes, str], page_num: int) -> List[bytes]:
+    """
+    Return images to OCR for a PDF page.
+
+    Renders the page when PyMuPDF is installed; otherwise falls back to the images
+    embedded in the page, which for scanned documents is the page scan itself.
+    """
+    try:
+        import fitz
+        document = fitz.open(stream=source, filetype="pdf") if isinstance(source, bytes) else fitz.open(source)
+        with document:
+            return [document[page_num].get_pixmap(dpi=OCR_RENDER_DPI).tobytes("png")]
+    except ImportError:
+        pass
+    reader = PyPDF2.PdfReader(io.BytesIO(source)) if isinstance(source, bytes) else PyPDF2.PdfReader(source)
+    return [image.data for image in reader.pages[page_num].images]
+
+def _ocr_pdf_page_batch(source: Union[bytes, str], page_nums: List[int]) -> List[Dict[str, Any]]:
+    """OCR a batch of PDF pages inside a worker process, timing each page."""
+    results = []
+    for page_num in page_nums:
+        start = time.perf_counter()
+        try:
+            text = "\n".join(_read_image(image) for image in _page_images(source, page_num))
+            error = None
+        except Exception as e:
+            text = ""
+            error = str(e)
+        results.append({
+            "page": page_num,
+            "text": text,
+            "seconds": time.perf_counter() - start,
+            "error": error
+        })
+    return results
+
+def _ocr_image_batch(images: List[Tuple[int, Union[bytes, str]]]) -> List[Dict[str, Any]]:
+    """OCR a batch of (index, image) pairs inside a worker process, timing each one."""
+    results = []
+    for index, image in images:
+        start = time.perf_counter()
+        try:
+            text, error = _read_image(image), None
+        except Exception as e:
+            text, error = "", str(e)
+        results.append({"page": index, "text": text, "seconds": time.perf_counter() - start, "error": error})
+    return results
+
+def get_ocr_executor() -> ProcessPoolExecutor:
+    """Return the shared OCR process pool, creating it on first use."""
+    global _ocr_executor
+    if _ocr_executor is None:
+        _ocr_executor = create_process_pool(OCR_WORKERS)
+    return _ocr_executor
+
+async def warm_ocr_workers():
+    """Load the OCR model in every worker ahead of the first scanned document."""
+    loop = asyncio.get_running_loop()
+    executor = get_ocr_executor()
+    await asyncio.gather(*(loop.run_in_executor(executor, _warm_reader) for _ in range(OCR_WORKERS)))
+
+def shutdown_ocr_executor():
+    """Shut down the OCR process pool, if it was started."""
+    global _ocr_executor
+    if _ocr_executor is not None:
+        _ocr_executor.shutdown(wait=False, cancel_futures=True)
+        _ocr_executor = None
+
+def needs_ocr(page_text: str) -> bool:
+    """Whether a page's extracted text is too sparse to be anything but a scan."""
+    return len(page_text.strip()) < OCR_MIN_CHARS
+
+def _log_timings(results: List[Dict[str, Any]], label: str):
+    for result in results:
+        if result["error"]:
+            logger.warning(f"OCR failed for {label} {result['page']} after {result['seconds']:.2f}s: {result['error']}")
+        else:
+            logger.info(f"OCR {label} {result['page']}: {len(result['text'])} characters in {result['seconds']:.2f}s")
+
+async def _run_batches(fn, items: List[Any]) -> List[Dict[str, Any]]:
+    """Split items into OCR_BATCH_SIZE batches and run fn over them on the OCR pool."""
+    loop = asyncio.get_running_loop()
+    executor = get_ocr_executor()
+    batches = [items[i:i + OCR_BATCH_SIZE] for i in range(0, len(items), OCR_BATCH_SIZE)]
+    calls = [loop.run_in_executor(executor, fn, batch) for batch in batches]
+    return [result for batch in await asyncio.gather(*calls) for result in batch]
+
+async def ocr_pdf_pages(source: Union[bytes, str], page_nums: List[int]) -> List[Dict[str, Any]]:
+    """
+    OCR the given PDF pages on the OCR worker pool.
+
+    Returns one dict per page with its text, OCR time in seconds and any error.
+    """
+    if not page_nums:
+        return []
+    results = await _run_batches(partial(_ocr_pdf_page_batch, source), page_nums)
+    _log_timings(results, "page")
+    return results
+
+async def ocr_images(images: List[Union[bytes, str]]) -> List[Dict[str, Any]]:
+    """OCR standalone images (e.g. photographed term sheets), given as bytes or file paths."""
+    if not images:
+        return []
+    results = await _run_batches(_ocr_image_batch, list(enumerate(images)))
+    _log_timings(results, "image")
+    return results
@@ -0,0 +1,218 @@
+from typing import Any, Dict, List, Optional, Union
+import csv
+import datetime
+import io
+import logging
+import os
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+
+logger = logging.getLogger(__name__)
+
+# Rows rendered per table; longer tables are cut and summarized numerically instead
+TABLE_MAX_ROWS = int(os.getenv("TABLE_MAX_ROWS", "200"))
+# Columns rendered per table; wide sheets are usually scratch space past this point
+TABLE_MAX_COLUMNS = int(os.getenv("TABLE_MAX_COLUMNS", "30"))
+
+# Delimited text without a header row must keep the same shape over this many lines to count as CSV
+CSV_MIN_LINES = int(os.getenv("CSV_MIN_LINES", "6"))
+# Cells with more words than this read as clauses of prose rather than data values
+CSV_MAX_CELL_WORDS = 8
+CSV_MAX_HEADER_WORDS = 4
+
+OfficeSource = Union[bytes, str]
+
+# Numbers as they appear in exported tables: signs, currency, thousands separators, %, (negatives)
+_NUMERIC_CELL = re.compile(r"^[-+(]?[$€£]?\d[\d,]*(\.\d+)?%?\)?$")
+
+_WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+def _open_source(source: OfficeSource):
+    """Return something pandas and zipfile can read from raw bytes or a path."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    return source
+
+def _format_cell(value: Any) -> str:
+    """Render a cell compactly: whole numbers without '.0', other floats to 2 places, bare dates."""
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        if value != value:  # NaN
+            return ""
+        if value.is_integer():
+            return str(int(value))
+        return f"{value:.2f}"
+    # Spreadsheet dates come back as midnight timestamps; the time adds nothing
+    if isinstance(value, datetime.datetime) and value.time() == datetime.time():
+        return value.date().isoformat()
+    return " ".join(str(value).split())
+
+def render_table(rows: List[List[Any]]) -> str:
+    """
+    Render rows as a compact pipe-separated table, the first row being the header.
+
+    Empty rows and columns are dropped and there is no column padding, which keeps
+    tables at a fraction of the tokens of their raw cell text. Tables longer than
+    TABLE_MAX_ROWS are cut with a note of how many rows were left out.
+    """
+    cells = [[_format_cell(value) for value in row[:TABLE_MAX_COLUMNS]] for row in rows]
+    cells = [row for row in cells if any(row)]
+    if not cells:
+        return ""
+    width = max(len(row) for row in cells)
+    cells = [row + [""] * (width - len(row)) for row in cells]
+    keep = [col for col in range(width) if any(row[col] for row in cells)]
+    lines = [" | ".join(row[col] for col in keep) for row in cells[:TABLE_MAX_ROWS + 1]]
+    if len(cells) > TABLE_MAX_ROWS + 1:
+        lines.append(f"... {len(cells) - TABLE_MAX_ROWS - 1} more rows")
+    return "\n".join(lines)
+
+def summarize_numeric(frame) -> Dict[str, Dict[str, float]]:
+    """
+    Compute count, sum, mean, min, max, first and last for each mostly-numeric column.
+
+    The first row of the frame is taken as the header, as in render_table.
+    """
+    import pandas as pd
+
+    header = [_format_cell(value) or f"column {n + 1}" for n, value in enumerate(frame.iloc[0])]
+    body = frame.iloc[1:]
+    summary = {}
+    for name, column in zip(header, body.columns):
+        values = pd.to_numeric(body[column], errors="coerce").dropna()
+        # Skip label columns and columns that are mostly text
+        if len(values) < 2 or len(values) < body[column].notna().sum() / 2:
+            continue
+        summary[name] = {
+            "count": int(values.count()),
+            "sum": float(values.sum()),
+            "mean": float(values.mean()),
+            "min": float(values.min()),
+            "max": float(values.max()),
+            "first": float(values.iloc[0]),
+            "last": float(values.iloc[-1])
+        }
+    return summary
+
+def render_frame(frame) -> str:
+    """Render a header-less DataFrame as a compact table, summarizing it numerically if it was cut."""
+    frame = frame.dropna(how="all").dropna(axis=1, how="all")
+    if frame.empty:
+        return ""
+    text = render_table(frame.values.tolist())
+    if len(frame) > TABLE_MAX_ROWS + 1:
+        summary = summarize_numeric(frame)
+        if summary:
+            text += "\nColumn totals over all rows:\n" + "\n".join(
+                f"{name}: " + ", ".join(f"{stat}={_format_cell(value)}" for stat, value in stats.items())
+                for name, stats in summary.items()
+            )
+    return text
+
+def extract_text_from_xlsx(source: OfficeSource) -> Optional[str]:
+    """Extract every non-empty sheet of a workbook as a compact table."""
+    try:
+        import pandas as pd
+
+        sheets = pd.read_excel(_open_source(source), sheet_name=None, header=None)
+        parts = []
+        for sheet_name, frame in sheets.items():
+            table = render_frame(frame)
+            if table:
+                parts.append(f"SHEET: {sheet_name}\n{table}")
+        text = "\n\n".join(parts)
+        logger.info(f"Successfully extracted {len(parts)} sheets from workbook, {len(text)} characters")
+        return text
+    except Exception as e:
+        logger.error(f"Error extracting text from workbook: {str(e)}")
+        return None
+
+def extract_text_from_csv(text: str) -> Optional[str]:
+    """Parse delimited text and render it as a compact table."""
+    try:
+        import pandas as pd
+
+        # sep=None lets the python engine sniff the delimiter
+        frame = pd.read_csv(io.StringIO(text), sep=None, engine="python", header=None)
+        table = render_frame(frame)
+        logger.info(f"Successfully extracted {len(frame)} CSV rows, {len(table)} characters")
+        return table
+    except Exception as e:
+        logger.error(f"Error extracting text from CSV: {str(e)}")
+        return None
+
+def _is_numeric(cell: str) -> bool:
+    return bool(_NUMERIC_CELL.match(cell.strip()))
+
+def _has_header(rows: List[List[str]]) -> bool:
+    """Whether the first row names the columns: distinct short labels above at least one numeric column."""
+    labels = [cell.strip() for cell in rows[0]]
+    if not all(labels) or len(set(labels)) != len(labels):
+        return False
+    if any(_is_numeric(label) or len(label.split()) > CSV_MAX_HEADER_WORDS for label in labels):
+        return False
+    return any(all(_is_numeric(row[col]) for row in rows[1:]) for col in range(len(labels)))
+
+def looks_like_csv(sample: str, min_lines: int = CSV_MIN_LINES) -> bool:
+    """
+    Whether text is delimited data rather than prose that happens to contain delimiters.
+
+    Every sampled line must split into the same number (at least two) of short
+    fields, and that shape must either repeat over min_lines lines or sit under a
+    header row. Lines that read as sentences rule the sample out.
+    """
+    lines = [line for line in sample.splitlines()[:20] if line.strip()]
+    # The last line of a prefix sample may be cut short
+    if len(lines) > 3:
+        lines = lines[:-1]
+    if len(lines) < 3:
+        return False
+    if sum(line.rstrip().endswith((".", "!", "?")) for line in lines) * 2 > len(lines):
+        return False
+    for delimiter in (",", "\t", ";", "|"):
+        if delimiter not in lines[0]:
+            continue
+        rows = list(csv.reader(lines, delimiter=delimiter))
+        width = len(rows[0])
+        if width < 2 or any(len(row) != width for row in rows):
+            continue
+        if any(len(cell.split()) > CSV_MAX_CELL_WORDS for row in rows for cell in row):
+            continue
+        if len(rows) >= min_lines or _has_header(rows):
+            return True
+    return False
+
+def _paragraph_text(paragraph: ET.Element) -> str:
+    return "".join(node.text or "" for node in paragraph.iter(f"{_WORD_NS}t"))
+
+def extract_text_from_docx(source: OfficeSource) -> Optional[str]:
+    """Extract paragraphs and tables from a DOCX in document order; tables render compactly."""
+    try:
+        with zipfile.ZipFile(_open_source(source)) as archive:
+            root = ET.fromstring(archive.read("word/document.xml"))
+        body = root.find(f"{_WORD_NS}body")
+        parts = []
+        for element in body if body is not None else []:
+            if element.tag == f"{_WORD_NS}p":
+                text = _paragraph_text(element)
+                if text.strip():
+                    parts.append(text)
+            elif element.tag == f"{_WORD_NS}tbl":
+                rows = [
+                    [
+                        " ".join(_paragraph_text(p) for p in cell.iter(f"{_WORD_NS}p"))
+                        for cell in row.findall(f"{_WORD_NS}tc")
+                    ]
+                    for row in element.iter(f"{_WORD_NS}tr")
+                ]
+                table = render_table(rows)
+                if table:
+                    parts.append(table)
+        text = "\n\n".join(parts)
+        logger.info(f"Successfully extracted text from DOCX, {len(text)} characters")
+        return text
+    except Exception as e:
+        logger.error(f"Error extracting text from DOCX: {str(e)}")
+        return None
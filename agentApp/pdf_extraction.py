@@ -0,0 +1,154 @@
+from typing import Iterator, List, Optional, Tuple, Union
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import io
+import logging
+import math
+import os
+import signal
+
+import PyPDF2
+
+from .ocr import OCR_ENABLED, needs_ocr, ocr_pdf_pages
+from .workers import create_process_pool
+
+logger = logging.getLogger(__name__)
+
+# Number of worker processes used for CPU-bound PDF text extraction
+PDF_EXTRACTION_WORKERS = int(os.getenv("PDF_EXTRACTION_WORKERS", str(os.cpu_count() or 1)))
+# Upper bound on pages handed to a worker at once; smaller ranges stream sooner
+PDF_MAX_PAGES_PER_TASK = int(os.getenv("PDF_MAX_PAGES_PER_TASK", "32"))
+# PDFs with fewer pages than this are extracted in a single task
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "8"))
+# Seconds allowed per page before it is skipped (0 disables; needs SIGALRM)
+PDF_PAGE_TIMEOUT = float(os.getenv("PDF_PAGE_TIMEOUT", "10"))
+
+PdfSource = Union[bytes, str]
+
+_pdf_executor = None
+
+class PageTimeoutError(Exception):
+    """Raised inside a worker when a single page takes too long to extract."""
+
+def _open_reader(source: PdfSource) -> PyPDF2.PdfReader:
+    """Open a PDF from raw bytes or a filesystem path."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return PyPDF2.PdfReader(io.BytesIO(source))
+    return PyPDF2.PdfReader(source)
+
+def _raise_page_timeout(signum, frame):
+    raise PageTimeoutError()
+
+def _extract_page_range(source: PdfSource, start: int, end: int, page_timeout: float) -> List[str]:
+    """Extract text for pages [start, end); a page that fails or times out yields ''."""
+    reader = _open_reader(source)
+    use_alarm = page_timeout > 0 and hasattr(signal, "SIGALRM")
+    if use_alarm:
+        previous_handler = signal.signal(signal.SIGALRM, _raise_page_timeout)
+
+    pages = []
+    try:
+        for page_num in range(start, end):
+            try:
+                if use_alarm:
+                    signal.setitimer(signal.ITIMER_REAL, page_timeout)
+                pages.append(reader.pages[page_num].extract_text() or "")
+            except PageTimeoutError:
+                logger.warning(f"Page {page_num} exceeded {page_timeout}s extraction timeout, skipping")
+                pages.append("")
+            except Exception as e:
+                logger.warning(f"Error extracting page {page_num}: {str(e)}")
+                pages.append("")
+            finally:
+                if use_alarm:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+    finally:
+        if use_alarm:
+            signal.signal(signal.SIGALRM, previous_handler)
+    return pages
+
+def get_page_count(source: PdfSource) -> int:
+    """Return the number of pages in a PDF."""
+    return len(_open_reader(source).pages)
+
+def _page_ranges(page_count: int) -> List[Tuple[int, int]]:
+    """Split pages into contiguous ranges, roughly one per worker and capped for streaming."""
+    if page_count < PDF_PARALLEL_MIN_PAGES:
+        return [(0, page_count)] if page_count else []
+    per_task = max(1, min(PDF_MAX_PAGES_PER_TASK, math.ceil(page_count / PDF_EXTRACTION_WORKERS)))
+    return [(start, min(start + per_task, page_count)) for start in range(0, page_count, per_task)]
+
+def get_pdf_executor() -> ProcessPoolExecutor:
+    """Return the shared process pool used for PDF extraction, creating it on first use."""
+    global _pdf_executor
+    if _pdf_executor is None:
+        _pdf_executor = create_process_pool(PDF_EXTRACTION_WORKERS)
+    return _pdf_executor
+
+def shutdown_pdf_executor():
+    """Shut down the PDF extraction process pool, if it was started."""
+    global _pdf_executor
+    if _pdf_executor is not None:
+        _pdf_executor.shutdown(wait=False, cancel_futures=True)
+        _pdf_executor = None
+
+def iter_pdf_pages(source: PdfSource) -> Iterator[str]:
+    """
+    Yield the text of each page in order, extracting page ranges in parallel.
+
+    Ranges are submitted to the shared process pool up front, so later ranges are
+    already being extracted while earlier pages are consumed.
+    """
+    ranges = _page_ranges(get_page_count(source))
+    executor = get_pdf_executor()
+    futures = [
+        executor.submit(_extract_page_range, source, start, end, PDF_PAGE_TIMEOUT)
+        for start, end in ranges
+    ]
+    try:
+        for future in futures:
+            yield from future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+def extract_text_from_pdf(pdf_content: PdfSource) -> Optional[str]:
+    """Extract text from PDF binary content or a PDF file path."""
+    try:
+        text = "".join(page + "\n\n" for page in iter_pdf_pages(pdf_content))
+        logger.info(f"Successfully extracted text from PDF, {len(text)} characters")
+        return text
+    except Exception as e:
+        logger.error(f"Error extracting text from PDF: {str(e)}")
+        return None
+
+async def extract_text_from_pdf_async(pdf_content: PdfSource) -> Optional[str]:
+    """
+    Extract text from a PDF without blocking the event loop.
+
+    Pages with no extractable text (scans) are sent through OCR when it is enabled.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+        page_count = await asyncio.to_thread(get_page_count, pdf_content)
+        executor = get_pdf_executor()
+        page_ranges = await asyncio.gather(*(
+            loop.run_in_executor(executor, _extract_page_range, pdf_content, start, end, PDF_PAGE_TIMEOUT)
+            for start, end in _page_ranges(page_count)
+        ))
+        pages = [page for pages in page_ranges for page in pages]
+        
+        if OCR_ENABLED:
+            scanned_pages = [page_num for page_num, page in enumerate(pages) if needs_ocr(page)]
+            if scanned_pages:
+                logger.info(f"Running OCR on {len(scanned_pages)} of {page_count} pages with no extractable text")
+                for result in await ocr_pdf_pages(pdf_content, scanned_pages):
+                    if result["text"]:
+                        pages[result["page"]] = result["text"]
+        
+        text = "".join(page + "\n\n" for page in pages)
+        logger.info(f"Successfully extracted text from PDF, {len(text)} characters")
+        return text
+    except Exception as e:
+        logger.error(f"Error extracting text from PDF: {str(e)}")
+        return None
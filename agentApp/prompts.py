@@ -0,0 +1,173 @@
+from typing import Any, Dict
+from .cache import make_cache_key
+
+# Prompt registry. Every template has a name and a version; bump the version when
+# changing a template's wording. PROMPT_REGISTRY_VERSION covers both the versions
+# and the text, so any edit invalidates cached analysis results.
+#
+# Prompts that read the documents are built as DOCUMENT_PREFIX + a task suffix.
+# The prefix is byte-identical across the financial, terms, market and economy
+# calls for the same text, so providers with automatic prompt caching (OpenAI
+# caches prefixes of 1024+ tokens) can reuse the document tokens after the first
+# call instead of processing them again.
+
+DOCUMENT_PREFIX = """You are assisting with investment due diligence. The documents under review follow.
+
+{combined_docs}
+{fact_sheet}"""
+
+FACT_SHEET_SECTION = """
+Key figures found in the text (@character offset, kind, matched text, nearby keyword, xN if repeated):
+{facts}
+"""
+
+FACT_SHEET_ONLY_TEXT = "(Full text omitted: work from the key figures below.)"
+
+FINANCIAL_ANALYSIS_TASK = """
+Task: analyze the financial aspects in the documents above.
+
+Extract and return ONLY a JSON object with these fields:
+- "valuation_assessment": Extract any valuation information or "unknown" if not found
+- "projection_realism": Information about growth projections or "unknown" if not found
+- "risk_factors": List of risk factors or ["unknown"] if not found
+
+Return ONLY the JSON.
+"""
+
+TERMS_ANALYSIS_TASK = """
+Task: analyze the investment terms in the documents above.
+
+Extract and return ONLY a JSON object with these fields:
+- "unusual_terms": List any unusual terms or ["unknown"] if not found
+- "favorable_terms": List favorable terms or ["unknown"] if not found
+- "recommended_negotiation_points": List recommended negotiation points or ["unknown"] if not found
+
+Return ONLY the JSON.
+"""
+
+MARKET_ANALYSIS_TASK = """
+Task: extract market information from the documents above.
+
+Return ONLY a JSON object with these fields:
+- "market_size": Any market size information or "unknown" if not found
+- "competition": Information about competitors or "unknown" if not found
+
+Return ONLY the JSON.
+"""
+
+ECONOMY_ANALYSIS_TASK = """
+Task: perform a due diligence screening of the documents above.
+
+Return ONLY a JSON object with these fields:
+- "financial_analysis": {{"valuation_assessment": valuation information or "unknown", "projection_realism": information about growth projections or "unknown", "risk_factors": list of risk factors or ["unknown"]}}
+- "terms_analysis": {{"unusual_terms": list or ["unknown"], "favorable_terms": list or ["unknown"], "recommended_negotiation_points": list or ["unknown"]}}
+- "market_analysis": {{"market_size": market size information or "unknown", "competition": information about competitors or "unknown"}}
+- "report": {{"executive_summary": summary of the overall findings, "financial_analysis": summary of the financial findings, "terms_analysis": summary of the terms findings, "market_analysis": summary of the market findings, "recommendation": a final recommendation}}
+
+Return ONLY the JSON.
+"""
+
+REPORT_PROMPT = """
+Generate a comprehensive due diligence report based on this analysis:
+
+{analysis_json}
+
+Return ONLY a JSON object with these fields:
+- "executive_summary": A summary of the overall findings
+- "financial_analysis": A summary of the financial findings
+- "terms_analysis": A summary of the terms findings
+- "market_analysis": A summary of the market findings
+- "recommendation": A final recommendation based on the findings
+
+Return ONLY the JSON.
+"""
+
+SYNTHESIS_REPORT_PROMPT = """
+Generate a comprehensive due diligence report across a set of related documents.
+Each document was analyzed separately; here are the per-document analyses, keyed by document name:
+
+{analysis_json}
+
+Combine the findings into one view of the investment. Where documents disagree
+(for example different valuations, figures or terms), call out the conflict and
+name the documents involved.
+
+Return ONLY a JSON object with these fields:
+- "executive_summary": A summary of the overall findings across all documents
+- "financial_analysis": A summary of the financial findings
+- "terms_analysis": A summary of the terms findings
+- "market_analysis": A summary of the market findings
+- "recommendation": A final recommendation based on the findings
+
+Return ONLY the JSON.
+"""
+
+# The report comes first so follow-up questions about the same report share a prefix
+USER_QUERY_PROMPT = """
+Due diligence report:
+{report_str}
+
+Based on this report, answer the user's query: "{query}"
+
+Only use information from the report. If information is not available, say it's unknown.
+"""
+
+# Passages retrieved for the question follow the report, keeping the report prefix shared
+GROUNDED_USER_QUERY_PROMPT = """
+Due diligence report:
+{report_str}
+
+Passages from the documents that may be relevant:
+{passages}
+
+Based on this report and these passages, answer the user's query: "{query}"
+
+Only use information from the report and the passages, citing the document a passage came from.
+If information is not available, say it's unknown.
+"""
+
+NO_REPORT_PROMPT = "I don't have enough information to answer your query: {query}"
+
+DIRECT_ANALYSIS_PROMPT = """
+Analyze this investment document for due diligence:
+
+{document_content}
+
+Create a effective and concised analysis that focuses on only key insights. Only 2 lines each and give 1 overall recommendation.
+1. Financial assessment
+2. Terms analysis
+3. Risk assessment
+4. Overall recommendation
+"""
+
+PROMPTS: Dict[str, Dict[str, Any]] = {
+    "document_prefix": {"version": 1, "template": DOCUMENT_PREFIX},
+    "fact_sheet": {"version": 1, "template": FACT_SHEET_SECTION},
+    "fact_sheet_only": {"version": 1, "template": FACT_SHEET_ONLY_TEXT},
+    "financial_analysis": {"version": 2, "template": FINANCIAL_ANALYSIS_TASK},
+    "terms_analysis": {"version": 2, "template": TERMS_ANALYSIS_TASK},
+    "market_analysis": {"version": 2, "template": MARKET_ANALYSIS_TASK},
+    "economy_analysis": {"version": 2, "template": ECONOMY_ANALYSIS_TASK},
+    "report": {"version": 1, "template": REPORT_PROMPT},
+    "synthesis_report": {"version": 1, "template": SYNTHESIS_REPORT_PROMPT},
+    "user_query": {"version": 2, "template": USER_QUERY_PROMPT},
+    "grounded_user_query": {"version": 1, "template": GROUNDED_USER_QUERY_PROMPT},
+    "no_report": {"version": 1, "template": NO_REPORT_PROMPT},
+    "direct_analysis": {"version": 1, "template": DIRECT_ANALYSIS_PROMPT},
+}
+
+PROMPT_REGISTRY_VERSION = make_cache_key(*(
+    f"{name}@{prompt['version']}:{prompt['template']}" for name, prompt in sorted(PROMPTS.items())
+))[:16]
+
+def prompt_versions() -> Dict[str, int]:
+    """Return the version of every registered prompt, e.g. for logging alongside results."""
+    return {name: prompt["version"] for name, prompt in PROMPTS.items()}
+
+def render_prompt(name: str, **values) -> str:
+    """Fill in a registered prompt template."""
+    return PROMPTS[name]["template"].format(**values)
+
+def render_document_prompt(task: str, combined_docs: str, fact_sheet: str = "") -> str:
+    """Build a document-reading prompt: the shared document prefix followed by the task suffix."""
+    return render_prompt("document_prefix", combined_docs=combined_docs, fact_sheet=fact_sheet) + render_prompt(task)
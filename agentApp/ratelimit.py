@@ -0,0 +1,108 @@
+from typing import Optional
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider that has been failing repeatedly."""
+
+class TokenBucket:
+    """
+    Async token bucket refilled continuously at rate_per_minute, holding at most capacity.
+
+    Waiters are served in arrival order. The level may go negative when a caller
+    reports that it used more than it reserved; later callers then wait longer.
+    block() pauses the bucket, e.g. when the provider returns a retry-after.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1) -> float:
+        """Wait until amount is available and take it; returns the seconds spent waiting."""
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                delay = self.blocked_until - now
+                if delay <= 0:
+                    if self.level >= amount:
+                        self.level -= amount
+                        return waited
+                    delay = (amount - self.level) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+
+    def adjust(self, amount: float):
+        """Take (or, if negative, give back) amount after the fact."""
+        self._refill(time.monotonic())
+        self.level = min(self.capacity, self.level - amount)
+
+    def block(self, seconds: float):
+        """Hand out nothing for the next seconds."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+class CircuitBreaker:
+    """
+    Closed -> open after failure_threshold consecutive failures; open -> half-open after reset_seconds.
+
+    While open, calls are rejected immediately. In half-open a single probe call is
+    let through: success closes the circuit, failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now."""
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self.state = self.HALF_OPEN
+            self._probing = False
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def release(self):
+        """Give up a half-open probe without a verdict, e.g. when the call was cancelled."""
+        self._probing = False
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            logger.info("Circuit closed: provider calls are succeeding again")
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(f"Circuit opened after {self.failures} consecutive failures; rejecting calls for {self.reset_seconds}s")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._probing = False
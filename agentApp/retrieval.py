@@ -0,0 +1,347 @@
+from typing import Any, Dict, List, Optional
+from collections import OrderedDict
+import asyncio
+import base64
+import io
+import logging
+import os
+import re
+import time
+import zlib
+import numpy as np
+from .cache import SQLiteCache, make_cache_key, RESULT_CACHE_PATH, RESULT_CACHE_TTL, RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_MAX_BYTES
+from .chunking import chunk_text
+
+logger = logging.getLogger(__name__)
+
+# Retrieval over document passages for follow-up questions
+RETRIEVAL_ENABLED = os.getenv("RETRIEVAL_ENABLED", "true").lower() in ("1", "true", "yes")
+# "hashing" (deterministic, offline), "sentence-transformers" (local model) or "openai"
+RETRIEVAL_EMBEDDINGS = os.getenv("RETRIEVAL_EMBEDDINGS", "hashing")
+RETRIEVAL_EMBEDDING_MODEL = os.getenv("RETRIEVAL_EMBEDDING_MODEL", "")
+RETRIEVAL_HASHING_DIMENSIONS = int(os.getenv("RETRIEVAL_HASHING_DIMENSIONS", "512"))
+RETRIEVAL_PASSAGE_TOKENS = int(os.getenv("RETRIEVAL_PASSAGE_TOKENS", "200"))
+RETRIEVAL_PASSAGE_OVERLAP_TOKENS = int(os.getenv("RETRIEVAL_PASSAGE_OVERLAP_TOKENS", "40"))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "4"))
+# Loaded indexes kept in memory so repeated questions skip decompression
+RETRIEVAL_MEMORY_ENTRIES = int(os.getenv("RETRIEVAL_MEMORY_ENTRIES", "32"))
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Reciprocal rank fusion constant for combining the dense and lexical rankings
+RRF_K = 60
+
+_TOKEN_PATTERN = re.compile(r"\w+(?:[.,]\d+)*")
+
+_index_store: Optional[SQLiteCache] = None
+_embedding_provider = None
+_loaded: "OrderedDict[str, RetrievalIndex]" = OrderedDict()
+_building: Dict[str, asyncio.Task] = {}
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_PATTERN.findall(text.lower())
+
+def _term_hash(term: str) -> int:
+    return zlib.crc32(term.encode("utf-8"))
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+class HashingEmbeddings:
+    """
+    Deterministic offline stand-in for an embedding model.
+
+    Word unigrams and bigrams are hashed into a fixed number of signed buckets and
+    the vectors L2-normalized. Needs no model download or network, gives identical
+    vectors on every machine, and still ranks passages sharing vocabulary with a
+    question above unrelated ones.
+    """
+
+    def __init__(self, dimensions: int = RETRIEVAL_HASHING_DIMENSIONS):
+        self.dimensions = dimensions
+        self.name = f"hashing-{dimensions}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        rows, columns, signs = [], [], []
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+                hashed = _term_hash(feature)
+                rows.append(row)
+                columns.append(hashed % self.dimensions)
+                signs.append(1.0 if hashed & 0x80000000 else -1.0)
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        np.add.at(vectors, (np.asarray(rows, dtype=np.int64), np.asarray(columns, dtype=np.int64)), np.asarray(signs, dtype=np.float32))
+        return _normalize(vectors)
+
+class SentenceTransformerEmbeddings:
+    """Local embedding model from sentence-transformers, loaded on first use."""
+
+    def __init__(self, model: str = None):
+        self.model_name = model or "all-MiniLM-L6-v2"
+        self.name = f"sentence-transformers-{self.model_name}"
+        self._model = None
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer(self.model_name)
+        return _normalize(np.asarray(self._model.encode(texts, batch_size=64), dtype=np.float32))
+
+class OpenAIEmbeddings:
+    """Embeddings from the OpenAI API."""
+
+    def __init__(self, model: str = None):
+        from langchain_openai import OpenAIEmbeddings as LangChainOpenAIEmbeddings
+        self.model_name = model or "text-embedding-3-small"
+        self.name = f"openai-{self.model_name}"
+        self._client = LangChainOpenAIEmbeddings(model=self.model_name, api_key=os.getenv("OPENAI_API_KEY"))
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return _normalize(np.asarray(self._client.embed_documents(texts), dtype=np.float32))
+
+EMBEDDING_PROVIDERS = {
+    "hashing": lambda model: HashingEmbeddings(),
+    "sentence-transformers": SentenceTransformerEmbeddings,
+    "openai": OpenAIEmbeddings,
+}
+
+def get_embedding_provider():
+    """Return the configured embedding provider, creating it on first use."""
+    global _embedding_provider
+    if _embedding_provider is None:
+        _embedding_provider = EMBEDDING_PROVIDERS[RETRIEVAL_EMBEDDINGS](RETRIEVAL_EMBEDDING_MODEL or None)
+    return _embedding_provider
+
+def set_embedding_provider(provider):
+    """Replace the embedding provider; anything with a name and embed(texts) -> array works."""
+    global _embedding_provider
+    _embedding_provider = provider
+
+def _pack_strings(strings: List[str]) -> Dict[str, np.ndarray]:
+    """Store strings as one UTF-8 byte array plus offsets, far smaller than a fixed-width string array."""
+    encoded = [string.encode("utf-8") for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(data) for data in encoded])
+    return {"data": np.frombuffer(b"".join(encoded), dtype=np.uint8), "offsets": offsets}
+
+def _unpack_string(data: np.ndarray, offsets: np.ndarray, position: int) -> str:
+    return data[offsets[position]:offsets[position + 1]].tobytes().decode("utf-8")
+
+class RetrievalIndex:
+    """
+    Passages of a set of documents with a dense (embedding) and a BM25 lexical index.
+
+    Everything is held in NumPy arrays: float16 passage embeddings, passage text as
+    one UTF-8 buffer with offsets, and BM25 postings sorted by hashed term with
+    the per-posting score precomputed, so a query is a matrix-vector product plus a
+    few array slices.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.arrays = arrays
+        self._embeddings: Optional[np.ndarray] = None
+
+    @classmethod
+    def build(cls, documents: Dict[str, str], provider) -> "RetrievalIndex":
+        names, passages, passage_docs, starts, ends = [], [], [], [], []
+        for name, text in documents.items():
+            names.append(name)
+            for chunk in chunk_text(text, RETRIEVAL_PASSAGE_TOKENS, RETRIEVAL_PASSAGE_OVERLAP_TOKENS):
+                if not chunk["text"].strip():
+                    continue
+                passages.append(chunk["text"])
+                passage_docs.append(len(names) - 1)
+                starts.append(chunk["start"])
+                ends.append(chunk["end"])
+
+        embeddings = provider.embed(passages) if passages else np.zeros((0, 1), dtype=np.float32)
+        packed_text = _pack_strings(passages)
+        packed_names = _pack_strings(names)
+        arrays = {
+            "embeddings": embeddings.astype(np.float16),
+            "passage_docs": np.asarray(passage_docs, dtype=np.int32),
+            "passage_starts": np.asarray(starts, dtype=np.int64),
+            "passage_ends": np.asarray(ends, dtype=np.int64),
+            "text_data": packed_text["data"],
+            "text_offsets": packed_text["offsets"],
+            "name_data": packed_names["data"],
+            "name_offsets": packed_names["offsets"],
+        }
+        arrays.update(cls._build_bm25(passages))
+        return cls(arrays)
+
+    @staticmethod
+    def _build_bm25(passages: List[str]) -> Dict[str, np.ndarray]:
+        """Term-major postings: for each hashed term, the passages containing it and their BM25 weight."""
+        rows, hashes = [], []
+        lengths = np.zeros(len(passages), dtype=np.float32)
+        for row, passage in enumerate(passages):
+            tokens = tokenize(passage)
+            lengths[row] = len(tokens)
+            rows.extend([row] * len(tokens))
+            hashes.extend(_term_hash(token) for token in tokens)
+        rows = np.asarray(rows, dtype=np.uint64)
+        hashes = np.asarray(hashes, dtype=np.uint64)
+
+        # Unique (term, passage) pairs with their counts, sorted by term then passage
+        pairs, tf = np.unique((hashes << np.uint64(32)) | rows, return_counts=True)
+        term_of_pair = (pairs >> np.uint64(32)).astype(np.uint32)
+        post_docs = (pairs & np.uint64(0xFFFFFFFF)).astype(np.int32)
+        term_hashes, term_starts, df = np.unique(term_of_pair, return_index=True, return_counts=True)
+        term_indptr = np.append(term_starts, len(pairs)).astype(np.int64)
+
+        count = max(len(passages), 1)
+        average_length = float(lengths.mean()) if len(passages) else 1.0
+        idf = np.log1p((count - df + 0.5) / (df + 0.5)).astype(np.float32)
+        tf = tf.astype(np.float32)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[post_docs] / max(average_length, 1e-6))
+        post_weights = np.repeat(idf, df) * tf * (BM25_K1 + 1) / (tf + norm)
+        return {
+            "term_hashes": term_hashes,
+            "term_indptr": term_indptr,
+            "post_docs": post_docs,
+            "post_weights": post_weights.astype(np.float32),
+        }
+
+    def __len__(self) -> int:
+        return len(self.arrays["passage_docs"])
+
+    def bm25_scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self), dtype=np.float32)
+        term_hashes = self.arrays["term_hashes"]
+        if not len(term_hashes):
+            return scores
+        hashes = np.unique(np.asarray([_term_hash(token) for token in tokenize(query)], dtype=np.uint32))
+        positions = np.searchsorted(term_hashes, hashes)
+        for position, hashed in zip(positions, hashes):
+            if position < len(term_hashes) and term_hashes[position] == hashed:
+                start, end = self.arrays["term_indptr"][position:position + 2]
+                # A term's postings name each passage once, so plain fancy indexing is safe
+                scores[self.arrays["post_docs"][start:end]] += self.arrays["post_weights"][start:end]
+        return scores
+
+    def dense_scores(self, query: str, provider) -> np.ndarray:
+        # Stored as float16; widened once per loaded index, not per query
+        if self._embeddings is None:
+            self._embeddings = self.arrays["embeddings"].astype(np.float32)
+        query_vector = provider.embed([query])[0]
+        return self._embeddings @ query_vector
+
+    def search(self, query: str, provider, k: int = RETRIEVAL_TOP_K) -> List[Dict[str, Any]]:
+        """
+        Return the k passages most relevant to query.
+
+        The dense and BM25 rankings are combined with reciprocal rank fusion, so
+        neither score scale dominates. Passages are returned best first with their
+        document name, character offsets and text.
+        """
+        if not len(self):
+            return []
+        depth = min(len(self), max(k * 4, 20))
+        fused = {}
+        for scores in (self.dense_scores(query, provider), self.bm25_scores(query)):
+            top = np.argpartition(-scores, depth - 1)[:depth]
+            for rank, row in enumerate(top[np.argsort(-scores[top])]):
+                if scores[row] > 0:
+                    fused[int(row)] = fused.get(int(row), 0.0) + 1 / (RRF_K + rank + 1)
+
+        passages = []
+        for row, score in sorted(fused.items(), key=lambda item: -item[1])[:k]:
+            passages.append({
+                "document": _unpack_string(self.arrays["name_data"], self.arrays["name_offsets"], self.arrays["passage_docs"][row]),
+                "start": int(self.arrays["passage_starts"][row]),
+                "end": int(self.arrays["passage_ends"][row]),
+                "text": _unpack_string(self.arrays["text_data"], self.arrays["text_offsets"], row),
+                "score": round(score, 6)
+            })
+        return passages
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **self.arrays)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "RetrievalIndex":
+        with np.load(io.BytesIO(data)) as archive:
+            return cls({name: archive[name] for name in archive.files})
+
+def get_index_store() -> SQLiteCache:
+    """Return the shared store of serialized retrieval indexes, opening it on first use."""
+    global _index_store
+    if _index_store is None:
+        _index_store = SQLiteCache(
+            RESULT_CACHE_PATH,
+            "retrieval_indexes",
+            ttl_seconds=RESULT_CACHE_TTL,
+            max_entries=RESULT_CACHE_MAX_ENTRIES,
+            max_bytes=RESULT_CACHE_MAX_BYTES
+        )
+    return _index_store
+
+def close_index_store():
+    """Close the retrieval index store and drop loaded indexes."""
+    global _index_store
+    if _index_store is not None:
+        _index_store.close()
+        _index_store = None
+    _loaded.clear()
+
+def retrieval_index_key(documents: Dict[str, str]) -> str:
+    """Content-addressed key for the index of a set of documents under the current provider and passage size."""
+    parts = [part for name, text in documents.items() for part in (name, text)]
+    settings = f"{get_embedding_provider().name}:{RETRIEVAL_PASSAGE_TOKENS}:{RETRIEVAL_PASSAGE_OVERLAP_TOKENS}"
+    return make_cache_key(settings, *parts)
+
+def _remember(key: str, index: RetrievalIndex) -> RetrievalIndex:
+    _loaded[key] = index
+    _loaded.move_to_end(key)
+    while len(_loaded) > RETRIEVAL_MEMORY_ENTRIES:
+        _loaded.popitem(last=False)
+    return index
+
+async def _load_or_build(key: str, documents: Optional[Dict[str, str]]) -> Optional[RetrievalIndex]:
+    stored = await asyncio.to_thread(get_index_store().get, key)
+    if stored is not None:
+        return _remember(key, await asyncio.to_thread(RetrievalIndex.from_bytes, base64.b64decode(stored["index"])))
+    if not documents:
+        return None
+
+    start = time.perf_counter()
+    index = await asyncio.to_thread(RetrievalIndex.build, documents, get_embedding_provider())
+    data = await asyncio.to_thread(index.to_bytes)
+    await asyncio.to_thread(get_index_store().set, key, {"index": base64.b64encode(data).decode("ascii")})
+    logger.info(f"Built retrieval index over {len(index)} passages in {time.perf_counter() - start:.2f}s ({len(data)} bytes)")
+    return _remember(key, index)
+
+async def get_index(key: str, documents: Optional[Dict[str, str]] = None) -> Optional[RetrievalIndex]:
+    """
+    Return the index stored under key, building it from documents if it does not exist yet.
+
+    Concurrent requests for the same key share one build. Returns None if the index
+    is not stored and no documents were given to build it from.
+    """
+    if key in _loaded:
+        _loaded.move_to_end(key)
+        return _loaded[key]
+    if key not in _building:
+        _building[key] = asyncio.ensure_future(_load_or_build(key, documents))
+        _building[key].add_done_callback(lambda _: _building.pop(key, None))
+    return await asyncio.shield(_building[key])
+
+async def retrieve(key: str, query: str, documents: Optional[Dict[str, str]] = None, k: int = RETRIEVAL_TOP_K) -> List[Dict[str, Any]]:
+    """Return the top-k passages for query from the index under key (see get_index)."""
+    index = await get_index(key, documents)
+    if index is None:
+        return []
+    return await asyncio.to_thread(index.search, query, get_embedding_provider(), k)
+
+def format_passages(passages: List[Dict[str, Any]]) -> str:
+    """Render retrieved passages for a prompt, each headed by its document and character range."""
+    return "\n\n".join(
+        f"[{passage['document']}, characters {passage['start']}-{passage['end']}]\n{passage['text']}"
+        for passage in passages
+    )
@@ -0,0 +1,33 @@
+from typing import List
+from pydantic import BaseModel, Field
+
+# Structured outputs requested from the LLM. Every field is required so the models
+# can be sent as strict JSON schemas; "unknown" stands in for missing information.
+
+class FinancialAnalysis(BaseModel):
+    valuation_assessment: str = Field(description='Any valuation information, or "unknown" if not found')
+    projection_realism: str = Field(description='Information about growth projections, or "unknown" if not found')
+    risk_factors: List[str] = Field(description='Risk factors, or ["unknown"] if not found')
+
+class TermsAnalysis(BaseModel):
+    unusual_terms: List[str] = Field(description='Unusual terms, or ["unknown"] if not found')
+    favorable_terms: List[str] = Field(description='Favorable terms, or ["unknown"] if not found')
+    recommended_negotiation_points: List[str] = Field(description='Recommended negotiation points, or ["unknown"] if not found')
+
+class MarketAnalysis(BaseModel):
+    market_size: str = Field(description='Any market size information, or "unknown" if not found')
+    competition: str = Field(description='Information about competitors, or "unknown" if not found')
+
+class DueDiligenceReport(BaseModel):
+    executive_summary: str = Field(description="A summary of the overall findings")
+    financial_analysis: str = Field(description="A summary of the financial findings")
+    terms_analysis: str = Field(description="A summary of the terms findings")
+    market_analysis: str = Field(description="A summary of the market findings")
+    recommendation: str = Field(description="A final recommendation based on the findings")
+
+class EconomyAnalysis(BaseModel):
+    """Every section of the analysis and the report, produced by a single call."""
+    financial_analysis: FinancialAnalysis
+    terms_analysis: TermsAnalysis
+    market_analysis: MarketAnalysis
+    report: DueDiligenceReport
@@ -0,0 +1,122 @@
+from typing import Any, Awaitable, Dict, Optional
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+import aiosqlite
+import asyncio
+import logging
+import os
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Analysis sessions: graph state is checkpointed so follow-up questions can reuse it
+SESSIONS_ENABLED = os.getenv("SESSIONS_ENABLED", "true").lower() in ("1", "true", "yes")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.db")
+
+# Sessions unused for this long (seconds) are deleted. Follow-ups read passages from
+# the retrieval index, which expires after RESULT_CACHE_TTL, so keep this no longer
+SESSION_TTL = float(os.getenv("SESSION_TTL", str(7 * 24 * 3600)))
+# How often (seconds) expired sessions are pruned, starting when the store opens
+SESSION_PRUNE_INTERVAL = float(os.getenv("SESSION_PRUNE_INTERVAL", "3600"))
+
+_connection: Optional[aiosqlite.Connection] = None
+_checkpointer: Optional[AsyncSqliteSaver] = None
+_prune_task: Optional[asyncio.Task] = None
+# Session writes still in flight, by session ID
+_pending_writes: Dict[str, asyncio.Task] = {}
+
+async def init_checkpointer() -> Optional[AsyncSqliteSaver]:
+    """Open the SQLite checkpoint store if sessions are enabled and it is not open yet, and start pruning it."""
+    global _connection, _checkpointer, _prune_task
+    if SESSIONS_ENABLED and _checkpointer is None:
+        logger.info(f"Opening session checkpoint store at {SESSION_DB_PATH}")
+        _connection = await aiosqlite.connect(SESSION_DB_PATH)
+        await _connection.execute("PRAGMA journal_mode=WAL")
+        _checkpointer = AsyncSqliteSaver(_connection)
+        await _checkpointer.setup()
+        # Last use of each session, for expiry; sessions already stored start their TTL now
+        await _connection.execute(
+            "CREATE TABLE IF NOT EXISTS session_activity (thread_id TEXT PRIMARY KEY, last_used REAL NOT NULL)"
+        )
+        await _connection.execute(
+            "INSERT OR IGNORE INTO session_activity SELECT DISTINCT thread_id, ? FROM checkpoints", (time.time(),)
+        )
+        await _connection.commit()
+        _prune_task = asyncio.create_task(_prune_periodically())
+    return _checkpointer
+
+def get_checkpointer() -> Optional[AsyncSqliteSaver]:
+    """Return the open checkpoint store, or None when sessions are disabled or not initialized."""
+    return _checkpointer
+
+async def close_checkpointer():
+    """Finish pending session writes, stop pruning and close the checkpoint store's connection."""
+    global _connection, _checkpointer, _prune_task
+    if _pending_writes:
+        await asyncio.gather(*_pending_writes.values(), return_exceptions=True)
+    if _prune_task is not None:
+        _prune_task.cancel()
+        await asyncio.gather(_prune_task, return_exceptions=True)
+    if _connection is not None:
+        await _connection.close()
+    _connection = None
+    _checkpointer = None
+    _prune_task = None
+
+def new_session_id() -> str:
+    return uuid.uuid4().hex
+
+def session_config(session_id: str) -> Dict[str, Any]:
+    """Graph run config that reads and writes a session's checkpoints."""
+    return {"configurable": {"thread_id": session_id}}
+
+async def touch_session(session_id: str):
+    """Record that a session was just used, restarting its TTL."""
+    async with _checkpointer.lock:
+        await _connection.execute(
+            "INSERT OR REPLACE INTO session_activity (thread_id, last_used) VALUES (?, ?)", (session_id, time.time())
+        )
+        await _connection.commit()
+
+async def prune_sessions() -> int:
+    """Delete the checkpoints of sessions unused for longer than SESSION_TTL; returns how many were deleted."""
+    if _checkpointer is None:
+        return 0
+    cutoff = time.time() - SESSION_TTL
+    # One transaction under the checkpointer's lock, so a session in use is never half deleted
+    async with _checkpointer.lock:
+        for table in ("checkpoints", "writes"):
+            await _connection.execute(
+                f"DELETE FROM {table} WHERE thread_id IN (SELECT thread_id FROM session_activity WHERE last_used < ?)",
+                (cutoff,)
+            )
+        cursor = await _connection.execute("DELETE FROM session_activity WHERE last_used < ?", (cutoff,))
+        await _connection.commit()
+    if cursor.rowcount:
+        logger.info(f"Pruned {cursor.rowcount} expired sessions")
+    return cursor.rowcount
+
+async def _prune_periodically():
+    while True:
+        try:
+            await prune_sessions()
+        except Exception as e:
+            logger.error(f"Error pruning sessions: {str(e)}", exc_info=True)
+        await asyncio.sleep(SESSION_PRUNE_INTERVAL)
+
+def write_session_in_background(session_id: str, write: Awaitable[Any]):
+    """Run a session write without making the caller wait; wait_for_session_write awaits it."""
+    task = asyncio.ensure_future(write)
+    _pending_writes[session_id] = task
+    
+    def done(task: asyncio.Task):
+        _pending_writes.pop(session_id, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Error writing session {session_id}: {str(task.exception())}")
+    task.add_done_callback(done)
+
+async def wait_for_session_write(session_id: str):
+    """Wait until a background write of the session, if one is pending, has finished."""
+    task = _pending_writes.get(session_id)
+    if task is not None:
+        await asyncio.gather(asyncio.shield(task), return_exceptions=True)
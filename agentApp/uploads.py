@@ -0,0 +1,225 @@
+from typing import Any, Dict, List, Optional, Tuple, Union
+from fastapi import HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.responses import JSONResponse
+import asyncio
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+# Upload limits
+MAX_UPLOAD_FILE_BYTES = int(os.getenv("MAX_UPLOAD_FILE_BYTES", str(50 * 1024 * 1024)))
+MAX_UPLOAD_REQUEST_BYTES = int(os.getenv("MAX_UPLOAD_REQUEST_BYTES", str(200 * 1024 * 1024)))
+# Uploads larger than this are spooled to a temp file instead of held in memory
+UPLOAD_SPOOL_THRESHOLD = int(os.getenv("UPLOAD_SPOOL_THRESHOLD", str(1024 * 1024)))
+
+def _too_large(limit: int, what: str) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"{what} exceeds the {limit} byte upload limit")
+
+class RequestSizeLimitMiddleware:
+    """
+    ASGI middleware that rejects request bodies over max_bytes with 413.
+
+    Requests that declare a Content-Length over the limit are refused before any
+    of the body is read; otherwise the body is counted as it streams in and the
+    request fails as soon as it crosses the limit.
+    """
+
+    def __init__(self, app, max_bytes: int = MAX_UPLOAD_REQUEST_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT"):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            logger.warning(f"Rejecting request of {int(content_length)} bytes to {scope['path']}")
+            response = JSONResponse({"detail": _too_large(self.max_bytes, "Request").detail}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise _too_large(self.max_bytes, "Request")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+class SpooledUpload:
+    """An uploaded file held in memory when small, or in a temp file on disk when large."""
+
+    def __init__(self, filename: str, size: int, content: Optional[bytes] = None, path: Optional[str] = None):
+        self.filename = filename
+        self.size = size
+        self.content = content
+        self.path = path
+
+    @property
+    def source(self) -> Union[bytes, str]:
+        """The in-memory bytes, or the temp file path for spooled uploads."""
+        return self.content if self.content is not None else self.path
+
+    def read_head(self, size: int) -> bytes:
+        """Return up to size bytes from the start of the upload without reading the rest."""
+        if self.content is not None:
+            return self.content[:size]
+        with open(self.path, "rb") as f:
+            return f.read(size)
+
+    def read_bytes(self) -> bytes:
+        """Return the full upload as bytes."""
+        if self.content is not None:
+            return self.content
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def cleanup(self):
+        """Delete the temp file backing a spooled upload."""
+        if self.path and os.path.exists(self.path):
+            os.unlink(self.path)
+            self.path = None
+
+class _FilePart:
+    """A file part being received: held in memory up to UPLOAD_SPOOL_THRESHOLD, then written to a temp file."""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.size = 0
+        self.buffer = bytearray()
+        self.temp_file = None
+
+    async def write(self, data: bytes):
+        if self.temp_file is None:
+            if len(self.buffer) + len(data) <= UPLOAD_SPOOL_THRESHOLD:
+                self.buffer.extend(data)
+                return
+            suffix = os.path.splitext(self.filename)[1]
+            self.temp_file = tempfile.NamedTemporaryFile(delete=False, prefix="upload_", suffix=suffix)
+            data = bytes(self.buffer) + data
+            self.buffer = bytearray()
+        await asyncio.to_thread(self.temp_file.write, data)
+
+    def finish(self) -> SpooledUpload:
+        if self.temp_file is None:
+            return SpooledUpload(self.filename, self.size, content=bytes(self.buffer))
+        self.temp_file.close()
+        logger.info(f"Spooled '{self.filename}' ({self.size} bytes) to disk")
+        return SpooledUpload(self.filename, self.size, path=self.temp_file.name)
+
+    def discard(self):
+        if self.temp_file is not None:
+            self.temp_file.close()
+            if os.path.exists(self.temp_file.name):
+                os.unlink(self.temp_file.name)
+            self.temp_file = None
+
+def _missing_files(field: str) -> RequestValidationError:
+    # Same shape as FastAPI's own error for a missing File(...) parameter
+    return RequestValidationError([{"type": "missing", "loc": ("body", field), "msg": "Field required", "input": None}])
+
+async def receive_uploads(request: Request, field: str) -> List[SpooledUpload]:
+    """
+    Parse a multipart/form-data body as it arrives and spool the files sent as field.
+
+    Each file is written once, straight from the request stream into memory or, past
+    UPLOAD_SPOOL_THRESHOLD, a named temp file that extractors can read by path. The
+    per-file limit is checked as the bytes arrive, so an oversized file is rejected
+    with 413 as soon as it crosses MAX_UPLOAD_FILE_BYTES and the rest of the body is
+    never read. Other form fields are ignored. Callers must call cleanup() on every
+    returned upload.
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in options:
+        raise _missing_files(field)
+
+    parts: List[_FilePart] = []
+    # Data parsed from the current network chunk, written once the chunk is parsed
+    pending: List[Tuple[_FilePart, bytes]] = []
+    state = {"part": None, "headers": {}, "name": b"", "value": b""}
+
+    def on_part_begin():
+        state["part"] = None
+        state["headers"] = {}
+
+    def on_header_field(data: bytes, start: int, end: int):
+        state["name"] += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int):
+        state["value"] += data[start:end]
+
+    def on_header_end():
+        state["headers"][state["name"].lower()] = state["value"]
+        state["name"] = state["value"] = b""
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        if disposition.get(b"name", b"").decode("utf-8", errors="replace") == field and b"filename" in disposition:
+            state["part"] = _FilePart(disposition[b"filename"].decode("utf-8", errors="replace") or "upload")
+            parts.append(state["part"])
+
+    def on_part_data(data: bytes, start: int, end: int):
+        part = state["part"]
+        if part is None:
+            return
+        part.size += end - start
+        if part.size > MAX_UPLOAD_FILE_BYTES:
+            raise _too_large(MAX_UPLOAD_FILE_BYTES, f"File '{part.filename}'")
+        pending.append((part, data[start:end]))
+
+    parser = MultipartParser(options[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data
+    })
+    try:
+        async for chunk in request.stream():
+            try:
+                parser.write(chunk)
+            except MultipartParseError as e:
+                raise HTTPException(status_code=400, detail=f"Malformed multipart body: {str(e)}")
+            for part, data in pending:
+                await part.write(data)
+            pending.clear()
+        parser.finalize()
+    except BaseException:
+        for part in parts:
+            part.discard()
+        raise
+
+    if not parts:
+        raise _missing_files(field)
+    return [part.finish() for part in parts]
+
+def upload_request_body(field: str, multiple: bool = False) -> Dict[str, Any]:
+    """OpenAPI request body for an endpoint that reads field with receive_uploads, for openapi_extra."""
+    file_schema = {"type": "string", "format": "binary"}
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "required": [field],
+                        "properties": {field: {"type": "array", "items": file_schema} if multiple else file_schema}
+                    }
+                }
+            }
+        }
+    }
@@ -0,0 +1,16 @@
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+
+# Start method for CPU-bound worker pools. The pools are created lazily inside the
+# running, multi-threaded server, where "fork" can copy a lock another thread holds
+# (logging, sqlite, aiosqlite) and deadlock the child, so forkserver is the default
+# where the platform has it and spawn elsewhere
+WORKER_START_METHOD = os.getenv(
+    "WORKER_START_METHOD",
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+def create_process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Create a process pool whose workers start from a clean interpreter rather than a fork of this one."""
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(WORKER_START_METHOD))
@@ -0,0 +1,55 @@
+"""
+Benchmark the deterministic fact pre-extraction over large synthetic documents.
+
+For each document size, reports extraction time and throughput, how many distinct
+facts were found, and the token size of the rendered fact sheet next to the full
+text it can stand in for in the financial and market prompts (FACT_SHEET_MODE=replace).
+
+Usage:
+    python -m benchmarks.bench_fact_extraction --words 10000 100000 1000000
+"""
+import argparse
+import json
+import statistics
+import time
+
+from agentApp.chunking import count_tokens
+from agentApp.facts import extract_facts, render_fact_sheet
+from benchmarks.synthetic import synthetic_text
+
+
+def time_extraction(text, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        facts = extract_facts(text)
+        timings.append(time.perf_counter() - start)
+    return facts, statistics.median(timings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    results = []
+    for num_words in args.words:
+        text = synthetic_text(num_words)
+        facts, seconds = time_extraction(text, args.repeats)
+        fact_sheet = render_fact_sheet(facts)
+        text_tokens = count_tokens(text)
+        sheet_tokens = count_tokens(fact_sheet)
+        results.append({
+            "words": num_words,
+            "chars": len(text),
+            "extract_s": round(seconds, 4),
+            "mb_per_s": round(len(text) / seconds / 1e6, 2),
+            "distinct_facts": len(facts),
+            "fact_occurrences": sum(fact["count"] for fact in facts),
+            "text_tokens": text_tokens,
+            "fact_sheet_tokens": sheet_tokens,
+            "token_reduction": round(1 - sheet_tokens / text_tokens, 4)
+        })
+
+    print(json.dumps(results, indent=2))
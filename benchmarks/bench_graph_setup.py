@@ -0,0 +1,58 @@
+"""
+Microbenchmark for per-request setup overhead in run_due_diligence.
+
+Compares the old per-request pattern (compile the StateGraph and construct a
+fresh ChatOpenAI client for each of the four LLM-calling nodes) against the
+shared compiled graph and pooled client. No network calls are made.
+
+Usage:
+    python -m benchmarks.bench_graph_setup --iterations 200
+"""
+import argparse
+import json
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from agentApp.agent import create_due_diligence_graph, get_due_diligence_graph
+from agentApp.llm import create_llm, get_llm
+
+# analysis_engine, report_generator, user_interaction and the fallback path
+CLIENTS_PER_REQUEST = 4
+
+
+def per_request_setup():
+    create_due_diligence_graph()
+    for _ in range(CLIENTS_PER_REQUEST):
+        create_llm()
+
+
+def shared_setup():
+    get_due_diligence_graph()
+    for _ in range(CLIENTS_PER_REQUEST):
+        get_llm()
+
+
+def measure(fn, iterations):
+    """Return mean microseconds per call of fn."""
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    per_request_us = measure(per_request_setup, args.iterations)
+    shared_us = measure(shared_setup, args.iterations)
+    print(json.dumps({
+        "iterations": args.iterations,
+        "per_request_setup_us": round(per_request_us, 1),
+        "shared_setup_us": round(shared_us, 2),
+        "speedup": round(per_request_us / shared_us, 1)
+    }, indent=2))
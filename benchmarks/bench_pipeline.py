@@ -0,0 +1,239 @@
+"""
+End-to-end benchmark of the due-diligence pipeline with a deterministic fake LLM.
+
+Runs /analyze, /analyze-multiple (in-process over ASGI, with the app lifespan) and
+run_due_diligence directly, at each concurrency level, over synthetic text or PDF
+corpora of each size. For every scenario it reports throughput, p50/p95/p99
+latency, peak RSS sampled during the scenario and the fake LLM's call and token
+counts, as JSON for tracking regressions between releases.
+
+Every request gets a distinct document, and the result, document and LLM caches
+are off unless --cache is given, so the numbers measure the pipeline rather than
+the caches. Databases go to a temporary directory.
+
+Usage:
+    python -m benchmarks.bench_pipeline --profile gpt-4o-mini --concurrency 1 8 32 --requests 32
+    python -m benchmarks.bench_pipeline --targets analyze --corpus pdf --sizes 5 50 --output bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+
+from benchmarks.fake_llm import PROFILES, FakeChatModel
+from benchmarks.synthetic import synthetic_pdf, synthetic_text
+
+TARGETS = ("analyze", "analyze-multiple", "run_due_diligence")
+
+
+def configure_environment(cache):
+    """Point every database at a temporary directory and turn caches off; must run before importing agentApp."""
+    directory = tempfile.mkdtemp(prefix="bench-pipeline-")
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    os.environ["RESULT_CACHE_PATH"] = os.path.join(directory, "cache.db")
+    os.environ["JOB_DB_PATH"] = os.path.join(directory, "jobs.db")
+    os.environ["SESSION_DB_PATH"] = os.path.join(directory, "sessions.db")
+    os.environ["RESULT_CACHE_ENABLED"] = "true" if cache else "false"
+    os.environ["LLM_CACHE_ENABLED"] = "true" if cache else "false"
+    # The fake LLM has no quota; keep the client-side limiter out of the measurement
+    os.environ.setdefault("LLM_REQUESTS_PER_MINUTE", "0")
+    os.environ.setdefault("LLM_TOKENS_PER_MINUTE", "0")
+    # Queue rather than shed load, so high concurrency levels measure queueing instead of 429s
+    os.environ.setdefault("ANALYSIS_MAX_QUEUE", "100000")
+    os.environ.setdefault("ANALYSIS_QUEUE_TIMEOUT", "3600")
+
+
+def current_rss_bytes():
+    """Resident set size of this process, from /proc on Linux or the peak RSS elsewhere."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if platform.system() == "Darwin" else peak * 1024
+
+
+class RSSSampler:
+    """Sample RSS on a background thread and keep the maximum seen, so each scenario gets its own peak."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = current_rss_bytes()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_bytes())
+
+
+def percentile(values, fraction):
+    """Linearly interpolated percentile of values (0 <= fraction <= 1)."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def make_document(corpus, size, seed):
+    """Return (filename, bytes) for one synthetic document: size is words for text, pages for PDF."""
+    if corpus == "pdf":
+        return f"deck_{seed}.pdf", synthetic_pdf(size, seed=seed)
+    return f"deck_{seed}.txt", synthetic_text(size, seed=seed).encode()
+
+
+async def run_scenario(target, corpus, size, concurrency, num_requests, files_per_request, client, agent, fake):
+    """Send num_requests requests with at most concurrency in flight and summarize them."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = []
+
+    async def one(index):
+        seed = index * files_per_request
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                if target == "analyze":
+                    name, data = make_document(corpus, size, seed)
+                    response = await client.post("/analyze", files={"file": (name, data)})
+                    response.raise_for_status()
+                elif target == "analyze-multiple":
+                    files = [("files", make_document(corpus, size, seed + offset)) for offset in range(files_per_request)]
+                    response = await client.post("/analyze-multiple", files=files)
+                    response.raise_for_status()
+                else:
+                    # run_due_diligence takes extracted text, so it always uses the text corpus
+                    words = size if corpus == "text" else size * 480
+                    result = await agent.run_due_diligence(synthetic_text(words, seed=seed))
+                    if not result.get("completed"):
+                        raise RuntimeError("; ".join(result.get("errors", [])) or "analysis did not complete")
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {str(e)[:200]}")
+
+    calls, input_tokens, cached_tokens, output_tokens = fake.calls, fake.input_tokens, fake.cached_tokens, fake.output_tokens
+    with RSSSampler() as rss:
+        start = time.perf_counter()
+        await asyncio.gather(*(one(index) for index in range(num_requests)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "target": target,
+        "corpus": corpus,
+        "size": size,
+        "files_per_request": files_per_request if target == "analyze-multiple" else 1,
+        "concurrency": concurrency,
+        "requests": num_requests,
+        "errors": len(errors),
+        "error_samples": errors[:3],
+        "wall_clock_s": round(elapsed, 4),
+        "throughput_rps": round(len(latencies) / elapsed, 3) if elapsed else None,
+        "latency_s": {
+            "mean": round(statistics.fmean(latencies), 4) if latencies else None,
+            "p50": round(percentile(latencies, 0.50), 4) if latencies else None,
+            "p95": round(percentile(latencies, 0.95), 4) if latencies else None,
+            "p99": round(percentile(latencies, 0.99), 4) if latencies else None,
+            "max": round(max(latencies), 4) if latencies else None,
+        },
+        "peak_rss_mb": round(rss.peak / 2**20, 1),
+        "llm_calls": fake.calls - calls,
+        "llm_input_tokens": fake.input_tokens - input_tokens,
+        "llm_cached_tokens": fake.cached_tokens - cached_tokens,
+        "llm_output_tokens": fake.output_tokens - output_tokens,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args):
+    configure_environment(args.cache)
+
+    import httpx
+    from agentApp import agent
+    from agentApp.llm import set_llm
+    from agentApp.main import app, lifespan
+
+    fake = FakeChatModel(args.profile, prompt_cache=args.prompt_cache)
+    results = []
+    async with lifespan(app):
+        # The lifespan creates the real client; replace it once startup is done
+        set_llm(fake)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for target in args.targets:
+                for size in args.sizes:
+                    for concurrency in args.concurrency:
+                        result = await run_scenario(
+                            target, args.corpus, size, concurrency, args.requests,
+                            args.files_per_request, client, agent, fake
+                        )
+                        results.append(result)
+                        print(
+                            f"{target:18} size={size:<7} c={concurrency:<4} "
+                            f"{result['throughput_rps']} req/s p50={result['latency_s']['p50']}s "
+                            f"p99={result['latency_s']['p99']}s rss={result['peak_rss_mb']}MB errors={result['errors']}",
+                            flush=True
+                        )
+
+    report = {
+        "benchmark": "pipeline",
+        "git_revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "profile": {"name": args.profile, **PROFILES[args.profile]},
+        "cache": args.cache,
+        "prompt_cache": args.prompt_cache,
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", nargs="+", choices=TARGETS, default=list(TARGETS))
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="fast")
+    parser.add_argument("--corpus", choices=("text", "pdf"), default="text")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2_000, 20_000],
+                        help="words per document for text, pages for pdf")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=32, help="requests per scenario")
+    parser.add_argument("--files-per-request", type=int, default=3, help="documents per /analyze-multiple request")
+    parser.add_argument("--cache", action="store_true", help="leave the result, document and LLM caches on")
+    parser.add_argument("--prompt-cache", action="store_true", help="have the fake LLM mimic the provider's prompt cache")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,120 @@
+"""
+Deterministic local stand-in for ChatOpenAI, for benchmarks that must not touch the network.
+
+FakeChatModel answers every prompt with schema-shaped canned output after a delay
+computed from a latency profile: time to first token, prompt processing rate and
+output token rate. The same prompt always gets the same answer, delay and token
+usage, so runs are comparable across machines and releases.
+
+With prompt_cache=True it also mimics OpenAI's automatic prompt caching: once a
+call completes, later prompts that share a prefix of at least 1024 tokens with it
+report those tokens as cached (input_token_details.cache_read) and skip their prefill.
+"""
+import asyncio
+import hashlib
+import json
+import random
+
+from langchain_core.messages import AIMessage
+from pydantic import BaseModel
+
+from agentApp.chunking import count_tokens
+
+# first_token_s: fixed overhead per call; prefill_tps: prompt tokens processed per
+# second; output_tps: tokens generated per second; output_tokens: tokens per answer;
+# jitter: +/- fraction applied to the total delay
+PROFILES = {
+    "instant": {"first_token_s": 0.0, "prefill_tps": 0, "output_tps": 0, "output_tokens": 200, "jitter": 0.0},
+    "fast": {"first_token_s": 0.05, "prefill_tps": 50_000, "output_tps": 1_000, "output_tokens": 200, "jitter": 0.1},
+    "gpt-4o-mini": {"first_token_s": 0.4, "prefill_tps": 20_000, "output_tps": 90, "output_tokens": 250, "jitter": 0.2},
+    "slow": {"first_token_s": 1.5, "prefill_tps": 5_000, "output_tps": 30, "output_tokens": 300, "jitter": 0.3},
+}
+
+# Prompts are matched in blocks of this many characters (about 128 tokens, the
+# provider's cache granularity); prefixes shorter than PROMPT_CACHE_MIN_TOKENS are not cached
+PROMPT_CACHE_BLOCK_CHARS = 512
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+
+def _prefix_digests(prompt):
+    """Digest of every whole-block prefix of prompt, shortest first."""
+    digest = hashlib.sha256()
+    for end in range(PROMPT_CACHE_BLOCK_CHARS, len(prompt) + 1, PROMPT_CACHE_BLOCK_CHARS):
+        digest.update(prompt[end - PROMPT_CACHE_BLOCK_CHARS:end].encode("utf-8", errors="surrogatepass"))
+        yield end, digest.digest()
+
+
+def canned_output(schema):
+    """Fill every field of a response schema so structured output validates."""
+    output = {}
+    for name, field in schema.model_fields.items():
+        if isinstance(field.annotation, type) and issubclass(field.annotation, BaseModel):
+            output[name] = canned_output(field.annotation)
+        elif "List" in str(field.annotation) or "list" in str(field.annotation):
+            output[name] = ["ok"]
+        else:
+            output[name] = "ok"
+    return output
+
+
+class FakeChatModel:
+    """Stand-in for ChatOpenAI with profile-driven latency and reported token usage."""
+
+    model_name = "fake-llm"
+
+    def __init__(self, profile="fast", prompt_cache=False):
+        self.profile = dict(PROFILES[profile]) if isinstance(profile, str) else dict(profile)
+        self.prompt_cache = set() if prompt_cache else None
+        self.calls = 0
+        self.input_tokens = 0
+        self.cached_tokens = 0
+        self.output_tokens = 0
+
+    def cached_prefix_tokens(self, prompt):
+        """Tokens at the start of prompt that an earlier completed call already cached."""
+        if self.prompt_cache is None:
+            return 0
+        cached_chars = 0
+        for end, digest in _prefix_digests(prompt):
+            if digest not in self.prompt_cache:
+                break
+            cached_chars = end
+        tokens = count_tokens(prompt[:cached_chars]) if cached_chars else 0
+        return tokens if tokens >= PROMPT_CACHE_MIN_TOKENS else 0
+
+    def delay(self, prompt, input_tokens):
+        """Seconds this prompt takes under the profile, with jitter seeded by the prompt itself."""
+        profile = self.profile
+        seconds = profile["first_token_s"]
+        if profile["prefill_tps"]:
+            seconds += input_tokens / profile["prefill_tps"]
+        if profile["output_tps"]:
+            seconds += profile["output_tokens"] / profile["output_tps"]
+        if profile["jitter"]:
+            rng = random.Random(hashlib.sha256(prompt.encode("utf-8", errors="surrogatepass")).digest())
+            seconds *= 1 + rng.uniform(-profile["jitter"], profile["jitter"])
+        return seconds
+
+    async def ainvoke(self, messages, response_format=None, **kwargs):
+        prompt = "\n".join(str(message.content) for message in messages)
+        input_tokens = count_tokens(prompt)
+        cached_tokens = self.cached_prefix_tokens(prompt)
+        output_tokens = self.profile["output_tokens"]
+        self.calls += 1
+        self.input_tokens += input_tokens
+        self.cached_tokens += cached_tokens
+        self.output_tokens += output_tokens
+
+        await asyncio.sleep(self.delay(prompt, input_tokens - cached_tokens))
+        if self.prompt_cache is not None:
+            self.prompt_cache.update(digest for _, digest in _prefix_digests(prompt))
+        content = "ok" if response_format is None else json.dumps(canned_output(response_format))
+        return AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+                "input_token_details": {"cache_read": cached_tokens}
+            }
+        )
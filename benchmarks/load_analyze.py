@@ -0,0 +1,111 @@
+"""
+Load test for the /analyze endpoint.
+
+Swaps the shared LLM client for a local stand-in that sleeps for a fixed latency, then
+fires N concurrent uploads at the app while polling /health. If the pipeline is
+truly async, total wall-clock time stays close to a single request's latency and
+/health keeps answering immediately; if requests serialize, it grows with N.
+
+The app runs with its lifespan, every request uploads a distinct document, and the
+result and LLM caches are off with databases in a temporary directory (see
+bench_pipeline.configure_environment), so repeated runs exercise the pipeline
+rather than cache lookups.
+
+Usage:
+    python -m benchmarks.load_analyze --requests 20 --latency 0.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+
+import httpx
+from langchain_core.messages import AIMessage
+
+from benchmarks.bench_pipeline import configure_environment
+from benchmarks.fake_llm import canned_output
+
+
+class SleepyChatModel:
+    """Stand-in for ChatOpenAI that answers every prompt with canned (schema-shaped) output after a delay."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    async def ainvoke(self, messages, response_format=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        if response_format is None:
+            return AIMessage(content="ok")
+        return AIMessage(content=json.dumps(canned_output(response_format)))
+
+
+async def timed_upload(client, run_id, index):
+    """Upload one synthetic document, distinct across requests and runs, and return its latency."""
+    start = time.perf_counter()
+    response = await client.post(
+        "/analyze",
+        files={"file": (f"deck_{index}.txt", f"Synthetic deck {run_id}-{index}: raised $2M seed.".encode())}
+    )
+    response.raise_for_status()
+    return start, time.perf_counter()
+
+
+async def poll_health(client, stop):
+    """Hit /health until stopped and return the observed latencies."""
+    latencies = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/health")
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0.05)
+    return latencies
+
+
+async def main(num_requests, latency):
+    configure_environment(cache=False)
+    # Admit every request at once, so queueing does not hide whether they overlap
+    os.environ.setdefault("ANALYSIS_MAX_CONCURRENCY", str(num_requests))
+
+    from agentApp.llm import set_llm
+    from agentApp.main import app, lifespan
+
+    run_id = uuid.uuid4().hex[:8]
+    async with lifespan(app):
+        # The lifespan creates the real client; replace it once startup is done
+        set_llm(SleepyChatModel(latency))
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+            stop = asyncio.Event()
+            health_task = asyncio.create_task(poll_health(client, stop))
+
+            start = time.perf_counter()
+            spans = await asyncio.gather(*(timed_upload(client, run_id, i) for i in range(num_requests)))
+            total = time.perf_counter() - start
+
+            stop.set()
+            health_latencies = await health_task
+
+    # Requests overlap if some request started before another one finished
+    first_end = min(end for _, end in spans)
+    overlapping = sum(1 for begin, _ in spans if begin < first_end)
+
+    print(json.dumps({
+        "requests": num_requests,
+        "llm_latency_s": latency,
+        "total_wall_clock_s": round(total, 3),
+        # Three sequential LLM stages per request: analysis, report, user interaction
+        "serial_estimate_s": round(num_requests * latency * 3, 3),
+        "requests_in_flight_together": overlapping,
+        "health_checks": len(health_latencies),
+        "health_max_latency_s": round(max(health_latencies, default=0.0), 4)
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.latency))
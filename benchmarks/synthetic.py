@@ -0,0 +1,71 @@
+"""Synthetic documents for benchmarks: deterministic text corpora and multi-page PDFs."""
+import random
+
+WORDS = (
+    "revenue growth margin runway burn valuation seed series preferred liquidation "
+    "preference pro-rata dilution board founder vesting customers churn retention "
+    "market competition platform enterprise pipeline bookings forecast"
+).split()
+
+FACT_LINES = [
+    "The company raised a $4.5M seed round at a $20M post-money valuation.",
+    "ARR reached $1.2 million, growing 180% YoY and 12% MoM.",
+    "The total addressable market is estimated at $35B by 2028.",
+    "Investors receive a 1x non-participating liquidation preference.",
+    "Gross margin improved to 72% in Q3 2024, up 5% QoQ.",
+]
+
+
+def synthetic_text(num_words, seed=0):
+    """Return roughly num_words of pitch-deck-like prose with embedded financial facts."""
+    rng = random.Random(seed)
+    paragraphs = []
+    written = 0
+    while written < num_words:
+        length = rng.randint(40, 120)
+        sentence = " ".join(rng.choice(WORDS) for _ in range(length))
+        paragraphs.append(f"{sentence.capitalize()}. {rng.choice(FACT_LINES)}")
+        written += length
+    return "\n\n".join(paragraphs)
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def synthetic_pdf(num_pages, lines_per_page=40, seed=0):
+    """Build a text-based PDF with num_pages pages of synthetic content."""
+    rng = random.Random(seed)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page objects are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for page in range(num_pages):
+        lines = [f"Page {page + 1}"] + [
+            " ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(lines_per_page)
+        ]
+        ops = ["BT /F1 10 Tf 12 TL 50 780 Td"] + [f"({_escape(line)}) Tj T*" for line in lines] + ["ET"]
+        stream = "\n".join(ops).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % num_pages
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(out)
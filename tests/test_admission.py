@@ -0,0 +1,124 @@
+import asyncio
+import unittest
+
+from fastapi import HTTPException
+
+from agentApp.admission import AdmissionController
+
+
+def controller(max_concurrency=1, max_queue=1, queue_timeout=1.0):
+    return AdmissionController("test", max_concurrency=max_concurrency, max_queue=max_queue, queue_timeout=queue_timeout)
+
+
+async def hold(admission, release: asyncio.Event, order=None, name=None):
+    async with admission.admit():
+        if order is not None:
+            order.append(name)
+        await release.wait()
+
+
+class AdmissionControllerTest(unittest.TestCase):
+    def test_full_queue_is_rejected_with_429(self):
+        async def run():
+            admission = controller(max_concurrency=1, max_queue=1)
+            release = asyncio.Event()
+            running = asyncio.create_task(hold(admission, release))
+            queued = asyncio.create_task(hold(admission, release))
+            await asyncio.sleep(0.01)
+            with self.assertRaises(HTTPException) as rejected:
+                async with admission.admit():
+                    pass
+            release.set()
+            await asyncio.gather(running, queued)
+            return admission, rejected.exception
+
+        admission, error = asyncio.run(run())
+        self.assertEqual(error.status_code, 429)
+        self.assertGreaterEqual(int(error.headers["Retry-After"]), 1)
+        self.assertEqual(admission.stats()["active"], 0)
+
+    def test_queue_timeout_is_rejected_with_503(self):
+        async def run():
+            admission = controller(max_concurrency=1, max_queue=4, queue_timeout=0.05)
+            release = asyncio.Event()
+            running = asyncio.create_task(hold(admission, release))
+            await asyncio.sleep(0.01)
+            with self.assertRaises(HTTPException) as rejected:
+                async with admission.admit():
+                    pass
+            queued_after_timeout = admission.stats()["queued"]
+            release.set()
+            await running
+            return admission, rejected.exception, queued_after_timeout
+
+        admission, error, queued = asyncio.run(run())
+        self.assertEqual(error.status_code, 503)
+        self.assertIn("Retry-After", error.headers)
+        self.assertEqual(queued, 0)
+        self.assertEqual(admission.stats()["active"], 0)
+
+    def test_waiters_are_admitted_in_arrival_order(self):
+        async def run():
+            admission = controller(max_concurrency=1, max_queue=3)
+            release = asyncio.Event()
+            order = []
+            tasks = []
+            for name in "abcd":
+                tasks.append(asyncio.create_task(hold(admission, release, order, name)))
+                await asyncio.sleep(0.01)
+            release.set()
+            await asyncio.gather(*tasks)
+            return admission, order
+
+        admission, order = asyncio.run(run())
+        self.assertEqual(order, ["a", "b", "c", "d"])
+        self.assertEqual(admission.stats(), {"active": 0, "queued": 0, "max_concurrency": 1, "max_queue": 3})
+
+    def test_cancelled_waiter_leaves_the_queue(self):
+        async def run():
+            admission = controller(max_concurrency=1, max_queue=2)
+            release = asyncio.Event()
+            running = asyncio.create_task(hold(admission, release))
+            await asyncio.sleep(0.01)
+            cancelled = asyncio.create_task(hold(admission, release))
+            await asyncio.sleep(0.01)
+            queued_before = admission.stats()["queued"]
+            cancelled.cancel()
+            await asyncio.gather(cancelled, return_exceptions=True)
+            queued_after = admission.stats()["queued"]
+            release.set()
+            await running
+            return admission, queued_before, queued_after
+
+        admission, queued_before, queued_after = asyncio.run(run())
+        self.assertEqual((queued_before, queued_after), (1, 0))
+        self.assertEqual(admission.stats()["active"], 0)
+
+    def test_slot_handed_to_a_cancelled_waiter_is_passed_on(self):
+        async def run():
+            admission = controller(max_concurrency=1, max_queue=2)
+            first_release = asyncio.Event()
+            release = asyncio.Event()
+            order = []
+            running = asyncio.create_task(hold(admission, first_release))
+            await asyncio.sleep(0.01)
+            cancelled = asyncio.create_task(hold(admission, release, order, "cancelled"))
+            await asyncio.sleep(0.01)
+            last = asyncio.create_task(hold(admission, release, order, "last"))
+            await asyncio.sleep(0.01)
+            # The slot is handed to the first waiter, which is cancelled before it resumes
+            first_release.set()
+            await running
+            cancelled.cancel()
+            await asyncio.gather(cancelled, return_exceptions=True)
+            release.set()
+            await last
+            return admission, order
+
+        admission, order = asyncio.run(run())
+        self.assertEqual(order[-1], "last")
+        self.assertEqual(admission.stats()["active"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
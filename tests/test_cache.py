@@ -0,0 +1,83 @@
+import itertools
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from agentApp import cache
+from agentApp.cache import SQLiteCache
+
+
+class SQLiteCacheTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "cache.db")
+        # A clock that advances one second per reading, so access order is unambiguous
+        self.clock = itertools.count(1_000_000.0)
+        patcher = mock.patch.object(cache, "time", SimpleNamespace(time=lambda: next(self.clock)))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def open(self, **limits):
+        options = {"ttl_seconds": 3600, "max_entries": 100, "max_bytes": 1_000_000, **limits}
+        store = SQLiteCache(self.path, "entries", **options)
+        self.addCleanup(store.close)
+        return store
+
+    def test_round_trip_and_counters(self):
+        store = self.open()
+        self.assertIsNone(store.get("a"))
+        store.set("a", {"value": [1, 2]})
+        self.assertEqual(store.get("a"), {"value": [1, 2]})
+        stats = store.stats()
+        self.assertEqual((stats["entries"], stats["hits"], stats["misses"]), (1, 1, 1))
+
+    def test_entries_expire_after_ttl(self):
+        store = self.open(ttl_seconds=5)
+        store.set("a", "old")
+        self.assertEqual(store.get("a"), "old")
+        for _ in range(10):
+            next(self.clock)
+        self.assertIsNone(store.get("a"))
+        self.assertEqual(store.stats()["entries"], 0)
+
+    def test_expired_entries_are_evicted_on_write(self):
+        store = self.open(ttl_seconds=5)
+        store.set("a", "old")
+        for _ in range(10):
+            next(self.clock)
+        store.set("b", "new")
+        self.assertEqual(store.stats()["entries"], 1)
+        self.assertEqual(store.get("b"), "new")
+
+    def test_least_recently_used_is_evicted_by_count(self):
+        store = self.open(max_entries=2)
+        store.set("a", 1)
+        store.set("b", 2)
+        store.get("a")
+        store.set("c", 3)
+        self.assertIsNone(store.get("b"))
+        self.assertEqual((store.get("a"), store.get("c")), (1, 3))
+        self.assertEqual(store.stats()["evictions"], 1)
+
+    def test_least_recently_used_is_evicted_by_bytes(self):
+        value = "x" * 100
+        # Room for two entries of about 102 bytes each, not three
+        store = self.open(max_bytes=250)
+        store.set("a", value)
+        store.set("b", value)
+        store.get("a")
+        store.set("c", value)
+        self.assertIsNone(store.get("b"))
+        self.assertEqual(store.stats()["entries"], 2)
+        self.assertLessEqual(store.stats()["bytes"], 250)
+
+    def test_entries_survive_reopening(self):
+        self.open().set("a", "kept")
+        self.assertEqual(self.open().get("a"), "kept")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+
+from agentApp.chunking import chunk_text, count_tokens, merge_partial_results
+
+
+def sections(count, words=40):
+    return "\n\n".join(f"Section {n}. " + " ".join(f"word{n}x{i}" for i in range(words)) for n in range(count))
+
+
+class ChunkTextTest(unittest.TestCase):
+    def test_short_text_is_one_chunk(self):
+        text = sections(3)
+        chunks = chunk_text(text, max_tokens=100_000)
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual(chunks[0]["text"], text)
+        self.assertEqual((chunks[0]["start"], chunks[0]["end"]), (0, len(text)))
+
+    def test_chunks_are_bounded_slices_covering_the_text(self):
+        text = sections(30)
+        max_tokens = count_tokens(text) // 5
+        chunks = chunk_text(text, max_tokens=max_tokens, overlap_tokens=0)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(chunks[0]["start"], 0)
+        self.assertEqual(chunks[-1]["end"], len(text))
+        for index, chunk in enumerate(chunks):
+            self.assertEqual(chunk["index"], index)
+            self.assertEqual(chunk["text"], text[chunk["start"]:chunk["end"]])
+            self.assertLessEqual(chunk["tokens"], max_tokens)
+        # Without overlap each chunk starts where the previous one ended
+        for previous, chunk in zip(chunks, chunks[1:]):
+            self.assertEqual(chunk["start"], previous["end"])
+
+    def test_overlap_repeats_trailing_sections(self):
+        text = sections(30)
+        max_tokens = count_tokens(text) // 5
+        chunks = chunk_text(text, max_tokens=max_tokens, overlap_tokens=max_tokens // 3)
+        for previous, chunk in zip(chunks, chunks[1:]):
+            self.assertLess(chunk["start"], previous["end"])
+            self.assertGreater(chunk["start"], previous["start"])
+        self.assertEqual(chunks[-1]["end"], len(text))
+
+    def test_oversized_line_is_cut_into_windows(self):
+        text = " ".join(f"token{i}" for i in range(2_000))
+        chunks = chunk_text(text, max_tokens=200, overlap_tokens=0)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunk["text"] for chunk in chunks), text)
+        for chunk in chunks:
+            self.assertLessEqual(chunk["tokens"], 200)
+
+    def test_empty_text_has_no_chunks(self):
+        self.assertEqual(chunk_text(""), [])
+
+
+class MergePartialResultsTest(unittest.TestCase):
+    DEFAULTS = {"revenue": "unknown", "risk_factors": [], "valuation": "unknown"}
+
+    def test_lists_are_unioned_and_strings_joined(self):
+        merged = merge_partial_results([
+            {"revenue": "$2M ARR", "risk_factors": ["churn", "key person"]},
+            {"revenue": "$2M ARR", "risk_factors": ["key person", "regulation"]},
+            {"revenue": "growing 40% YoY", "risk_factors": []},
+        ], self.DEFAULTS)
+        self.assertEqual(merged["revenue"], "$2M ARR; growing 40% YoY")
+        self.assertEqual(merged["risk_factors"], ["churn", "key person", "regulation"])
+
+    def test_unknown_values_fall_back_to_defaults(self):
+        merged = merge_partial_results([
+            {"revenue": "unknown", "valuation": ""},
+            {"revenue": "Unknown", "valuation": None},
+        ], self.DEFAULTS)
+        self.assertEqual(merged, {"revenue": "unknown", "risk_factors": [], "valuation": "unknown"})
+        # The default list is copied, not shared
+        self.assertIsNot(merged["risk_factors"], self.DEFAULTS["risk_factors"])
+
+    def test_extra_keys_are_kept(self):
+        merged = merge_partial_results([{"notes": "a"}, {"notes": "b"}], self.DEFAULTS)
+        self.assertEqual(merged["notes"], "a; b")
+
+
+if __name__ == "__main__":
+    unittest.main()
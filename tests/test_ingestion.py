@@ -0,0 +1,61 @@
+import codecs
+import unittest
+
+from agentApp.ingestion import FORMAT_BINARY, FORMAT_IMAGE, FORMAT_PDF, FORMAT_TEXT, FORMAT_ZIP, detect_encoding, sniff_format
+from agentApp.office_extraction import looks_like_csv
+
+
+class SniffFormatTest(unittest.TestCase):
+    def test_signatures(self):
+        self.assertEqual(sniff_format(b"%PDF-1.7\n..."), FORMAT_PDF)
+        self.assertEqual(sniff_format(b"\x89PNG\r\n\x1a\n...."), FORMAT_IMAGE)
+        self.assertEqual(sniff_format(b"PK\x03\x04...."), FORMAT_ZIP)
+        self.assertEqual(sniff_format(b"\x00\x01\x02\x03"), FORMAT_BINARY)
+
+    def test_text_starting_like_a_bitmap_is_text(self):
+        self.assertEqual(sniff_format(b"BMW annual report 2024"), FORMAT_TEXT)
+
+    def test_encodings(self):
+        self.assertEqual(detect_encoding("café €".encode()), "utf-8")
+        self.assertEqual(detect_encoding("café € déjà vu".encode("cp1252")), "cp1252")
+        self.assertEqual(detect_encoding(codecs.BOM_UTF16_LE + "hi".encode("utf-16-le")), "utf-16")
+
+
+class LooksLikeCsvTest(unittest.TestCase):
+    def test_header_and_numeric_rows(self):
+        self.assertTrue(looks_like_csv("Year,Revenue,EBITDA\n2022,1200,150\n2023,1800,260\n2024,2600,410\n"))
+
+    def test_other_delimiters(self):
+        self.assertTrue(looks_like_csv("Quarter\tBookings\nQ1\t$1,200\nQ2\t$1,450\nQ3\t$1,900\n"))
+        self.assertTrue(looks_like_csv("month;churn\nJan;2.1%\nFeb;1.9%\nMar;1.7%\n"))
+
+    def test_headerless_rows_need_a_consistent_shape_over_several_lines(self):
+        rows = "".join(f"acme-{n},enterprise,{n * 100}\n" for n in range(8))
+        self.assertTrue(looks_like_csv(rows))
+        self.assertFalse(looks_like_csv("alpha,beta\ngamma,delta\nepsilon,zeta\n"))
+
+    def test_prose_with_commas_is_not_csv(self):
+        prose = (
+            "Revenue grew strongly last year, driven by new enterprise customers\n"
+            "Gross margin improved, as hosting costs fell after the migration\n"
+            "The team expanded, adding ten engineers and two account executives\n"
+            "Churn stayed low, although two mid-market accounts downgraded\n"
+        )
+        self.assertFalse(looks_like_csv(prose))
+
+    def test_sentences_with_matching_comma_counts_are_not_csv(self):
+        sentences = "".join(f"In year {n}, the company hired staff, opened offices and grew.\n" for n in range(10))
+        self.assertFalse(looks_like_csv(sentences))
+
+    def test_long_clauses_are_not_csv(self):
+        clauses = "".join(
+            f"the board reviewed the proposal in detail during meeting {n}, and approved it\n" for n in range(10)
+        )
+        self.assertFalse(looks_like_csv(clauses))
+
+    def test_inconsistent_field_counts(self):
+        self.assertFalse(looks_like_csv("a,b,c\n1,2\n3,4,5,6\n7,8,9\n10,11,12\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
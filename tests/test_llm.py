@@ -0,0 +1,164 @@
+import asyncio
+import json
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from langchain_core.messages import AIMessage, HumanMessage
+from pydantic import BaseModel
+
+from agentApp.llm import MemoizedChatModel, ResilientChatModel, StructuredOutputError, ainvoke_structured
+from agentApp.ratelimit import CircuitBreaker, CircuitOpenError
+
+
+class Verdict(BaseModel):
+    decision: str
+    score: int
+
+
+class DictStore:
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value):
+        self.values[key] = value
+
+
+class ScriptedModel:
+    """Replies with the given contents in turn, repeating the last one."""
+
+    model_name = "scripted"
+
+    def __init__(self, *contents):
+        self.contents = list(contents)
+        self.calls = 0
+
+    async def ainvoke(self, messages, **kwargs):
+        content = self.contents[min(self.calls, len(self.contents) - 1)]
+        self.calls += 1
+        return AIMessage(content=content)
+
+
+VALID = json.dumps({"decision": "invest", "score": 7})
+MALFORMED = '{"decision": "invest"'
+PROMPT = [HumanMessage(content="Assess this deal.")]
+
+
+class StructuredOutputMemoTest(unittest.TestCase):
+    def test_malformed_reply_is_retried_and_only_the_valid_one_memoized(self):
+        provider = ScriptedModel(MALFORMED, VALID)
+        model = MemoizedChatModel(provider, DictStore())
+
+        first = asyncio.run(ainvoke_structured(model, PROMPT, Verdict, retries=2))
+        self.assertEqual(first, Verdict(decision="invest", score=7))
+        self.assertEqual(provider.calls, 2)
+
+        # The next run is answered from the memo with the validated reply
+        second = asyncio.run(ainvoke_structured(model, PROMPT, Verdict, retries=2))
+        self.assertEqual(second, first)
+        self.assertEqual(provider.calls, 2)
+
+    def test_invalid_replies_are_never_served_from_the_memo(self):
+        provider = ScriptedModel(MALFORMED)
+        model = MemoizedChatModel(provider, DictStore())
+
+        for run in range(3):
+            with self.assertRaises(StructuredOutputError):
+                asyncio.run(ainvoke_structured(model, PROMPT, Verdict, retries=2))
+        # Every attempt of every run reached the provider
+        self.assertEqual(provider.calls, 9)
+
+    def test_invalid_memo_entry_falls_through_to_the_model(self):
+        provider = ScriptedModel(VALID)
+        model = MemoizedChatModel(provider, DictStore())
+        asyncio.run(model.remember(PROMPT, AIMessage(content=MALFORMED), response_format=Verdict))
+
+        result = asyncio.run(ainvoke_structured(model, PROMPT, Verdict))
+        self.assertEqual(result.score, 7)
+        self.assertEqual(provider.calls, 1)
+        self.assertEqual(asyncio.run(model.lookup(PROMPT, response_format=Verdict)).content, VALID)
+
+
+class ProviderError(Exception):
+    """Shaped like an openai.APIStatusError: a status code and a response with headers."""
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(status_code=status_code, headers=headers or {})
+
+
+class FailingModel:
+    """Raises the given errors in turn, then replies "ok"."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def ainvoke(self, messages, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return AIMessage(content="ok", usage_metadata={"input_tokens": 5, "output_tokens": 1, "total_tokens": 6})
+
+
+def resilient(model, **options):
+    options = {"requests_per_minute": 0, "tokens_per_minute": 0, "max_retries": 2, **options}
+    return ResilientChatModel(model, **options)
+
+
+@mock.patch("agentApp.llm.LLM_RETRY_BASE_DELAY", 0.0)
+class ResilientChatModelTest(unittest.TestCase):
+    def test_rate_limit_honors_retry_after(self):
+        provider = FailingModel(ProviderError(429, {"retry-after-ms": "100"}))
+        model = resilient(provider, requests_per_minute=6000)
+
+        start = time.perf_counter()
+        response = asyncio.run(model.ainvoke(PROMPT))
+        self.assertEqual(response.content, "ok")
+        self.assertGreaterEqual(time.perf_counter() - start, 0.1)
+        self.assertEqual(provider.calls, 2)
+        self.assertEqual(model.counters["rate_limited"], 1)
+        # Rate limits pause the shared quota but do not count against the provider's health
+        self.assertGreater(model.request_bucket.blocked_until, 0)
+        self.assertEqual(model.breaker.failures, 0)
+
+    def test_client_error_is_not_retried(self):
+        provider = FailingModel(ProviderError(400))
+        model = resilient(provider)
+
+        with self.assertRaises(ProviderError):
+            asyncio.run(model.ainvoke(PROMPT))
+        self.assertEqual(provider.calls, 1)
+        self.assertEqual(model.counters["retries"], 0)
+
+    def test_server_errors_are_retried(self):
+        provider = FailingModel(ProviderError(503), ProviderError(500))
+        model = resilient(provider)
+
+        self.assertEqual(asyncio.run(model.ainvoke(PROMPT)).content, "ok")
+        self.assertEqual(provider.calls, 3)
+        self.assertEqual(model.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_breaker_opens_then_closes_after_a_probe(self):
+        provider = FailingModel(*[ProviderError(500)] * 3)
+        model = resilient(provider, breaker=CircuitBreaker(failure_threshold=3, reset_seconds=0.05))
+
+        with self.assertRaises(ProviderError):
+            asyncio.run(model.ainvoke(PROMPT))
+        self.assertEqual(model.breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            asyncio.run(model.ainvoke(PROMPT))
+        self.assertEqual(provider.calls, 3)
+
+        time.sleep(0.06)
+        self.assertEqual(asyncio.run(model.ainvoke(PROMPT)).content, "ok")
+        self.assertEqual(model.breaker.state, CircuitBreaker.CLOSED)
+
+
+if __name__ == "__main__":
+    unittest.main()
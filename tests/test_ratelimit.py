@@ -0,0 +1,77 @@
+import asyncio
+import time
+import unittest
+
+from agentApp.ratelimit import CircuitBreaker, TokenBucket
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_waits_for_refill_once_empty(self):
+        async def run():
+            # 10 per second, holding at most 2
+            bucket = TokenBucket(rate_per_minute=600, capacity=2)
+            first = await bucket.acquire(2)
+            second = await bucket.acquire(1)
+            return first, second
+
+        first, second = asyncio.run(run())
+        self.assertEqual(first, 0.0)
+        self.assertAlmostEqual(second, 0.1, delta=0.02)
+
+    def test_refills_up_to_capacity(self):
+        bucket = TokenBucket(rate_per_minute=600, capacity=2)
+        bucket.adjust(2)
+        time.sleep(0.1)
+        bucket.adjust(0)
+        self.assertAlmostEqual(bucket.level, 1.0, delta=0.2)
+        time.sleep(0.3)
+        bucket.adjust(0)
+        self.assertEqual(bucket.level, 2)
+
+    def test_block_pauses_the_bucket(self):
+        async def run():
+            bucket = TokenBucket(rate_per_minute=600, capacity=2)
+            bucket.block(0.1)
+            return await bucket.acquire(1)
+
+        self.assertAlmostEqual(asyncio.run(run()), 0.1, delta=0.02)
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def test_opens_goes_half_open_and_closes(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.05)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+
+        time.sleep(0.06)
+        # One probe is let through while half-open
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(breaker.allow())
+
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow())
+
+    def test_failed_probe_reopens(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+
+    def test_released_probe_lets_another_through(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.0)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.release()
+        self.assertTrue(breaker.allow())
+
+
+if __name__ == "__main__":
+    unittest.main()
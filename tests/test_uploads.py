@@ -0,0 +1,111 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from agentApp import uploads
+from agentApp.main import documents_by_name
+from agentApp.uploads import RequestSizeLimitMiddleware, receive_uploads
+
+
+def create_app(max_request_bytes=10_000):
+    app = FastAPI()
+    app.add_middleware(RequestSizeLimitMiddleware, max_bytes=max_request_bytes)
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        files = await receive_uploads(request, "files")
+        try:
+            return [
+                {"filename": file.filename, "size": file.size, "spooled": file.path is not None, "body": file.read_bytes().decode()}
+                for file in files
+            ]
+        finally:
+            for file in files:
+                file.cleanup()
+
+    return app
+
+
+@mock.patch.object(uploads, "UPLOAD_SPOOL_THRESHOLD", 100)
+@mock.patch.object(uploads, "MAX_UPLOAD_FILE_BYTES", 1_000)
+class ReceiveUploadsTest(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(create_app())
+        # Spooled uploads land here, so leftovers are easy to spot
+        self.temp_dir = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(tempfile, "tempdir", self.temp_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.temp_dir.cleanup)
+
+    def assertNoTempFiles(self):
+        self.assertEqual(os.listdir(self.temp_dir.name), [])
+
+    def test_repeated_parts_keep_upload_order(self):
+        response = self.client.post("/upload", files=[
+            ("files", ("a.txt", b"small")),
+            ("files", ("b.txt", b"x" * 500)),
+            ("other", ("c.txt", b"ignored")),
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(file["filename"], file["size"], file["spooled"]) for file in response.json()],
+            [("a.txt", 5, False), ("b.txt", 500, True)]
+        )
+        self.assertEqual(response.json()[1]["body"], "x" * 500)
+        self.assertNoTempFiles()
+
+    def test_missing_field_is_422(self):
+        response = self.client.post("/upload", files=[("other", ("a.txt", b"text"))])
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(response.json()["detail"][0]["loc"], ["body", "files"])
+        self.assertEqual(self.client.post("/upload", json={"files": []}).status_code, 422)
+
+    def test_oversized_file_is_413_and_spooled_files_are_deleted(self):
+        response = self.client.post("/upload", files=[
+            ("files", ("a.txt", b"y" * 500)),
+            ("files", ("big.txt", b"z" * 2_000)),
+        ])
+        self.assertEqual(response.status_code, 413)
+        self.assertIn("big.txt", response.json()["detail"])
+        self.assertNoTempFiles()
+
+    def test_oversized_request_is_413_and_spooled_files_are_deleted(self):
+        boundary = "testboundary"
+        parts = [
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"files\"; filename=\"{name}\"\r\n\r\n".encode() + b"w" * 900 + b"\r\n"
+            for name in ("a.txt", "b.txt", "c.txt", "d.txt", "e.txt", "f.txt", "g.txt", "h.txt", "i.txt", "j.txt", "k.txt", "l.txt")
+        ]
+        body = b"".join(parts) + f"--{boundary}--\r\n".encode()
+        headers = {"content-type": f"multipart/form-data; boundary={boundary}"}
+
+        # Declared too large: refused before the body is read
+        self.assertEqual(self.client.post("/upload", content=body, headers=headers).status_code, 413)
+        # Streamed without a length: refused once the count crosses the limit
+        chunks = (body[i:i + 1_000] for i in range(0, len(body), 1_000))
+        self.assertEqual(self.client.post("/upload", content=chunks, headers=headers).status_code, 413)
+        self.assertNoTempFiles()
+
+    def test_malformed_body_is_400(self):
+        response = self.client.post(
+            "/upload",
+            content=b"this is not a multipart body",
+            headers={"content-type": "multipart/form-data; boundary=testboundary"}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertNoTempFiles()
+
+
+class DocumentsByNameTest(unittest.TestCase):
+    def test_duplicate_filenames_get_a_suffix(self):
+        named = documents_by_name([("a.txt", "one"), ("b.txt", "two"), ("a.txt", "three"), ("a.txt", "four")])
+        self.assertEqual(list(named), ["a.txt", "b.txt", "a.txt (2)", "a.txt (3)"])
+        self.assertEqual(named["a.txt (2)"], "three")
+
+
+if __name__ == "__main__":
+    unittest.main()